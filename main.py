@@ -8,62 +8,125 @@ ShortcutsEasier软件主程序
 
 import sys
 import os
-import pyperclip
+import argparse
 
 # 添加src目录到Python路径
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
-from src.keyboard_manager import KeyboardManager
-from src.config_manager import ConfigManager
-from src.ui_manager import UIManager
+# 单实例检查在导入其他模块之前完成，第二个实例可以立即退出
+from src.single_instance import InstanceServer, send_command
 
-def get_mouse_position(keyboard_manager=None):
+def get_mouse_position(keyboard_manager, clipboard_service):
     """获取鼠标位置并复制到剪贴板"""
     try:
-        from pynput import mouse
-        # 创建鼠标控制器
-        mouse_controller = mouse.Controller()
-        
-        # 获取当前鼠标位置
-        x, y = mouse_controller.position
+        # 复用键盘管理器的鼠标控制器获取当前鼠标位置
+        x, y = keyboard_manager.mouse_controller.position
         
         # 格式化位置字符串
         position_str = f"{int(x)},{int(y)}"
         
-        # 复制到剪贴板
-        pyperclip.copy(position_str)
+        # 同时截取鼠标周围的参考图像，作为可选的图像锚定位置
+        from src import image_anchor
+        if image_anchor.is_available():
+            try:
+                # 只截取到内存中，用户用它添加鼠标映射时才保存到锚点目录
+                anchor, image = image_anchor.capture_anchor(int(x), int(y))
+                clipboard_service.add_anchor(anchor, image)
+            except Exception as e:
+                print(f"截取图像锚点失败: {e}")
+        
+        # 复制到剪贴板，并记入位置历史供鼠标映射表单选择
+        clipboard_service.copy(position_str)
+        clipboard_service.add_position(position_str)
         
         print(f"鼠标位置 {position_str} 已复制到剪贴板")
         
-        # 重新启动键盘监听器以清除按键状态
-        if keyboard_manager:
-            keyboard_manager.stop_listening()
-            keyboard_manager.start_listening()
+        # 清除组合键的按键状态
+        keyboard_manager.reset_key_state()
         
         return position_str
     except Exception as e:
         print(f"获取鼠标位置失败: {str(e)}")
         return None
 
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="ShortcutsEasier 软件")
+    parser.add_argument('--trace', action='store_true',
+                        help="启用流水线跟踪记录，按 Ctrl+Shift+F10 导出最近的记录")
+    parser.add_argument('--trace-seconds', type=float, default=None,
+                        help="导出跟踪记录时包含的最近秒数")
+    parser.add_argument('--reload', action='store_true',
+                        help="让正在运行的实例重新加载配置文件")
+    parser.add_argument('--dump-trace', action='store_true',
+                        help="让正在运行的实例导出跟踪记录")
+    return parser.parse_args()
+
 def main():
     """主函数"""
+    args = parse_args()
+    
+    # 已有实例运行时把命令交给它处理，不再启动第二套键盘钩子
+    if args.reload:
+        command = "reload"
+    elif args.dump_trace:
+        command = "dump-trace"
+    else:
+        command = "show"
+    instance_server = InstanceServer()
+    if not instance_server.acquire():
+        reply = send_command(command)
+        print(f"ShortcutsEasier 已在运行: {command} -> {reply}")
+        return
+    if command != "show":
+        print("没有正在运行的 ShortcutsEasier 实例")
+        instance_server.close()
+        return
+    
+    from src.keyboard_manager import KeyboardManager
+    from src.config_manager import ConfigManager
+    from src.ui_manager import UIManager
+    from src.clipboard_service import ClipboardService
+    from src.hook_process import HookProcessClient
+    
     # 初始化配置管理器
     config_manager = ConfigManager()
     
-    # 初始化键盘管理器
-    keyboard_manager = KeyboardManager(config_manager)
+    if config_manager.get_setting("hook_process", False):
+        # 键盘监听和匹配运行在独立的钩子进程中
+        keyboard_manager = HookProcessClient(config_manager, args.trace, args.trace_seconds)
+    else:
+        # 初始化键盘管理器
+        keyboard_manager = KeyboardManager(config_manager)
+        
+        # 启用流水线跟踪记录
+        if args.trace:
+            keyboard_manager.tracer.enabled = True
+        if args.trace_seconds is not None:
+            keyboard_manager.trace_dump_seconds = args.trace_seconds
+    
+    # 初始化剪贴板服务
+    clipboard_service = ClipboardService(config_manager.get_setting("position_history_size", 20))
     
     # 设置获取鼠标位置的回调函数
-    keyboard_manager.set_get_mouse_position_callback(lambda: get_mouse_position(keyboard_manager))
+    keyboard_manager.set_get_mouse_position_callback(lambda: get_mouse_position(keyboard_manager, clipboard_service))
     
     # 初始化UI管理器
-    ui_manager = UIManager(config_manager, keyboard_manager)
+    ui_manager = UIManager(config_manager, keyboard_manager, clipboard_service)
+    
+    # 处理之后启动的实例发来的命令，处理函数在服务线程中执行，界面操作通过 call_in_ui 交给UI线程
+    instance_server.set_handler("show", ui_manager.show_main_window)
+    instance_server.set_handler("reload", ui_manager.reload_config)
+    instance_server.set_handler("dump-trace", keyboard_manager.dump_trace)
     
     # 启动键盘监听
     keyboard_manager.start_listening()
     
     # 启动UI
-    ui_manager.run()
+    try:
+        ui_manager.run()
+    finally:
+        instance_server.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
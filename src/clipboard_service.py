@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+剪贴板服务模块
+复用UI事件循环持有的Tk剪贴板，并保存最近捕获的鼠标位置
+"""
+
+import threading
+from collections import deque
+
+
+class ClipboardService:
+    """剪贴板服务
+
+    UI运行时通过Tk根窗口写剪贴板(Tk在进程内持有剪贴板所有权，不需要
+    启动子进程)；尚未有Tk根窗口时退化为 pyperclip。根窗口在整个UI生命周期内
+    保留，主窗口关闭后仍然持有剪贴板。
+    """
+
+    def __init__(self, history_size=20):
+        """初始化剪贴板服务"""
+        self.tk_root = None
+        self.call_in_ui = None
+        self.lock = threading.Lock()
+        # 最近捕获的鼠标位置，最新的在前
+        self.position_history = deque(maxlen=history_size)
+        # 位置历史变化回调函数
+        self.history_callbacks = []
+        # 尚未保存的图像锚点: 暂定位置字符串 -> 图像，移出位置历史时一起丢弃
+        self.anchor_images = {}
+
+    def attach_tk(self, root, call_in_ui):
+        """使用Tk根窗口作为剪贴板后端，call_in_ui(func, *args) 把操作交给UI线程执行"""
+        self.call_in_ui = call_in_ui
+        self.tk_root = root
+
+    def detach_tk(self):
+        """Tk根窗口销毁前解除关联"""
+        self.tk_root = None
+        self.call_in_ui = None
+
+    def copy(self, text):
+        """复制文本到剪贴板，可在任意线程调用"""
+        root, call_in_ui = self.tk_root, self.call_in_ui
+        if root is not None and call_in_ui is not None:
+            # Tk只能在UI线程中操作
+            call_in_ui(self._copy_tk, root, text)
+            return
+        import pyperclip
+        pyperclip.copy(text)
+
+    def _copy_tk(self, root, text):
+        """在UI线程中写入Tk剪贴板"""
+        root.clipboard_clear()
+        root.clipboard_append(text)
+
+    def add_position(self, position):
+        """记录一次捕获的鼠标位置"""
+        with self.lock:
+            if position in self.position_history:
+                self.position_history.remove(position)
+            self.position_history.appendleft(position)
+            history = list(self.position_history)
+            for anchor in list(self.anchor_images):
+                if anchor not in history:
+                    del self.anchor_images[anchor]
+        for callback in self.history_callbacks:
+            try:
+                callback(history)
+            except Exception as e:
+                print(f"位置历史回调执行失败: {e}")
+
+    def add_anchor(self, position, image):
+        """记录一次截取的图像锚点，图像在用户用它添加映射前只保存在内存中"""
+        with self.lock:
+            self.anchor_images[position] = image
+        self.add_position(position)
+
+    def get_anchor_image(self, position):
+        """获取尚未保存的图像锚点，不是暂定位置时返回 None"""
+        with self.lock:
+            return self.anchor_images.get(position)
+
+    def get_position_history(self):
+        """获取最近捕获的鼠标位置，最新的在前"""
+        with self.lock:
+            return list(self.position_history)
+
+    def add_history_callback(self, callback):
+        """订阅位置历史的变化"""
+        self.history_callbacks.append(callback)
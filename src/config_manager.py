@@ -6,30 +6,215 @@
 负责读取和保存用户自定义的按键映射配置
 """
 
+import gc
 import json
 import os
+import sys
+from types import MappingProxyType
+
+# 添加src目录到Python路径
+sys.path.append(os.path.join(os.path.dirname(__file__)))
+
+from trigger_matcher import compile_matcher, find_conflicts, update_matcher
+from plugin_runner import parse_plugin_mapping
+from pattern_matcher import PatternError, compile_patterns, is_pattern, parse_pattern
+
+
+class MappingSnapshot:
+    """不可变的映射快照
+
+    由 ConfigManager 在每次配置变更后整体重建并替换，监听线程直接持有
+    引用读取，无需加锁，也不会读到修改到一半的字典。
+    """
+    
+    __slots__ = ('version', 'mappings', 'mouse_mappings', 'plugin_mappings', 'actions', 'triggers', 'matcher', 'conflicts',
+                 'repeat_keys', 'patterns', 'trie', 'preview_size')
+    
+    # 与上一个快照相比变更的触发序列不超过该数量时，在上一个前缀树上增量更新
+    INCREMENTAL_LIMIT = 256
+    
+    def __init__(self, version, mappings, mouse_mappings, preview_size=3, plugin_mappings=None, plugin_timeout=2.0,
+                 repeat_triggers=(), pattern_max_states=2000, previous=None):
+        """根据映射字典的副本编译快照，preview_size 为每个匹配节点预先计算的候选数量，
+        pattern_max_states 为模式触发序列编译后允许的最大状态数，previous 为上一个快照"""
+        mappings = dict(mappings)
+        mouse_mappings = dict(mouse_mappings)
+        # 插件映射解析为 (函数, 输入, 输出, 超时)，格式错误的映射被忽略
+        plugins = {}
+        for key, entry in (plugin_mappings or {}).items():
+            plugin = parse_plugin_mapping(entry, plugin_timeout)
+            if plugin is None:
+                print(f"插件映射 {key} 格式不正确，已忽略")
+                continue
+            plugins[key] = plugin
+        # 触发序列 -> (动作类型, 参数)，优先级: 按键映射 > 插件映射 > 鼠标映射
+        actions = {key: ('mouse', position) for key, position in mouse_mappings.items()}
+        actions.update((key, ('plugin', plugin)) for key, plugin in plugins.items())
+        actions.update((key, ('hotkey', hotkey)) for key, hotkey in mappings.items())
+        
+        object.__setattr__(self, 'version', version)
+        object.__setattr__(self, 'mappings', MappingProxyType(mappings))
+        object.__setattr__(self, 'mouse_mappings', MappingProxyType(mouse_mappings))
+        object.__setattr__(self, 'plugin_mappings', MappingProxyType(plugins))
+        object.__setattr__(self, 'actions', MappingProxyType(actions))
+        # 以 "re:" 开头的模式触发序列与普通触发序列分开处理
+        literal_actions = {key: action for key, action in actions.items() if not is_pattern(key)}
+        pattern_actions = {key: action for key, action in actions.items() if is_pattern(key)}
+        object.__setattr__(self, 'triggers', frozenset(literal_actions))
+        object.__setattr__(self, 'preview_size', preview_size)
+        # 普通触发序列的前缀树，少量变更时只复制变更路径上的节点
+        trie = None
+        if previous is not None and previous.preview_size == preview_size:
+            changes = {key: action for key, action in literal_actions.items() if previous.actions.get(key) != action}
+            changes.update((key, None) for key in previous.triggers if key not in literal_actions)
+            if len(changes) <= self.INCREMENTAL_LIMIT:
+                trie = update_matcher(previous.trie, changes, preview_size) if changes else previous.trie
+        if trie is None:
+            trie = compile_matcher(literal_actions, preview_size)
+        object.__setattr__(self, 'trie', trie)
+        # 匹配器的根节点，有模式触发序列时为与前缀树合并后的 DFA 根节点
+        matcher = trie
+        patterns = {}
+        if pattern_actions:
+            try:
+                matcher = compile_patterns(trie, pattern_actions, preview_size, pattern_max_states)
+                patterns = {key: parse_pattern(key)[1] for key in pattern_actions}
+            except PatternError as e:
+                print(f"编译模式触发序列失败，模式触发序列已禁用: {e}")
+        object.__setattr__(self, 'matcher', matcher)
+        # 模式触发序列 -> 编译后的正则表达式，触发时用于取出捕获组
+        object.__setattr__(self, 'patterns', MappingProxyType(patterns))
+        # 允许按住按键自动重复输入的触发序列中出现的字符，其他按键的自动重复不参与匹配
+        object.__setattr__(self, 'repeat_keys', frozenset(
+            char.lower() for trigger in repeat_triggers if trigger in actions for char in trigger
+        ))
+        # 触发序列之间的前缀、后缀和重复冲突，耗时与触发序列总长度成线性关系，编译时一并完成
+        conflicts = tuple((kind, trigger, tuple(others), count) for kind, trigger, others, count in find_conflicts(
+            trie,
+            {key: value for key, value in mappings.items() if not is_pattern(key)},
+            {key: value for key, value in mouse_mappings.items() if not is_pattern(key)},
+            plugin_mappings={key: value for key, value in plugins.items() if not is_pattern(key)}
+        ))
+        object.__setattr__(self, 'conflicts', conflicts)
+        # 只报告上一个快照中没有的冲突，避免每次保存配置都重复输出
+        reported = set(previous.conflicts) if previous is not None else set()
+        kind_names = {'prefix': '是其他触发序列的前缀', 'suffix': '是其他触发序列的后缀', 'duplicate': '在多种映射中重复'}
+        for conflict in conflicts:
+            if conflict not in reported:
+                kind, trigger, others, count = conflict
+                print(f"触发序列冲突: {trigger} {kind_names[kind]}: {', '.join(others)}")
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("映射快照不可修改")
+
+
+def default_layer_files():
+    """默认的只读配置层: 系统配置和团队配置，按优先级从低到高排列"""
+    if sys.platform == 'win32':
+        system_file = os.path.join(os.environ.get("PROGRAMDATA", r"C:\ProgramData"), "ShortcutsEasier", "config.json")
+    else:
+        system_file = "/etc/shortcutseasier/config.json"
+    files = [system_file]
+    team_file = os.environ.get("SHORTCUTSEASIER_TEAM_CONFIG")
+    if team_file:
+        files.append(team_file)
+    return files
+
+
+class ConfigLayer:
+    """只读配置层，文件未变化时复用上次读取的内容"""
+    
+    def __init__(self, path, optional=False):
+        """初始化配置层，optional 表示该层来自用户配置中的 team_config"""
+        self.path = path
+        self.optional = optional
+        # 文件的 (修改时间, 大小)，首次 refresh() 总是读取
+        self.stat = False
+        self.data = {}
+    
+    def refresh(self):
+        """文件有变化时重新读取，返回内容是否变化"""
+        try:
+            stat = os.stat(self.path)
+            stat = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            stat = None
+        if stat == self.stat:
+            return False
+        self.stat = stat
+        self.data = {}
+        if stat is not None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.data = json.load(f)
+            except Exception as e:
+                print(f"加载配置层 {self.path} 失败: {e}")
+        return True
+
+
+def merge_layers(layers):
+    """按优先级从低到高合并配置
+
+    映射表等字典类型的配置项按条目合并，高层中值为 null 的条目删除低层中的同名条目；
+    其他配置项由高层整体覆盖。结果中的字典都是新对象，修改结果不会影响各层。
+    """
+    merged = {}
+    for layer in layers:
+        for key, value in layer.items():
+            if isinstance(value, dict):
+                section = dict(merged.get(key)) if isinstance(merged.get(key), dict) else {}
+                for name, entry in value.items():
+                    if entry is None:
+                        section.pop(name, None)
+                    else:
+                        section[name] = entry
+                merged[key] = section
+            else:
+                merged[key] = value
+    return merged
+
 
 class ConfigManager:
-    """配置管理器"""
+    """配置管理器
+
+    配置由多个层按优先级合并: 系统配置 < 团队配置 < 用户配置(config_file)。
+    低层只读，合并结果缓存，只有低层文件变化时才重新合并；界面的修改只写入
+    用户配置，并直接更新合并结果中对应的条目。
+    """
     
-    def __init__(self, config_file="config.json"):
-        """初始化配置管理器"""
+    def __init__(self, config_file="config.json", layer_files=None):
+        """初始化配置管理器，layer_files 为用户配置之下的只读配置文件，按优先级从低到高排列"""
         self.config_file = config_file
+        # 合并后的配置，其他模块通过它读取配置
         self.config = {}
+        # 用户配置层，所有修改都写入这里
+        self.user_config = {}
+        self.layers = [ConfigLayer(path) for path in (default_layer_files() if layer_files is None else layer_files)]
+        # 所有只读层合并后的结果
+        self.base_config = {}
+        # 配置修订号，每次加载或修改配置后递增
+        self.revision = 0
+        # 当前发布的映射快照及其订阅者
+        self.snapshot = MappingSnapshot(0, {}, {})
+        self.snapshot_listeners = []
         self.load_config()
     
     def load_config(self):
-        """加载配置文件"""
+        """加载配置文件，只读层只在文件变化时重新读取和合并"""
         if os.path.exists(self.config_file):
             try:
                 with open(self.config_file, 'r', encoding='utf-8') as f:
-                    self.config = json.load(f)
+                    self.user_config = json.load(f)
             except Exception as e:
                 print(f"加载配置文件失败: {e}")
-                self.config = {}
+                self.user_config = {}
+            self._refresh_layers()
+            self.config = merge_layers([self.base_config, self.user_config])
+            self.revision += 1
+            self._publish_snapshot()
         else:
             # 默认配置
-            self.config = {
+            self.user_config = {
                 "mappings": {
                     "copy": "ctrl+c",
                     "paste": "ctrl+v",
@@ -39,16 +224,68 @@ class ConfigManager:
                 },
                 "mouse_mappings": {}
             }
+            self._refresh_layers()
+            self.config = merge_layers([self.base_config, self.user_config])
             self.save_config()
     
+    def _refresh_layers(self):
+        """重新读取有变化的只读层，有变化时重新合并
+
+        用户配置中的 team_config 可以指定团队配置文件，作为优先级最高的只读层。
+        """
+        team_file = self.user_config.get("team_config")
+        if team_file and team_file not in [layer.path for layer in self.layers]:
+            self.layers = [layer for layer in self.layers if not layer.optional] + [ConfigLayer(team_file, optional=True)]
+        if any([layer.refresh() for layer in self.layers]):
+            self.base_config = merge_layers([layer.data for layer in self.layers])
+    
     def save_config(self):
-        """保存配置文件"""
+        """保存用户配置文件"""
+        self.revision += 1
+        # 先发布新快照再写文件，监听线程尽快看到变更
+        self._publish_snapshot()
         try:
             with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, ensure_ascii=False, indent=4)
+                json.dump(self.user_config, f, ensure_ascii=False, indent=4)
         except Exception as e:
             print(f"保存配置文件失败: {e}")
     
+    def apply_config(self, config):
+        """用其他进程传来的配置替换当前配置并发布快照，不写配置文件"""
+        self.config = config
+        self.revision += 1
+        self._publish_snapshot()
+    
+    def _publish_snapshot(self):
+        """编译并原子地替换映射快照，然后通知订阅者"""
+        self.snapshot = MappingSnapshot(
+            self.revision,
+            self.get_mappings(),
+            self.get_mouse_mappings(),
+            self.config.get("preview_candidates", 3),
+            self.get_plugin_mappings(),
+            self.config.get("plugin_timeout", 2.0),
+            self.config.get("repeat_triggers", ()),
+            self.config.get("pattern_max_states", 2000),
+            self.snapshot
+        )
+        for callback in self.snapshot_listeners:
+            try:
+                callback(self.snapshot)
+            except Exception as e:
+                print(f"快照回调执行失败: {e}")
+        # 快照在下次配置变更前一直存活，每次编译后移出分代回收，回收时不再反复遍历前缀树
+        gc.collect()
+        gc.freeze()
+    
+    def get_snapshot(self):
+        """获取当前映射快照"""
+        return self.snapshot
+    
+    def add_snapshot_listener(self, callback):
+        """订阅映射快照的更新"""
+        self.snapshot_listeners.append(callback)
+    
     def get_mappings(self):
         """获取所有按键映射"""
         return self.config.get("mappings", {})
@@ -57,32 +294,86 @@ class ConfigManager:
         """获取所有鼠标点击映射"""
         return self.config.get("mouse_mappings", {})
     
+    def get_plugin_mappings(self):
+        """获取所有插件映射"""
+        return self.config.get("plugin_mappings", {})
+    
+    def _set_entry(self, section, key, value):
+        """在用户配置中设置一个条目，并直接更新合并结果中的该条目"""
+        self.user_config.setdefault(section, {})[key] = value
+        self.config.setdefault(section, {})[key] = value
+        self.save_config()
+    
+    def _remove_entry(self, section, key):
+        """删除一个条目，条目来自只读层时在用户配置中写入 null 覆盖它"""
+        if key not in self.config.get(section, {}):
+            return
+        user_section = self.user_config.setdefault(section, {})
+        if key in self.base_config.get(section, {}):
+            user_section[key] = None
+        else:
+            user_section.pop(key, None)
+        del self.config[section][key]
+        self.save_config()
+    
     def add_mapping(self, key, hotkey):
         """添加按键映射"""
-        if "mappings" not in self.config:
-            self.config["mappings"] = {}
-        self.config["mappings"][key] = hotkey
-        self.save_config()
+        self._set_entry("mappings", key, hotkey)
     
     def add_mouse_mapping(self, key, position):
         """添加鼠标点击映射"""
-        if "mouse_mappings" not in self.config:
-            self.config["mouse_mappings"] = {}
         # 位置格式: "x,y" 例如: "100,200"
-        self.config["mouse_mappings"][key] = position
-        self.save_config()
+        self._set_entry("mouse_mappings", key, position)
+    
+    def add_plugin_mapping(self, key, function, source="none", output="type", timeout=None):
+        """添加插件映射，function 格式为 "模块:函数"，模块位于插件目录中"""
+        entry = {"function": function, "input": source, "output": output}
+        if timeout is not None:
+            entry["timeout"] = timeout
+        self._set_entry("plugin_mappings", key, entry)
     
     def remove_mapping(self, key):
         """删除按键映射"""
-        if "mappings" in self.config and key in self.config["mappings"]:
-            del self.config["mappings"][key]
-            self.save_config()
+        self._remove_entry("mappings", key)
     
     def remove_mouse_mapping(self, key):
         """删除鼠标点击映射"""
-        if "mouse_mappings" in self.config and key in self.config["mouse_mappings"]:
-            del self.config["mouse_mappings"][key]
-            self.save_config()
+        self._remove_entry("mouse_mappings", key)
+    
+    def remove_plugin_mapping(self, key):
+        """删除插件映射"""
+        self._remove_entry("plugin_mappings", key)
+    
+    def get_setting(self, key, default=None):
+        """获取通用设置项"""
+        return self.config.get(key, default)
+    
+    def get_usage_log_paths(self):
+        """获取触发使用记录文件和计数文件的路径，默认与配置文件位于同一目录"""
+        directory = os.path.dirname(os.path.abspath(self.config_file))
+        return (
+            self.config.get("usage_log", os.path.join(directory, "usage.log")),
+            self.config.get("usage_counters", os.path.join(directory, "usage_counters.json"))
+        )
+    
+    def get_anchor_dir(self):
+        """获取图像锚点的保存目录(绝对路径)，默认为配置文件所在目录下的 anchors"""
+        directory = os.path.dirname(os.path.abspath(self.config_file))
+        return os.path.join(directory, self.config.get("anchor_dir", "anchors"))
+    
+    def get_pacing_settings(self):
+        """获取注入节奏设置"""
+        return self.config.get("injection_pacing", {})
+    
+    def set_pacing_profile(self, window_class, delay):
+        """保存窗口类的校准注入间隔"""
+        pacing = self.user_config.setdefault("injection_pacing", {})
+        pacing.setdefault("profiles", {})[window_class] = delay
+        self.config["injection_pacing"] = merge_layers([
+            {"injection_pacing": self.base_config.get("injection_pacing", {})},
+            {"injection_pacing": pacing}
+        ])["injection_pacing"]
+        self.save_config()
     
     def update_mapping(self, old_key, new_key, hotkey):
         """更新按键映射"""
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+可重复调度的定时器模块
+用一个常驻线程代替每次新建的 threading.Timer
+"""
+
+import threading
+import time
+
+
+class DeadlineTimer:
+    """可重复调度的单线程定时器
+
+    整个生命周期只使用一个常驻线程；重新调度只更新截止时间，没有待执行
+    的任务时线程一直阻塞等待，不会周期性唤醒。
+    """
+
+    def __init__(self, callback, name="deadline-timer"):
+        """初始化定时器"""
+        self.callback = callback
+        self.name = name
+        self.condition = threading.Condition()
+        self.deadline = None
+        self.thread = None
+        self.stopped = False
+
+    def schedule(self, delay):
+        """在 delay 秒后执行回调，覆盖之前尚未执行的调度"""
+        with self.condition:
+            if self.stopped:
+                return
+            deadline = time.monotonic() + delay
+            # 新的截止时间更晚时无需唤醒线程，它醒来后会发现截止时间已推迟
+            wake = self.deadline is None or deadline < self.deadline
+            self.deadline = deadline
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self.thread.start()
+            elif wake:
+                self.condition.notify()
+
+    def cancel(self):
+        """取消尚未执行的调度"""
+        with self.condition:
+            self.deadline = None
+
+    def stop(self):
+        """停止定时器线程"""
+        with self.condition:
+            self.stopped = True
+            self.deadline = None
+            self.condition.notify()
+
+    def _run(self):
+        """定时器线程主循环"""
+        while True:
+            with self.condition:
+                while not self.stopped:
+                    if self.deadline is None:
+                        self.condition.wait()
+                        continue
+                    remaining = self.deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                if self.stopped:
+                    return
+                self.deadline = None
+            try:
+                self.callback()
+            except Exception as e:
+                print(f"定时任务执行失败: {e}")
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+端到端触发延迟基准测试模块 (Linux)
+启动 Xvfb 虚拟 X 服务器和一个 Tk 文本框作为目标程序，在本进程中用真实的
+pynput 后端运行 KeyboardManager，通过 XTest 按设定速率输入触发序列，
+测量从最后一个触发键按下到目标程序收到退格、快捷键或鼠标点击的时间，
+包括 X RECORD 监听和 XTest 注入的往返开销。
+
+需要 Xvfb、tkinter 和 pynput(及其依赖 python-xlib)。pynput 和 Xlib 在导入或
+首次连接时读取 DISPLAY，因此本模块顶层不导入它们和 keyboard_manager，只在
+Xvfb 启动并设置 DISPLAY 之后由 E2EBenchmark.setup() 导入，setup() 会检查这一点。
+虚拟 X 服务器中没有窗口管理器，setup() 显式把键盘焦点设置到目标窗口并确认。
+
+用法: python src/e2e_benchmark.py --rates 10,30,60 --count 50
+"""
+
+import argparse
+import math
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import redirect_stdout
+
+# 添加src目录到Python路径
+sys.path.append(os.path.join(os.path.dirname(__file__)))
+
+# 测试用的映射: 映射类型 -> (触发序列, 动作)
+MAPPINGS = {
+    "hotkey": ("qzh", "ctrl+m"),
+    "mouse": ("qzm", "320,240"),
+}
+SCREEN_SIZE = (640, 480)
+
+
+# ========== 目标程序 ==========
+
+def run_target():
+    """目标程序: 全屏 Tk 文本框，每收到一个按键或鼠标事件向标准输出写一行
+
+    格式为 "key 时间戳 keysym"、"keyup 时间戳 keysym" 或 "button 时间戳 x y"，
+    时间戳为 time.monotonic()，与基准进程使用同一个系统时钟。就绪时输出
+    "ready 顶层窗口ID"。
+    """
+    import tkinter as tk
+    root = tk.Tk()
+    root.geometry(f"{SCREEN_SIZE[0]}x{SCREEN_SIZE[1]}+0+0")
+    text = tk.Text(root)
+    text.pack(fill=tk.BOTH, expand=True)
+
+    def on_key(event):
+        print(f"key {time.monotonic()} {event.keysym}", flush=True)
+
+    def on_key_release(event):
+        print(f"keyup {time.monotonic()} {event.keysym}", flush=True)
+
+    def on_button(event):
+        print(f"button {time.monotonic()} {event.x_root} {event.y_root}", flush=True)
+
+    text.bind("<KeyPress>", on_key, add=True)
+    text.bind("<KeyRelease>", on_key_release, add=True)
+    text.bind("<ButtonPress>", on_button, add=True)
+
+    def ready():
+        # 窗口映射之后才能接收键盘焦点
+        root.wait_visibility()
+        text.focus_set()
+        print(f"ready {int(root.wm_frame(), 16)}", flush=True)
+
+    root.after(100, ready)
+    root.mainloop()
+
+
+# ========== 基准测试 ==========
+
+def percentile(values, fraction):
+    """按最近秩法计算百分位数"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+class XServer:
+    """Xvfb 虚拟 X 服务器"""
+
+    def __init__(self, display=None):
+        """初始化虚拟 X 服务器，display 为显示编号，默认选择第一个空闲的编号"""
+        if display is None:
+            display = next(
+                number for number in range(90, 200)
+                if not os.path.exists(f"/tmp/.X11-unix/X{number}") and not os.path.exists(f"/tmp/.X{number}-lock")
+            )
+        self.display = display
+        self.process = None
+
+    def start(self, timeout=10.0):
+        """启动 Xvfb 并等待其可以接受连接"""
+        if shutil.which("Xvfb") is None:
+            raise RuntimeError("找不到 Xvfb，请先安装 (如 apt install xvfb)")
+        self.process = subprocess.Popen(
+            ["Xvfb", f":{self.display}", "-screen", "0", f"{SCREEN_SIZE[0]}x{SCREEN_SIZE[1]}x24", "-nolisten", "tcp"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        deadline = time.monotonic() + timeout
+        while not os.path.exists(f"/tmp/.X11-unix/X{self.display}"):
+            if self.process.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError(f"Xvfb :{self.display} 启动失败")
+            time.sleep(0.05)
+        os.environ["DISPLAY"] = f":{self.display}"
+
+    def stop(self):
+        """关闭 Xvfb"""
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait()
+            self.process = None
+
+
+class Target:
+    """在子进程中运行的目标程序，后台线程把它报告的事件放入队列"""
+
+    def __init__(self):
+        self.events = queue.Queue()
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--target"],
+            stdout=subprocess.PIPE, text=True
+        )
+        fields = self.process.stdout.readline().split()
+        if len(fields) != 2 or fields[0] != "ready":
+            raise RuntimeError("目标程序启动失败")
+        # 目标程序顶层窗口的 X 窗口ID
+        self.window_id = int(fields[1])
+        threading.Thread(target=self._read, name="target-reader", daemon=True).start()
+
+    def _read(self):
+        for line in self.process.stdout:
+            fields = line.split()
+            self.events.put((fields[0], float(fields[1]), fields[2:]))
+
+    def drain(self):
+        """丢弃之前的全部事件"""
+        while True:
+            try:
+                self.events.get_nowait()
+            except queue.Empty:
+                return
+
+    def stop(self):
+        self.process.terminate()
+        self.process.wait()
+
+
+class E2EBenchmark:
+    """端到端触发延迟基准测试"""
+
+    def __init__(self, rates, count, timeout, gap):
+        """初始化基准测试
+
+        rates 为输入速率列表(键/秒)，count 为每种速率下每种映射的触发次数，
+        timeout 为等待目标程序收到结果的最长时间(秒)，gap 为两次触发之间的间隔(秒)。
+        """
+        self.rates = rates
+        self.count = count
+        self.timeout = timeout
+        self.gap = gap
+        self.config_dir = None
+        self.keyboard_manager = None
+        self.display = None
+        self.target = None
+
+    def setup(self):
+        """启动目标程序和使用真实 pynput 后端的键盘管理器"""
+        # pynput 和 Xlib 在导入时读取 DISPLAY，必须在启动 Xvfb 之后导入
+        if not os.environ.get("DISPLAY"):
+            raise RuntimeError("DISPLAY 未设置，请先启动 Xvfb")
+        early = [name for name in ("pynput", "Xlib", "keyboard_manager", "input_backend") if name in sys.modules]
+        if early:
+            raise RuntimeError(f"{', '.join(early)} 在启动 Xvfb 之前已导入，会连接到错误的显示")
+        from Xlib import X, display
+        from Xlib.ext import xtest
+        from config_manager import ConfigManager
+        from keyboard_manager import KeyboardManager
+        self.X, self.xtest = X, xtest
+
+        self.target = Target()
+        self.display = display.Display()
+        # 没有窗口管理器，不依赖焦点跟随指针: 把指针移到目标窗口中(鼠标映射点击的位置也在其中)，
+        # 并显式把键盘焦点交给目标窗口
+        xtest.fake_input(self.display, X.MotionNotify, x=SCREEN_SIZE[0] // 2, y=SCREEN_SIZE[1] // 2)
+        window = self.display.create_resource_object('window', self.target.window_id)
+        window.set_input_focus(X.RevertToParent, X.CurrentTime)
+        self.display.sync()
+        focus = self.display.get_input_focus().focus
+        focus_id = getattr(focus, 'id', focus)
+        if focus_id != self.target.window_id and not self._is_descendant(focus, self.target.window_id):
+            raise RuntimeError(f"键盘焦点不在目标窗口上(焦点窗口 {focus_id})")
+
+        self.config_dir = tempfile.mkdtemp(prefix="e2e-")
+        with redirect_stdout(sys.stderr):
+            config_manager = ConfigManager(os.path.join(self.config_dir, "config.json"), [])
+            config_manager.add_mapping(*MAPPINGS["hotkey"])
+            config_manager.add_mouse_mapping(*MAPPINGS["mouse"])
+            self.keyboard_manager = KeyboardManager(config_manager)
+            self.keyboard_manager.start_listening()
+        time.sleep(0.5)
+
+    def _is_descendant(self, window, ancestor_id):
+        """window 是否为 ancestor_id 窗口的子孙窗口"""
+        while hasattr(window, 'query_tree'):
+            parent = window.query_tree().parent
+            if not parent or parent.id == window.id:
+                return False
+            if parent.id == ancestor_id:
+                return True
+            window = parent
+        return False
+
+    def teardown(self):
+        """停止键盘管理器和目标程序"""
+        if self.keyboard_manager is not None:
+            with redirect_stdout(sys.stderr):
+                self.keyboard_manager.shutdown()
+        if self.target is not None:
+            self.target.stop()
+        if self.display is not None:
+            self.display.close()
+        if self.config_dir is not None:
+            shutil.rmtree(self.config_dir, ignore_errors=True)
+
+    def type_trigger(self, trigger, rate):
+        """用 XTest 按 rate 键/秒输入触发序列，返回最后一个按键按下的时间"""
+        X, xtest = self.X, self.xtest
+        last_press = None
+        for index, char in enumerate(trigger):
+            if index:
+                time.sleep(1.0 / rate)
+            keycode = self.display.keysym_to_keycode(ord(char))
+            xtest.fake_input(self.display, X.KeyPress, keycode)
+            self.display.sync()
+            last_press = time.monotonic()
+            xtest.fake_input(self.display, X.KeyRelease, keycode)
+            self.display.sync()
+        return last_press
+
+    def measure(self, kind, rate):
+        """触发一次映射，返回 (删除延迟, 动作延迟, 丢失的事件数)，超时未收到的延迟为 None
+
+        删除延迟为最后一个退格到达的时间，动作延迟为快捷键或鼠标点击到达的时间；
+        丢失的事件数为目标程序没有收到的触发键和退格数。
+        """
+        trigger, action = MAPPINGS[kind]
+        self.target.drain()
+        start = self.type_trigger(trigger, rate)
+        typed = backspaces = 0
+        delete_latency = action_latency = None
+        # 根据 Control 键的按下和释放事件判断快捷键中的 Ctrl 是否按住，不依赖事件的修饰键状态位
+        ctrl_down = False
+        deadline = time.monotonic() + self.timeout
+        while action_latency is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                event, timestamp, fields = self.target.events.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if event == "button":
+                action_latency = timestamp - start
+            elif fields[0] in ("Control_L", "Control_R"):
+                ctrl_down = event == "key"
+            elif event == "keyup":
+                continue
+            elif fields[0] == "BackSpace":
+                backspaces += 1
+                if backspaces == len(trigger):
+                    delete_latency = timestamp - start
+            elif kind == "hotkey" and ctrl_down and fields[0].lower() == action.split('+')[-1]:
+                action_latency = timestamp - start
+            elif len(fields[0]) == 1:
+                typed += 1
+        lost = max(0, len(trigger) - typed) + max(0, len(trigger) - backspaces)
+        return delete_latency, action_latency, lost
+
+    def run(self):
+        """按各速率运行基准测试，返回 [(速率, 映射类型, 删除延迟列表, 动作延迟列表, 失败次数, 丢失事件数, 跳过事件数)]"""
+        results = []
+        for rate in self.rates:
+            for kind in MAPPINGS:
+                deletes, actions = [], []
+                failures = lost_total = 0
+                shed_before = self.keyboard_manager.shed_count
+                for _ in range(self.count):
+                    delete_latency, action_latency, lost = self.measure(kind, rate)
+                    lost_total += lost
+                    if delete_latency is None or action_latency is None:
+                        failures += 1
+                    if delete_latency is not None:
+                        deletes.append(delete_latency)
+                    if action_latency is not None:
+                        actions.append(action_latency)
+                    time.sleep(self.gap)
+                shed = self.keyboard_manager.shed_count - shed_before
+                results.append((rate, kind, deletes, actions, failures, lost_total, shed))
+        return results
+
+
+def report(results, count):
+    """输出各速率和映射类型的延迟百分位数(毫秒)、失败次数和丢失事件数"""
+    print(f"{'速率':>6} {'类型':<7} {'阶段':<7} {'p50':>8} {'p90':>8} {'p99':>8} {'最大':>8} {'失败':>5} {'丢失':>5} {'跳过':>5}")
+    for rate, kind, deletes, actions, failures, lost, shed in results:
+        for stage, values in (("delete", deletes), (kind, actions)):
+            if values:
+                p50, p90, p99 = (percentile(values, fraction) * 1000 for fraction in (0.5, 0.9, 0.99))
+                numbers = f"{p50:8.2f} {p90:8.2f} {p99:8.2f} {max(values) * 1000:8.2f}"
+            else:
+                numbers = f"{'-':>8} {'-':>8} {'-':>8} {'-':>8}"
+            print(f"{rate:>6g} {kind:<7} {stage:<7} {numbers} {failures:>3}/{count} {lost:>5} {shed:>5}")
+
+
+def main():
+    """命令行入口，有失败的触发时返回 1"""
+    parser = argparse.ArgumentParser(description="在 Xvfb 中测量从触发键到目标程序收到结果的端到端延迟")
+    parser.add_argument('--rates', default="10,30,60", help="逗号分隔的输入速率(键/秒)")
+    parser.add_argument('--count', type=int, default=50, help="每种速率下每种映射的触发次数")
+    parser.add_argument('--timeout', type=float, default=1.0, help="等待结果的最长时间(秒)")
+    parser.add_argument('--gap', type=float, default=0.2, help="两次触发之间的间隔(秒)")
+    parser.add_argument('--display', type=int, default=None, help="Xvfb 显示编号，默认自动选择")
+    parser.add_argument('--target', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.target:
+        run_target()
+        return 0
+
+    server = XServer(args.display)
+    benchmark = E2EBenchmark([float(rate) for rate in args.rates.split(",")], args.count, args.timeout, args.gap)
+    try:
+        server.start()
+        benchmark.setup()
+        results = benchmark.run()
+    except Exception as e:
+        print(f"端到端基准测试失败: {e}")
+        return 1
+    finally:
+        benchmark.teardown()
+        server.stop()
+    report(results, args.count)
+    return 0 if all(result[4] == 0 for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
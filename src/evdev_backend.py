@@ -0,0 +1,513 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+evdev 输入后端模块 (Linux)
+直接读取 /dev/input/event* 监听键盘，通过 uinput 虚拟设备注入按键，
+不经过 X 服务器，Wayland 下同样可用，并能区分事件来自哪个键盘
+
+需要 python-evdev，当前用户需要有 /dev/input/event* 的读权限和 /dev/uinput
+的写权限(通常加入 input 组即可)。
+
+自检: python src/evdev_backend.py
+"""
+
+import enum
+import functools
+import os
+import selectors
+import sys
+import threading
+import time
+
+from evdev import AbsInfo, InputDevice, UInput, ecodes, list_devices
+
+# 注入设备的名称，监听器据此识别自身注入的事件
+INJECTOR_NAME = "ShortcutsEasier injector"
+POINTER_NAME = "ShortcutsEasier pointer"
+LOOPBACK_NAME = "ShortcutsEasier loopback test"
+
+
+class KeyCode:
+    """与 pynput.keyboard.KeyCode 接口一致的按键，vk 为 evdev 键码"""
+
+    def __init__(self, vk=None, char=None):
+        self.vk = vk
+        self.char = char
+
+    @classmethod
+    def from_char(cls, char):
+        return cls(char=char)
+
+    @classmethod
+    def from_vk(cls, vk):
+        return cls(vk=vk)
+
+    def __eq__(self, other):
+        if not isinstance(other, KeyCode):
+            return False
+        if self.char is not None and other.char is not None:
+            return self.char == other.char
+        return self.vk == other.vk
+
+    def __hash__(self):
+        return hash(self.char) if self.char is not None else hash(self.vk)
+
+    def __repr__(self):
+        return repr(self.char) if self.char is not None else f"<{self.vk}>"
+
+
+# 特殊键名称 -> evdev 键码。左右区分的名称排在前面，Key.ctrl 等成为
+# Key.ctrl_l 的别名，与监听器报告的按键相等
+_SPECIAL_KEYS = [
+    ('alt_l', ecodes.KEY_LEFTALT), ('alt_r', ecodes.KEY_RIGHTALT), ('alt_gr', ecodes.KEY_RIGHTALT),
+    ('alt', ecodes.KEY_LEFTALT),
+    ('ctrl_l', ecodes.KEY_LEFTCTRL), ('ctrl_r', ecodes.KEY_RIGHTCTRL), ('ctrl', ecodes.KEY_LEFTCTRL),
+    ('shift_l', ecodes.KEY_LEFTSHIFT), ('shift_r', ecodes.KEY_RIGHTSHIFT), ('shift', ecodes.KEY_LEFTSHIFT),
+    ('cmd_l', ecodes.KEY_LEFTMETA), ('cmd_r', ecodes.KEY_RIGHTMETA), ('cmd', ecodes.KEY_LEFTMETA),
+    ('backspace', ecodes.KEY_BACKSPACE), ('caps_lock', ecodes.KEY_CAPSLOCK), ('delete', ecodes.KEY_DELETE),
+    ('down', ecodes.KEY_DOWN), ('end', ecodes.KEY_END), ('enter', ecodes.KEY_ENTER), ('esc', ecodes.KEY_ESC),
+    ('home', ecodes.KEY_HOME), ('insert', ecodes.KEY_INSERT), ('left', ecodes.KEY_LEFT),
+    ('menu', ecodes.KEY_COMPOSE), ('num_lock', ecodes.KEY_NUMLOCK), ('page_down', ecodes.KEY_PAGEDOWN),
+    ('page_up', ecodes.KEY_PAGEUP), ('pause', ecodes.KEY_PAUSE), ('print_screen', ecodes.KEY_SYSRQ),
+    ('right', ecodes.KEY_RIGHT), ('scroll_lock', ecodes.KEY_SCROLLLOCK), ('space', ecodes.KEY_SPACE),
+    ('tab', ecodes.KEY_TAB), ('up', ecodes.KEY_UP),
+] + [(f'f{i}', getattr(ecodes, f'KEY_F{i}')) for i in range(1, 21)]
+
+Key = enum.Enum('Key', [(name, KeyCode(vk=code)) for name, code in _SPECIAL_KEYS])
+
+# 字符 -> (键码, 是否需要 Shift)，按美式键盘布局
+CHAR_CODES = {}
+for _char in "abcdefghijklmnopqrstuvwxyz":
+    CHAR_CODES[_char] = (getattr(ecodes, f'KEY_{_char.upper()}'), False)
+    CHAR_CODES[_char.upper()] = (getattr(ecodes, f'KEY_{_char.upper()}'), True)
+for _char, _name, _shifted in [
+    ('1', 'KEY_1', '!'), ('2', 'KEY_2', '@'), ('3', 'KEY_3', '#'), ('4', 'KEY_4', '$'),
+    ('5', 'KEY_5', '%'), ('6', 'KEY_6', '^'), ('7', 'KEY_7', '&'), ('8', 'KEY_8', '*'),
+    ('9', 'KEY_9', '('), ('0', 'KEY_0', ')'), ('-', 'KEY_MINUS', '_'), ('=', 'KEY_EQUAL', '+'),
+    ('[', 'KEY_LEFTBRACE', '{'), (']', 'KEY_RIGHTBRACE', '}'), ('\\', 'KEY_BACKSLASH', '|'),
+    (';', 'KEY_SEMICOLON', ':'), ("'", 'KEY_APOSTROPHE', '"'), (',', 'KEY_COMMA', '<'),
+    ('.', 'KEY_DOT', '>'), ('/', 'KEY_SLASH', '?'), ('`', 'KEY_GRAVE', '~'),
+]:
+    CHAR_CODES[_char] = (getattr(ecodes, _name), False)
+    CHAR_CODES[_shifted] = (getattr(ecodes, _name), True)
+CHAR_CODES[' '] = (ecodes.KEY_SPACE, False)
+CHAR_CODES['\n'] = (ecodes.KEY_ENTER, False)
+CHAR_CODES['\t'] = (ecodes.KEY_TAB, False)
+
+# 键码 -> (不按 Shift 的字符, 按 Shift 的字符)
+CODE_CHARS = {}
+for _char, (_code, _shift) in CHAR_CODES.items():
+    if _char in ' \n\t':
+        continue
+    pair = CODE_CHARS.setdefault(_code, [None, None])
+    pair[1 if _shift else 0] = _char
+# 键码 -> 特殊键，别名不会出现在枚举迭代中
+CODE_KEYS = {member.value.vk: member for member in Key}
+SHIFT_CODES = (ecodes.KEY_LEFTSHIFT, ecodes.KEY_RIGHTSHIFT)
+
+
+def is_keyboard(device):
+    """设备是否为键盘(能产生字母键事件)"""
+    keys = device.capabilities().get(ecodes.EV_KEY, [])
+    return ecodes.KEY_A in keys and ecodes.KEY_Z in keys
+
+
+class DeviceStats:
+    """单个输入设备的统计: 事件数和从内核时间戳到回调完成的延迟"""
+
+    __slots__ = ('name', 'presses', 'releases', 'repeats', 'latency_total', 'latency_max')
+
+    def __init__(self, name):
+        self.name = name
+        self.presses = 0
+        self.releases = 0
+        self.repeats = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def as_dict(self):
+        """转换为便于输出的字典，延迟单位为毫秒"""
+        events = self.presses + self.releases + self.repeats
+        return {
+            "name": self.name,
+            "presses": self.presses,
+            "releases": self.releases,
+            "repeats": self.repeats,
+            "mean_latency_ms": self.latency_total / events * 1000 if events else 0.0,
+            "max_latency_ms": self.latency_max * 1000,
+        }
+
+
+class Listener:
+    """evdev 键盘监听器，接口与 pynput.keyboard.Listener 一致
+
+    一个线程通过 selectors 同时等待所有键盘设备，没有事件时不会唤醒。
+    自身注入设备的事件同样会被读取，KeyboardManager 依靠这些回显判断
+    注入事件是否丢失。
+    """
+
+    def __init__(self, on_press=None, on_release=None, backend=None, devices=None, **kwargs):
+        self.on_press = on_press
+        self.on_release = on_release
+        self.backend = backend
+        # 只监听这些设备(路径或名称)，None 表示所有键盘
+        self.device_filter = devices
+        self.devices = {}
+        self.stats = {}
+        self.shift_down = set()
+        self.selector = None
+        self.thread = None
+        self.running = False
+        self._wake_read, self._wake_write = os.pipe()
+
+    def _open_devices(self):
+        """打开所有要监听的键盘设备"""
+        for path in list_devices():
+            try:
+                device = InputDevice(path)
+            except OSError as e:
+                print(f"打开输入设备 {path} 失败: {e}")
+                continue
+            if self.device_filter is not None:
+                wanted = path in self.device_filter or device.name in self.device_filter
+            else:
+                wanted = is_keyboard(device) and device.name != LOOPBACK_NAME
+            if wanted:
+                self.devices[device.fd] = device
+                self.stats[device.path] = DeviceStats(device.name)
+            else:
+                device.close()
+        if not self.devices:
+            print("没有找到可读取的键盘设备，请检查 /dev/input/event* 的读权限")
+
+    def start(self):
+        """启动监听线程"""
+        self._open_devices()
+        self.selector = selectors.DefaultSelector()
+        for device in self.devices.values():
+            self.selector.register(device.fd, selectors.EVENT_READ, device)
+        self.selector.register(self._wake_read, selectors.EVENT_READ, None)
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="evdev-listener", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """停止监听线程"""
+        self.running = False
+        os.write(self._wake_write, b'x')
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1.0)
+
+    def join(self, timeout=None):
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def get_stats(self):
+        """获取每个设备的统计: 路径 -> 统计字典"""
+        return {path: stats.as_dict() for path, stats in self.stats.items()}
+
+    def _run(self):
+        """监听线程主循环"""
+        try:
+            while self.running:
+                for selector_key, _ in self.selector.select():
+                    device = selector_key.data
+                    if device is None:
+                        continue
+                    try:
+                        for event in device.read():
+                            if event.type == ecodes.EV_KEY:
+                                self._dispatch(device, event)
+                    except BlockingIOError:
+                        pass
+                    except OSError as e:
+                        # 设备被拔出
+                        print(f"输入设备 {device.path} 已断开: {e}")
+                        self.selector.unregister(device.fd)
+                        del self.devices[device.fd]
+        finally:
+            self.selector.close()
+            for device in self.devices.values():
+                device.close()
+            self.devices.clear()
+            os.close(self._wake_read)
+            os.close(self._wake_write)
+
+    def _dispatch(self, device, event):
+        """把一个按键事件转换为 pynput 风格的回调"""
+        code, value = event.code, event.value
+        # 注入设备为输入大写字母等字符自动附加的 Shift 不报告给回调
+        if self.backend is not None and device.name == INJECTOR_NAME and self.backend.consume_synthetic(code, value):
+            return
+        if code in SHIFT_CODES:
+            if value:
+                self.shift_down.add(code)
+            else:
+                self.shift_down.discard(code)
+        key = self._to_key(code)
+        stats = self.stats[device.path]
+        # value: 1 按下, 2 自动重复, 0 释放
+        if value:
+            if value == 2:
+                stats.repeats += 1
+            else:
+                stats.presses += 1
+            if self.on_press:
+                self.on_press(key)
+        else:
+            stats.releases += 1
+            if self.on_release:
+                self.on_release(key)
+        latency = time.time() - event.timestamp()
+        stats.latency_total += latency
+        if latency > stats.latency_max:
+            stats.latency_max = latency
+
+    def _to_key(self, code):
+        """键码转换为按键对象"""
+        member = CODE_KEYS.get(code)
+        if member is not None:
+            return member
+        chars = CODE_CHARS.get(code)
+        if chars is not None:
+            char = chars[1] if self.shift_down and chars[1] else chars[0]
+            return KeyCode(vk=code, char=char)
+        return KeyCode(vk=code)
+
+
+class Controller:
+    """uinput 键盘控制器，接口与 pynput.keyboard.Controller 一致"""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def _resolve(self, key):
+        """按键转换为 (键码, 是否需要 Shift)"""
+        if isinstance(key, str):
+            if key not in CHAR_CODES:
+                raise ValueError(f"无法通过 uinput 输入字符: {key!r}")
+            return CHAR_CODES[key]
+        if isinstance(key, Key):
+            return key.value.vk, False
+        if key.char is not None and key.char in CHAR_CODES:
+            return CHAR_CODES[key.char]
+        return key.vk, False
+
+    def press(self, key):
+        code, shift = self._resolve(key)
+        self.backend.write_key(code, 1, shift)
+
+    def release(self, key):
+        code, shift = self._resolve(key)
+        self.backend.write_key(code, 0, shift)
+
+
+class Button(enum.Enum):
+    """与 pynput.mouse.Button 接口一致的鼠标按键"""
+    left = ecodes.BTN_LEFT
+    right = ecodes.BTN_RIGHT
+    middle = ecodes.BTN_MIDDLE
+
+
+class MouseController:
+    """uinput 绝对坐标鼠标控制器
+
+    不经过显示服务器就无法读取指针位置，position 返回最后一次设置的位置。
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    @property
+    def position(self):
+        return self.backend.pointer_position
+
+    @position.setter
+    def position(self, position):
+        self.backend.move_pointer(*position)
+
+    def click(self, button, count=1):
+        for _ in range(count):
+            self.backend.write_button(button.value, 1)
+            self.backend.write_button(button.value, 0)
+
+
+class _Namespace:
+    """用于组装后端的简单命名空间"""
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class EvdevBackend:
+    """evdev/uinput 输入后端，接口与 PynputBackend 一致"""
+
+    name = "evdev"
+
+    def __init__(self, devices=None, screen_size=(1920, 1080)):
+        """初始化 evdev 输入后端，devices 为要监听的设备路径或名称"""
+        self.lock = threading.Lock()
+        key_codes = sorted({code for code, _ in CHAR_CODES.values()} | {code for _, code in _SPECIAL_KEYS})
+        # 所有控制器共用一个注入设备，避免每次动作都创建虚拟设备
+        self.injector = UInput({ecodes.EV_KEY: key_codes}, name=INJECTOR_NAME)
+        self.screen_size = screen_size
+        # 默认监听所有键盘设备，包括注入设备，能收到注入事件的回显
+        self.echoes_injected = devices is None or INJECTOR_NAME in devices
+        self.pointer = None
+        self.pointer_position = (0, 0)
+        # 注入设备附加的 Shift 事件: (键码, 值) -> 待过滤次数
+        self.synthetic = {}
+        self.listeners = []
+
+        def create_listener(**kwargs):
+            listener = Listener(backend=self, devices=devices, **kwargs)
+            self.listeners.append(listener)
+            return listener
+
+        self.keyboard = _Namespace(
+            Key=Key,
+            KeyCode=KeyCode,
+            Listener=create_listener,
+            Controller=functools.partial(Controller, self),
+        )
+        self.mouse = _Namespace(
+            Button=Button,
+            Controller=functools.partial(MouseController, self),
+        )
+
+    def write_key(self, code, value, shift=False):
+        """通过注入设备写入一个按键事件"""
+        with self.lock:
+            if shift and value:
+                self._write_synthetic(ecodes.KEY_LEFTSHIFT, 1)
+            self.injector.write(ecodes.EV_KEY, code, value)
+            if shift and not value:
+                self._write_synthetic(ecodes.KEY_LEFTSHIFT, 0)
+            self.injector.syn()
+
+    def _write_synthetic(self, code, value):
+        """写入一个需要在监听器中过滤的附加事件"""
+        self.synthetic[(code, value)] = self.synthetic.get((code, value), 0) + 1
+        self.injector.write(ecodes.EV_KEY, code, value)
+
+    def consume_synthetic(self, code, value):
+        """监听器收到的注入设备事件是否为附加事件，是则消耗一次"""
+        with self.lock:
+            count = self.synthetic.get((code, value))
+            if not count:
+                return False
+            if count == 1:
+                del self.synthetic[(code, value)]
+            else:
+                self.synthetic[(code, value)] = count - 1
+            return True
+
+    def _ensure_pointer(self):
+        """创建绝对坐标指针设备"""
+        if self.pointer is None:
+            width, height = self.screen_size
+            self.pointer = UInput({
+                ecodes.EV_KEY: [ecodes.BTN_LEFT, ecodes.BTN_RIGHT, ecodes.BTN_MIDDLE],
+                ecodes.EV_ABS: [
+                    (ecodes.ABS_X, AbsInfo(0, 0, width - 1, 0, 0, 0)),
+                    (ecodes.ABS_Y, AbsInfo(0, 0, height - 1, 0, 0, 0)),
+                ],
+            }, name=POINTER_NAME)
+        return self.pointer
+
+    def move_pointer(self, x, y):
+        """移动指针到屏幕坐标"""
+        with self.lock:
+            pointer = self._ensure_pointer()
+            pointer.write(ecodes.EV_ABS, ecodes.ABS_X, int(x))
+            pointer.write(ecodes.EV_ABS, ecodes.ABS_Y, int(y))
+            pointer.syn()
+            self.pointer_position = (int(x), int(y))
+
+    def write_button(self, code, value):
+        """写入一个鼠标按键事件"""
+        with self.lock:
+            pointer = self._ensure_pointer()
+            pointer.write(ecodes.EV_KEY, code, value)
+            pointer.syn()
+
+    def get_device_stats(self):
+        """获取所有监听器的设备统计: 路径 -> 统计字典"""
+        stats = {}
+        for listener in self.listeners:
+            stats.update(listener.get_stats())
+        return stats
+
+    def close(self):
+        """关闭虚拟设备"""
+        self.injector.close()
+        if self.pointer is not None:
+            self.pointer.close()
+
+
+# ========== 自检 ==========
+
+def self_test(rounds=200):
+    """用 uinput 回环设备检查监听和注入，返回是否通过
+
+    1. 创建一个回环测试键盘，写入按键序列，检查监听器按顺序收到且字符正确；
+    2. 通过注入设备输入文本，检查监听器收到的回显与输入一致(附加的 Shift 被过滤)。
+    """
+    backend = EvdevBackend()
+    loopback = UInput({ecodes.EV_KEY: sorted({code for code, _ in CHAR_CODES.values()})}, name=LOOPBACK_NAME)
+    received = []
+    done = threading.Event()
+    expected_count = [0]
+
+    def on_press(key):
+        received.append(key.char if getattr(key, 'char', None) else key.name)
+        if len(received) >= expected_count[0]:
+            done.set()
+
+    # 等待 udev 创建设备节点
+    time.sleep(0.5)
+    listener = backend.keyboard.Listener(on_press=on_press)
+    listener.device_filter = [LOOPBACK_NAME, INJECTOR_NAME]
+    listener.start()
+    time.sleep(0.2)
+
+    ok = True
+    # 回环设备: 逐个写入按键
+    sample = "abcxyz0123"
+    expected_count[0] = rounds * len(sample)
+    for _ in range(rounds):
+        for char in sample:
+            code, _ = CHAR_CODES[char]
+            loopback.write(ecodes.EV_KEY, code, 1)
+            loopback.write(ecodes.EV_KEY, code, 0)
+            loopback.syn()
+    if not done.wait(5.0) or "".join(received) != sample * rounds:
+        print(f"失败: 回环设备写入 {expected_count[0]} 个按键，监听器收到 {len(received)} 个")
+        ok = False
+
+    # 注入设备: 输入包含大写字母和符号的文本
+    received.clear()
+    done.clear()
+    text = "Hello, World!"
+    expected_count[0] = len(text)
+    controller = backend.keyboard.Controller()
+    for char in text:
+        controller.press(char)
+        controller.release(char)
+    if not done.wait(5.0) or "".join(received) != text:
+        print(f"失败: 注入 {text!r}，监听器收到 {''.join(map(str, received))!r}")
+        ok = False
+
+    for path, stats in listener.get_stats().items():
+        print(f"{path} ({stats['name']}): 按下 {stats['presses']}, 释放 {stats['releases']}, "
+              f"平均延迟 {stats['mean_latency_ms']:.3f}ms, 最大延迟 {stats['max_latency_ms']:.3f}ms")
+    listener.stop()
+    loopback.close()
+    backend.close()
+    print("通过" if ok else "自检失败")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if self_test() else 1)
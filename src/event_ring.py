@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+共享内存事件环模块
+键盘钩子进程向界面进程单向传递悬浮窗口和状态事件的单生产者单消费者环形缓冲区
+"""
+
+import struct
+from multiprocessing import shared_memory
+
+
+class EventRing:
+    """共享内存事件环
+
+    头部依次为写序号、读序号和丢弃计数，之后是 capacity 个固定大小的槽，
+    每个槽为 事件类型(1字节) + 长度(2字节) + UTF-8 文本。写序号只由生产者
+    修改，读序号只由消费者修改，因此不需要跨进程锁。环满时丢弃新事件并计数，
+    生产者永远不会等待消费者。
+    """
+
+    HEADER = struct.Struct('<QQQ')
+    SLOT_HEADER = struct.Struct('<BH')
+
+    def __init__(self, name=None, capacity=256, slot_size=512):
+        """创建(name 为 None 时)或连接到共享内存事件环"""
+        self.capacity = capacity
+        self.slot_size = slot_size
+        self.payload_size = slot_size - self.SLOT_HEADER.size
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=self.HEADER.size + capacity * slot_size)
+            self.HEADER.pack_into(self.shm.buf, 0, 0, 0, 0)
+        else:
+            # 子进程与创建方共用同一个资源跟踪器，由创建方负责删除
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+
+    def push(self, kind, text=""):
+        """写入一个事件，环满时丢弃并返回 False"""
+        buf = self.shm.buf
+        write, read, dropped = self.HEADER.unpack_from(buf, 0)
+        if write - read >= self.capacity:
+            struct.pack_into('<Q', buf, 16, dropped + 1)
+            return False
+        payload = text.encode('utf-8')[:self.payload_size]
+        offset = self.HEADER.size + (write % self.capacity) * self.slot_size
+        self.SLOT_HEADER.pack_into(buf, offset, kind, len(payload))
+        start = offset + self.SLOT_HEADER.size
+        buf[start:start + len(payload)] = payload
+        # 槽写完后才发布写序号
+        struct.pack_into('<Q', buf, 0, write + 1)
+        return True
+
+    def pop_all(self):
+        """取出所有未读事件，返回 [(事件类型, 文本)]"""
+        buf = self.shm.buf
+        write, read, _ = self.HEADER.unpack_from(buf, 0)
+        events = []
+        while read < write:
+            offset = self.HEADER.size + (read % self.capacity) * self.slot_size
+            kind, length = self.SLOT_HEADER.unpack_from(buf, offset)
+            start = offset + self.SLOT_HEADER.size
+            # 截断可能切开多字节字符
+            events.append((kind, bytes(buf[start:start + length]).decode('utf-8', errors='ignore')))
+            read += 1
+        struct.pack_into('<Q', buf, 8, read)
+        return events
+
+    def reset(self):
+        """清空事件环，只能在没有生产者时调用"""
+        self.HEADER.pack_into(self.shm.buf, 0, 0, 0, 0)
+
+    def get_dropped(self):
+        """获取因环满丢弃的事件数"""
+        return self.HEADER.unpack_from(self.shm.buf, 0)[2]
+
+    def close(self):
+        """断开共享内存，创建方同时删除它"""
+        try:
+            self.shm.close()
+            if self.owner:
+                self.shm.unlink()
+        except Exception as e:
+            print(f"关闭共享内存事件环失败: {e}")
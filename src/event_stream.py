@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+事件流模块
+通过本地套接字(Linux/macOS 为 Unix 域套接字，Windows 为只绑定本机地址的
+TCP 端口)以每行一个 JSON 对象的格式推送触发、延迟和状态变化事件，
+供外部监控程序订阅。
+
+订阅方连接后先发送一行订阅请求，例如 {"types": ["trigger", "latency"]}，
+省略 types 或发送空行表示订阅全部事件。之后每个事件一行:
+{"type": "trigger", "time": 1700000000.0, "trigger": "copy", "kind": "hotkey"}
+"""
+
+import json
+import os
+import select
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+
+# 事件类型
+EVENT_TYPES = ("trigger", "latency", "status", "ring_overflow")
+# Windows 上使用的本机端口
+DEFAULT_PORT = 47614
+# 没有事件时检查订阅方是否已断开的间隔(秒)
+PROBE_INTERVAL = 1.0
+
+
+def _socket_path():
+    """Unix 域套接字路径，按用户区分"""
+    directory = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(directory, f"shortcutseasier-{os.getuid()}-events.sock")
+
+
+def _use_unix_socket():
+    return hasattr(socket, "AF_UNIX") and sys.platform != "win32"
+
+
+def _is_listening(path):
+    """Unix 域套接字文件上是否有进程在监听，连接被拒绝说明是残留的文件"""
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    probe.settimeout(0.5)
+    try:
+        probe.connect(path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        return False
+    except OSError:
+        # 无法判断时按仍在使用处理，不删除别人的套接字
+        return True
+    finally:
+        probe.close()
+    return True
+
+
+class _Event:
+    """一个事件，第一次发送时才序列化，多个订阅方共用序列化结果"""
+
+    __slots__ = ('type', 'time', 'fields', 'line')
+
+    def __init__(self, event_type, fields):
+        self.type = event_type
+        self.time = time.time()
+        self.fields = fields
+        self.line = None
+
+    def encode(self):
+        """序列化为一行 JSON"""
+        line = self.line
+        if line is None:
+            data = {"type": self.type, "time": self.time}
+            data.update(self.fields)
+            line = self.line = (json.dumps(data, ensure_ascii=False) + "\n").encode('utf-8')
+        return line
+
+
+class _Subscriber:
+    """一个订阅方
+
+    事件放入有界队列，队列满时丢弃最旧的事件并计数；发送线程等待新事件写入套接字，
+    写得慢的订阅方只会丢失自己的事件，不会阻塞发布事件的线程。键盘钩子和动作线程
+    都会发布事件，队列和丢弃计数由 lock 保护，锁内只做入队和出队。
+    """
+
+    def __init__(self, conn, types, queue_size):
+        self.conn = conn
+        self.types = types
+        self.queue = deque(maxlen=queue_size)
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.dropped = 0
+        self.closed = False
+
+    def push(self, event):
+        """放入一个事件，在发布事件的线程中调用"""
+        with self.lock:
+            if len(self.queue) == self.queue.maxlen:
+                self.dropped += 1
+            self.queue.append(event)
+        self.ready.set()
+
+    def take(self):
+        """取出全部事件和丢弃计数"""
+        with self.lock:
+            events = list(self.queue)
+            self.queue.clear()
+            dropped, self.dropped = self.dropped, 0
+        return events, dropped
+
+    def peer_closed(self):
+        """订阅方是否已关闭连接
+
+        订阅方在订阅请求之后不再发送数据，套接字可读说明对方已关闭(读到 EOF)
+        或连接出错；多余的数据读出后丢弃。
+        """
+        try:
+            readable, _, _ = select.select([self.conn], [], [], 0)
+            if not readable:
+                return False
+            return not self.conn.recv(4096)
+        except (OSError, ValueError):
+            return True
+
+    def run(self):
+        """发送线程: 批量取出事件写入套接字，连接断开时返回
+
+        长时间没有事件时 sendall() 发现不了断开的连接，因此等待事件超时后
+        检查一次连接，订阅方断开后线程退出并由 _subscribe() 关闭套接字。
+        """
+        while not self.closed:
+            if not self.ready.wait(PROBE_INTERVAL):
+                if self.peer_closed():
+                    return
+                continue
+            self.ready.clear()
+            events, dropped = self.take()
+            lines = [event.encode() for event in events]
+            if dropped:
+                lines.insert(0, _Event("dropped", {"count": dropped}).encode())
+            if not lines:
+                continue
+            try:
+                self.conn.sendall(b"".join(lines))
+            except OSError:
+                return
+
+    def close(self):
+        self.closed = True
+        self.ready.set()
+        try:
+            self.conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.conn.close()
+
+
+class EventStream:
+    """事件流服务器
+
+    publish() 在键盘钩子和动作线程中调用: 没有订阅方需要该类型时立即返回，
+    不构造事件也不序列化；否则只把事件放入各订阅方的队列，序列化和发送都在
+    订阅方各自的发送线程中完成。
+    """
+
+    def __init__(self, queue_size=256, port=DEFAULT_PORT):
+        """初始化事件流，queue_size 为每个订阅方最多缓存的事件数"""
+        self.queue_size = queue_size
+        self.port = port
+        self.sock = None
+        self.path = None
+        self.lock = threading.Lock()
+        self.subscribers = ()
+        # 至少有一个订阅方需要的事件类型，publish() 只读取它，不加锁
+        self.wanted = frozenset()
+
+    def start(self):
+        """开始监听订阅连接，失败时返回 False"""
+        try:
+            if _use_unix_socket():
+                path = _socket_path()
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                try:
+                    sock.bind(path)
+                except OSError:
+                    if _is_listening(path):
+                        sock.close()
+                        print(f"启动事件流失败: 已有进程在 {path} 上提供事件流")
+                        return False
+                    # 上次异常退出(如钩子进程被杀死)留下的套接字文件
+                    os.unlink(path)
+                    sock.bind(path)
+                os.chmod(path, 0o600)
+                self.path = path
+            else:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                if hasattr(socket, "SO_EXCLUSIVEADDRUSE"):
+                    sock.setsockopt(socket.SOL_SOCKET, socket.SO_EXCLUSIVEADDRUSE, 1)
+                sock.bind(("127.0.0.1", self.port))
+            sock.listen(4)
+        except OSError as e:
+            print(f"启动事件流失败: {e}")
+            return False
+        self.sock = sock
+        threading.Thread(target=self._serve, name="event-stream", daemon=True).start()
+        return True
+
+    def _serve(self):
+        """接收订阅连接"""
+        sock = self.sock
+        while True:
+            try:
+                conn, _ = sock.accept()
+            except OSError:
+                # 套接字已关闭
+                return
+            threading.Thread(target=self._subscribe, args=(conn,), name="event-subscriber", daemon=True).start()
+
+    def _subscribe(self, conn):
+        """读取订阅请求，然后持续发送事件直到连接断开"""
+        try:
+            conn.settimeout(5.0)
+            request = conn.makefile('r', encoding='utf-8').readline().strip()
+            conn.settimeout(None)
+            types = json.loads(request).get("types") if request else None
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"读取事件订阅请求失败: {e}")
+            conn.close()
+            return
+        subscriber = _Subscriber(conn, frozenset(types or EVENT_TYPES), self.queue_size)
+        self._update(add=subscriber)
+        try:
+            subscriber.run()
+        finally:
+            self._update(remove=subscriber)
+            subscriber.close()
+
+    def _update(self, add=None, remove=None):
+        """替换订阅方列表和需要的事件类型，发布线程始终读到完整的一组"""
+        with self.lock:
+            subscribers = [s for s in self.subscribers if s is not remove]
+            if add is not None:
+                subscribers.append(add)
+            self.subscribers = tuple(subscribers)
+            self.wanted = frozenset().union(*[s.types for s in subscribers])
+
+    def publish(self, event_type, **fields):
+        """发布一个事件"""
+        if event_type not in self.wanted:
+            return
+        event = _Event(event_type, fields)
+        for subscriber in self.subscribers:
+            if event_type in subscriber.types:
+                subscriber.push(event)
+
+    def close(self):
+        """关闭服务器和所有订阅连接"""
+        if self.sock is not None:
+            try:
+                # 唤醒阻塞在 accept() 中的线程
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.sock.close()
+            self.sock = None
+        for subscriber in self.subscribers:
+            subscriber.close()
+        self._update()
+        if self.path is not None:
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+            self.path = None
+
+
+def main():
+    """命令行入口: 订阅正在运行的实例的事件并输出"""
+    import argparse
+    parser = argparse.ArgumentParser(description="订阅事件流并逐行输出")
+    parser.add_argument('--types', default="", help="逗号分隔的事件类型，默认全部: " + ",".join(EVENT_TYPES))
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="Windows 上的本机端口")
+    args = parser.parse_args()
+    if _use_unix_socket():
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        address = _socket_path()
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        address = ("127.0.0.1", args.port)
+    try:
+        sock.connect(address)
+    except OSError as e:
+        print(f"连接事件流失败: {e}")
+        return 1
+    types = [name for name in args.types.split(",") if name]
+    with sock:
+        sock.sendall((json.dumps({"types": types} if types else {}) + "\n").encode('utf-8'))
+        try:
+            for line in sock.makefile('r', encoding='utf-8'):
+                print(line, end="", flush=True)
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+键盘钩子进程模块
+把键盘监听和匹配放到一个只做这件事的子进程中，界面进程的 Tk、悬浮窗口
+和垃圾回收不会再拖慢全局键盘钩子；界面进程退出(包括被强制结束)时钩子进程随之退出，
+不会留下无法停止的键盘钩子。钩子进程总是以 spawn 方式启动，不继承界面进程的
+单实例锁、命令套接字和正在运行的 Tk、插件进程池线程
+"""
+
+import multiprocessing
+import multiprocessing.connection
+import os
+import sys
+import threading
+import time
+
+# 添加src目录到Python路径
+sys.path.append(os.path.join(os.path.dirname(__file__)))
+
+from event_ring import EventRing
+from injection_pacer import InjectionPacer
+from input_backend import create_backend
+from trace_recorder import TraceRecorder
+
+# 钩子进程发往界面进程的事件类型
+EVENT_STATUS = 1
+EVENT_OVERLAY = 2
+EVENT_CANDIDATES = 3
+EVENT_MOUSE_POSITION = 4
+
+
+def hook_main(config_file, config, ring_name, ring_capacity, ring_slot_size, notify, conn,
+              trace_enabled, trace_seconds):
+    """钩子子进程入口
+
+    事件通过共享内存事件环发给界面进程，每写入一个事件释放一次 notify
+    信号量；界面进程通过 conn 发来控制命令和配置更新。事件环满时丢弃的事件
+    在溢出开始和结束时通过事件流的 ring_overflow 事件报告。
+    """
+    from config_manager import ConfigManager
+    from keyboard_manager import KeyboardManager
+
+    ring = EventRing(ring_name, ring_capacity, ring_slot_size)
+    # 本次溢出开始前的丢弃计数，没有溢出时为 None
+    overflow_base = None
+
+    def emit(kind, text=""):
+        nonlocal overflow_base
+        if ring.push(kind, text):
+            notify.release()
+            if overflow_base is not None:
+                dropped = ring.get_dropped() - overflow_base
+                overflow_base = None
+                print(f"界面进程没有及时取走事件，事件环溢出期间丢弃了 {dropped} 个事件")
+                keyboard_manager.event_stream.publish("ring_overflow", active=False, dropped=dropped)
+        elif overflow_base is None:
+            overflow_base = ring.get_dropped() - 1
+            keyboard_manager.event_stream.publish("ring_overflow", active=True, dropped=1)
+
+    config_manager = ConfigManager(config_file)
+    config_manager.apply_config(config)
+    keyboard_manager = KeyboardManager(config_manager)
+    keyboard_manager.tracer.enabled = trace_enabled
+    if trace_seconds is not None:
+        keyboard_manager.trace_dump_seconds = trace_seconds
+    keyboard_manager.set_status_callback(lambda is_active: emit(EVENT_STATUS, "1" if is_active else "0"))
+    keyboard_manager.set_overlay_callback(lambda text: emit(EVENT_OVERLAY, text))
+    keyboard_manager.set_candidates_callback(lambda preview: emit(EVENT_CANDIDATES, preview))
+    keyboard_manager.set_get_mouse_position_callback(lambda: emit(EVENT_MOUSE_POSITION))
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            # 界面进程已退出，没有其他进程可以停止钩子，也无法再持有单实例锁，钩子进程随之退出
+            print("界面进程已退出，键盘钩子进程退出")
+            break
+        command = message[0]
+        try:
+            if command == "config":
+                config_manager.apply_config(message[1])
+                # 界面进程中校准的注入间隔
+                profiles = config_manager.get_pacing_settings().get("profiles", {})
+                pacer = keyboard_manager.injection_pacer
+                for window_class, delay in profiles.items():
+                    # 只更新变化的下限，其他配置变更不清除已有的退避
+                    if window_class not in pacer.profiles or pacer.profiles[window_class] != delay:
+                        pacer.set_profile(window_class, delay)
+            elif command == "start":
+                keyboard_manager.start_listening()
+            elif command == "stop":
+                keyboard_manager.stop_listening()
+            elif command == "reset":
+                keyboard_manager.reset_key_state()
+            elif command == "dump_trace":
+                keyboard_manager.dump_trace()
+            elif command == "device_stats":
+                # 只有这个命令需要回复，回复经控制管道返回
+                conn.send(("device_stats", keyboard_manager.get_device_stats()))
+            elif command == "shutdown":
+                break
+        except Exception as e:
+            print(f"钩子进程执行命令 {command} 失败: {e}")
+
+    keyboard_manager.shutdown()
+    ring.close()
+
+
+class HookProcessClient:
+    """钩子进程代理
+
+    在界面进程中代替 KeyboardManager，提供界面用到的相同接口。监听状态、
+    悬浮窗口文本和候选提示来自钩子进程的事件；注入延迟校准由界面进程
+    发起，仍然在界面进程中注入。
+    """
+
+    def __init__(self, config_manager, trace_enabled=False, trace_seconds=None):
+        """初始化钩子进程代理并启动钩子进程"""
+        self.config_manager = config_manager
+        self.trace_enabled = trace_enabled
+        self.trace_seconds = trace_seconds
+        self.active = False
+        self.status_callback = None
+        self.overlay_callback = None
+        self.candidates_callback = None
+        self.get_mouse_position_callback = None
+        # 悬浮窗口在界面进程中渲染，渲染耗时无法并入钩子进程的跟踪记录
+        self.tracer = TraceRecorder(enabled=False)
+        self.ring = EventRing(
+            capacity=config_manager.get_setting("hook_ring_capacity", 256)
+        )
+        # 以 spawn 方式启动钩子进程，信号量和管道也必须来自同一个上下文
+        self.context = multiprocessing.get_context("spawn")
+        self.notify = self.context.Semaphore(0)
+        self.conn = None
+        self.conn_lock = threading.Lock()
+        self.process = None
+        self.running = True
+        # 界面进程中用于校准注入延迟的后端，首次使用时创建
+        self.backend = None
+        self.keyboard_controller = None
+        self._mouse_controller = None
+        self.injection_pacer = InjectionPacer(config_manager)
+        self._spawn()
+        # 配置变更通过控制管道发给钩子进程
+        config_manager.add_snapshot_listener(lambda snapshot: self._send("config", self.config_manager.config))
+        self.pump_thread = threading.Thread(target=self._pump_events, name="hook-events", daemon=True)
+        self.pump_thread.start()
+        self.watch_thread = threading.Thread(target=self._watch_process, name="hook-watch", daemon=True)
+        self.watch_thread.start()
+
+    def _spawn(self):
+        """启动钩子进程"""
+        self.ring.reset()
+        parent_conn, child_conn = self.context.Pipe()
+        # spawn 启动的子进程只得到显式传入的句柄，不会继承管道的界面端，界面进程退出后 conn 能读到 EOF
+        self.process = self.context.Process(
+            target=hook_main,
+            args=(
+                self.config_manager.config_file, self.config_manager.config,
+                self.ring.name, self.ring.capacity, self.ring.slot_size,
+                self.notify, child_conn, self.trace_enabled, self.trace_seconds,
+            ),
+            name="keyboard-hook",
+            # 插件进程池需要在钩子进程中创建子进程，守护进程不允许有子进程
+            daemon=False,
+        )
+        self.process.start()
+        child_conn.close()
+        with self.conn_lock:
+            if self.conn is not None:
+                self.conn.close()
+            self.conn = parent_conn
+        if self.active:
+            self._send("start")
+
+    def _send(self, *message):
+        """向钩子进程发送控制命令"""
+        with self.conn_lock:
+            try:
+                self.conn.send(message)
+            except Exception as e:
+                print(f"向钩子进程发送命令失败: {e}")
+
+    def _pump_events(self):
+        """等待钩子进程的事件并分发给回调，没有事件时一直阻塞，不会周期性唤醒"""
+        while True:
+            self.notify.acquire()
+            if not self.running:
+                return
+            for kind, text in self.ring.pop_all():
+                try:
+                    self._dispatch(kind, text)
+                except Exception as e:
+                    print(f"钩子事件回调执行失败: {e}")
+
+    def _watch_process(self):
+        """等待钩子进程退出，意外退出时重启"""
+        while True:
+            process = self.process
+            # 只等待进程退出，不回收，避免与 shutdown() 中的 join 竞争
+            multiprocessing.connection.wait([process.sentinel])
+            if not self.running:
+                return
+            process.join()
+            print(f"键盘钩子进程意外退出(退出码 {process.exitcode})，正在重启")
+            self._spawn()
+    
+    def _dispatch(self, kind, text):
+        """分发一个钩子进程事件"""
+        if kind == EVENT_STATUS:
+            self.active = text == "1"
+            if self.status_callback:
+                self.status_callback(self.active)
+        elif kind == EVENT_OVERLAY:
+            if self.overlay_callback:
+                self.overlay_callback(text)
+        elif kind == EVENT_CANDIDATES:
+            if self.candidates_callback:
+                self.candidates_callback(text)
+        elif kind == EVENT_MOUSE_POSITION:
+            if self.get_mouse_position_callback:
+                threading.Thread(target=self.get_mouse_position_callback, daemon=True).start()
+
+    def _get_backend(self):
+        """获取界面进程中的输入后端"""
+        if self.backend is None:
+            self.backend = create_backend(self.config_manager.get_setting("input_backend", "pynput"), self.config_manager)
+        return self.backend
+
+    @property
+    def mouse_controller(self):
+        """界面进程中的鼠标控制器，用于读取鼠标位置"""
+        if self._mouse_controller is None:
+            self._mouse_controller = self._get_backend().mouse.Controller()
+        return self._mouse_controller
+
+    def start_listening(self):
+        """开始键盘监听"""
+        self.active = True
+        self._send("start")
+
+    def stop_listening(self):
+        """停止键盘监听"""
+        self.active = False
+        self._send("stop")
+
+    def toggle_listening(self):
+        """切换监听状态"""
+        if self.active:
+            self.stop_listening()
+        else:
+            self.start_listening()
+
+    def is_active(self):
+        """检查键盘监听是否处于活动状态"""
+        return self.active
+
+    def reset_key_state(self):
+        """清空钩子进程中的按键状态"""
+        self._send("reset")
+
+    def dump_trace(self, path=None):
+        """让钩子进程导出跟踪记录"""
+        self._send("dump_trace")
+
+    def get_device_stats(self, timeout=1.0):
+        """向钩子进程请求输入设备统计，超时或钩子进程不可用时返回空字典"""
+        with self.conn_lock:
+            try:
+                # 丢弃之前超时请求迟到的回复
+                while self.conn.poll():
+                    self.conn.recv()
+                self.conn.send(("device_stats",))
+                if self.conn.poll(timeout):
+                    return self.conn.recv()[1]
+            except Exception as e:
+                print(f"读取钩子进程的输入设备统计失败: {e}")
+        return {}
+
+    def type_text(self, text, delay=0):
+        """在界面进程中以给定间隔逐个输入字符，用于校准注入延迟"""
+        try:
+            if self.keyboard_controller is None:
+                self.keyboard_controller = self._get_backend().keyboard.Controller()
+            for char in text:
+                self.keyboard_controller.press(char)
+                self.keyboard_controller.release(char)
+                if delay:
+                    time.sleep(delay)
+        except Exception as e:
+            print(f"输入文本失败: {e}")
+
+    def execute_hotkey(self, hotkey, delay=0):
+        """在界面进程中执行快捷键，用于校准注入延迟时清空和读回目标输入框"""
+        try:
+            if self.keyboard_controller is None:
+                self.keyboard_controller = self._get_backend().keyboard.Controller()
+            Key = self._get_backend().keyboard.Key
+            keys = [name.strip().lower() for name in hotkey.split('+')]
+            keys = [key if len(key) == 1 else getattr(Key, key) for key in keys]
+            for key in keys:
+                self.keyboard_controller.press(key)
+                if delay:
+                    time.sleep(delay)
+            for key in reversed(keys):
+                self.keyboard_controller.release(key)
+        except Exception as e:
+            print(f"执行快捷键失败: {e}")
+
+    def set_status_callback(self, callback):
+        """设置状态变化回调函数"""
+        self.status_callback = callback
+
+    def set_overlay_callback(self, callback):
+        """设置悬浮窗口更新回调函数"""
+        self.overlay_callback = callback
+
+    def set_candidates_callback(self, callback):
+        """设置候选触发序列提示回调函数"""
+        self.candidates_callback = callback
+
+    def set_get_mouse_position_callback(self, callback):
+        """设置获取鼠标位置的回调函数"""
+        self.get_mouse_position_callback = callback
+
+    def shutdown(self):
+        """停止钩子进程并释放共享内存"""
+        self.running = False
+        self._send("shutdown")
+        self.notify.release()
+        self.process.join(timeout=2.0)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.pump_thread.join(timeout=2.0)
+        self.watch_thread.join(timeout=2.0)
+        self.ring.close()
+        if self.backend is not None:
+            self.backend.close()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+图像锚定模块
+鼠标映射可以指向一小块参考图像，触发时在屏幕上查找该图像并点击其中心
+"""
+
+import os
+import threading
+import time
+
+# numpy 和 Pillow 为可选依赖，缺失时图像锚定不可用，坐标映射不受影响
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from PIL import Image, ImageGrab
+except ImportError:
+    Image = None
+    ImageGrab = None
+
+# 鼠标映射中图像锚定位置的前缀，例如 "image:/home/user/shortcutseasier/anchors/anchor-1700000000.png"；
+# 相对路径相对于配置文件所在目录
+IMAGE_PREFIX = "image:"
+
+
+def is_available():
+    """图像锚定所需的依赖是否可用"""
+    return np is not None and ImageGrab is not None
+
+
+def is_image_position(position):
+    """鼠标映射位置是否为图像锚定"""
+    return position.startswith(IMAGE_PREFIX)
+
+
+def capture_anchor(x, y, size=48):
+    """截取以 (x, y) 为中心的参考图像，返回 (暂定位置字符串, 图像)
+
+    图像只保存在内存中，暂定位置只包含文件名，用户用它添加鼠标映射时才由 save_anchor() 写入文件。
+    """
+    if not is_available():
+        return None, None
+    half = size // 2
+    image = ImageGrab.grab(bbox=(x - half, y - half, x + half, y + half))
+    return f"{IMAGE_PREFIX}anchor-{int(time.time() * 1000)}.png", image
+
+
+def save_anchor(position, image, directory):
+    """把 capture_anchor() 截取的图像保存到 directory，返回使用绝对路径的位置字符串"""
+    path = os.path.join(os.path.abspath(directory), os.path.basename(position[len(IMAGE_PREFIX):]))
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        image.save(path)
+    return IMAGE_PREFIX + path
+
+
+def _to_gray(image):
+    """PIL 图像转换为灰度浮点数组"""
+    return np.asarray(image.convert('L'), dtype=np.float64)
+
+
+def _downscale(array, factor):
+    """按块取平均缩小数组"""
+    h = array.shape[0] // factor * factor
+    w = array.shape[1] // factor * factor
+    return array[:h, :w].reshape(h // factor, factor, w // factor, factor).mean(axis=(1, 3))
+
+
+def _window_sums(array, th, tw):
+    """用积分图计算每个 th x tw 窗口内的元素和"""
+    integral = np.pad(array, ((1, 0), (1, 0))).cumsum(axis=0).cumsum(axis=1)
+    return integral[th:, tw:] - integral[:-th, tw:] - integral[th:, :-tw] + integral[:-th, :-tw]
+
+
+def match_template(image, template):
+    """归一化互相关模板匹配
+
+    分子通过 FFT 一次算出所有位置的互相关，分母通过积分图算出所有窗口
+    的方差，全部为向量化运算。返回 (最佳得分, 行, 列)，得分范围 [-1, 1]。
+    """
+    th, tw = template.shape
+    ih, iw = image.shape
+    if ih < th or iw < tw:
+        return -1.0, 0, 0
+
+    centered = template - template.mean()
+    template_norm = np.sqrt((centered * centered).sum())
+    if template_norm == 0:
+        # 纯色模板无法定位
+        return -1.0, 0, 0
+
+    shape = (ih + th - 1, iw + tw - 1)
+    spectrum = np.fft.rfft2(image, shape) * np.fft.rfft2(centered[::-1, ::-1], shape)
+    correlation = np.fft.irfft2(spectrum, shape)[th - 1:ih, tw - 1:iw]
+
+    count = th * tw
+    sums = _window_sums(image, th, tw)
+    variance = _window_sums(image * image, th, tw) - sums * sums / count
+    denominator = np.sqrt(np.maximum(variance, 0)) * template_norm
+    scores = np.where(denominator > 1e-6, correlation / np.maximum(denominator, 1e-6), -1.0)
+
+    index = int(np.argmax(scores))
+    row, col = divmod(index, scores.shape[1])
+    return float(scores[row, col]), row, col
+
+
+class ImageLocator:
+    """屏幕图像定位器
+
+    每个参考图像缓存灰度模板和上次命中的区域(ROI)。触发时先只截取 ROI
+    附近的小块屏幕做精确匹配；未命中时截取整个屏幕，先在缩小的图像上
+    粗略定位，再在原始分辨率的邻域内精确定位。
+    """
+
+    def __init__(self, threshold=0.8, coarse_factor=4, roi_margin=64, base_dir="."):
+        """初始化屏幕图像定位器，base_dir 为相对路径的参考图像所在的目录"""
+        self.threshold = threshold
+        self.base_dir = base_dir
+        self.coarse_factor = coarse_factor
+        self.roi_margin = roi_margin
+        self.lock = threading.Lock()
+        # 参考图像路径 -> (模板, 缩小后的模板)
+        self.templates = {}
+        # 参考图像路径 -> 上次命中的左上角屏幕坐标
+        self.last_hits = {}
+
+    def _get_template(self, path):
+        """加载并缓存参考图像"""
+        with self.lock:
+            cached = self.templates.get(path)
+        if cached is None:
+            template = _to_gray(Image.open(path))
+            factor = self.coarse_factor
+            coarse = _downscale(template, factor) if min(template.shape) >= factor * 4 else None
+            cached = (template, coarse)
+            with self.lock:
+                self.templates[path] = cached
+        return cached
+
+    def _search(self, template, left, top, right, bottom):
+        """在屏幕指定区域内精确匹配，返回 (得分, 左, 上)"""
+        screen = _to_gray(ImageGrab.grab(bbox=(left, top, right, bottom)))
+        score, row, col = match_template(screen, template)
+        return score, left + col, top + row
+
+    def locate(self, position):
+        """查找图像锚定位置，返回图像中心的屏幕坐标，找不到时返回 None"""
+        path = os.path.join(self.base_dir, position[len(IMAGE_PREFIX):])
+        template, coarse = self._get_template(path)
+        th, tw = template.shape
+        margin = self.roi_margin
+
+        # 先在上次命中的区域附近查找
+        last_hit = self.last_hits.get(path)
+        if last_hit is not None:
+            x, y = last_hit
+            score, x, y = self._search(template, max(x - margin, 0), max(y - margin, 0), x + tw + margin, y + th + margin)
+            if score >= self.threshold:
+                self.last_hits[path] = (x, y)
+                return x + tw // 2, y + th // 2
+
+        # 全屏查找: 缩小后粗略定位，再在邻域内精确定位
+        screen = _to_gray(ImageGrab.grab())
+        score = -1.0
+        if coarse is not None:
+            factor = self.coarse_factor
+            _, row, col = match_template(_downscale(screen, factor), coarse)
+            pad = 2 * factor
+            top = max(row * factor - pad, 0)
+            left = max(col * factor - pad, 0)
+            region = screen[top:top + th + 2 * pad, left:left + tw + 2 * pad]
+            score, row, col = match_template(region, template)
+            x, y = left + col, top + row
+        if score < self.threshold:
+            # 模板太小无法缩小，或粗略定位失误时在原始分辨率上全屏匹配
+            score, row, col = match_template(screen, template)
+            x, y = col, row
+
+        if score < self.threshold:
+            return None
+        self.last_hits[path] = (x, y)
+        return x + tw // 2, y + th // 2
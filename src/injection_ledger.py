@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+注入事件台账模块
+记录程序自身注入的按键，监听器据此以常数时间丢弃这些事件的回显
+"""
+
+import threading
+import time
+
+# 左右修饰键统一记为同一个标记，控制器注入 Key.ctrl 时监听器可能收到 Key.ctrl_l
+MODIFIER_TOKENS = {
+    'ctrl_l': 'ctrl', 'ctrl_r': 'ctrl',
+    'shift_l': 'shift', 'shift_r': 'shift',
+    'alt_l': 'alt', 'alt_r': 'alt', 'alt_gr': 'alt',
+    'cmd_l': 'cmd', 'cmd_r': 'cmd',
+}
+
+
+def key_token(key):
+    """把注入时使用的按键和监听器收到的按键统一转换为可比较的标记"""
+    if isinstance(key, str):
+        return key.lower()
+    name = getattr(key, 'name', None)
+    if name is not None:
+        # 特殊键 (keyboard.Key 枚举)
+        return MODIFIER_TOKENS.get(name, name)
+    char = getattr(key, 'char', None)
+    if char and char.isprintable():
+        return char.lower()
+    # Windows 上按住 Ctrl 时字母键报告为控制字符(Ctrl+C 为 '\x03')，按虚拟键码还原为字母或数字，
+    # 注入的 Ctrl+C 的回显才能与注入时记录的 'c' 对应
+    vk = getattr(key, 'vk', None)
+    if vk is not None and (0x30 <= vk <= 0x39 or 0x41 <= vk <= 0x5a):
+        return chr(vk).lower()
+    if char:
+        return char.lower()
+    return vk
+
+
+class InjectionLedger:
+    """注入事件台账
+
+    每个标记保存 [待回显次数, 截止时间]。回显在截止时间前未到达的记录
+    视为已丢失，不会吞掉之后用户真实输入的同一按键；丢失的回显数由
+    collect_missed() 取出，作为注入节奏控制器的丢失事件信号。
+    """
+
+    def __init__(self, ttl=0.5):
+        """初始化注入事件台账"""
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.pending_press = {}
+        self.pending_release = {}
+        # 已过期、回显未到达的事件数
+        self.missed = 0
+
+    def record_press(self, key):
+        """记录一次注入的按下事件"""
+        self._record(self.pending_press, key)
+
+    def record_release(self, key):
+        """记录一次注入的释放事件"""
+        self._record(self.pending_release, key)
+
+    def consume_press(self, key):
+        """按下事件是否为自身注入的回显，是则消耗一条记录"""
+        # 台账为空时不计算标记，保证普通按键的开销最小
+        if not self.pending_press:
+            return False
+        return self._consume(self.pending_press, key)
+
+    def consume_release(self, key):
+        """释放事件是否为自身注入的回显，是则消耗一条记录"""
+        if not self.pending_release:
+            return False
+        return self._consume(self.pending_release, key)
+
+    def has_pending(self):
+        """是否还有未过期且未收到回显的按下事件"""
+        now = time.monotonic()
+        with self.lock:
+            return any(deadline >= now for _, deadline in self.pending_press.values())
+
+    def collect_missed(self):
+        """取出已过期仍未收到回显的事件数，返回 (丢失数, 是否还有未过期的记录)"""
+        now = time.monotonic()
+        with self.lock:
+            for table in (self.pending_press, self.pending_release):
+                for token, (count, deadline) in list(table.items()):
+                    if deadline < now:
+                        self.missed += count
+                        del table[token]
+            missed = self.missed
+            self.missed = 0
+            return missed, bool(self.pending_press or self.pending_release)
+
+    def clear(self):
+        """清空台账"""
+        with self.lock:
+            self.pending_press.clear()
+            self.pending_release.clear()
+            self.missed = 0
+
+    def _record(self, table, key):
+        """增加一条记录并刷新截止时间"""
+        token = key_token(key)
+        now = time.monotonic()
+        deadline = now + self.ttl
+        with self.lock:
+            entry = table.get(token)
+            if entry is None or entry[1] < now:
+                if entry is not None:
+                    self.missed += entry[0]
+                table[token] = [1, deadline]
+            else:
+                entry[0] += 1
+                entry[1] = deadline
+
+    def _consume(self, table, key):
+        """消耗一条记录"""
+        token = key_token(key)
+        with self.lock:
+            entry = table.get(token)
+            if entry is None:
+                return False
+            if entry[1] < time.monotonic():
+                # 记录已过期，视为回显丢失
+                self.missed += entry[0]
+                del table[token]
+                return False
+            entry[0] -= 1
+            if entry[0] <= 0:
+                del table[token]
+            return True
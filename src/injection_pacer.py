@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+注入节奏控制模块
+按目标窗口类使用校准得到的模拟按键事件间隔，检测到丢失事件时自动退避
+"""
+
+import os
+import sys
+import threading
+import time
+
+
+def get_foreground_window_class():
+    """获取当前前台窗口的窗口类名，无法获取时返回 "default" """
+    try:
+        if sys.platform == 'win32':
+            import ctypes
+            user32 = ctypes.windll.user32
+            hwnd = user32.GetForegroundWindow()
+            buffer = ctypes.create_unicode_buffer(256)
+            if hwnd and user32.GetClassNameW(hwnd, buffer, 256):
+                return buffer.value
+        elif sys.platform.startswith('linux'):
+            return _get_x11_window_class()
+    except Exception as e:
+        print(f"获取前台窗口类失败: {e}")
+    return "default"
+
+
+# X11 连接在首次使用时创建并复用，避免每次查询都重新连接
+_x11_display = None
+
+
+def foreground_window_is_own():
+    """前台窗口是否属于本进程，无法判断时返回 False"""
+    try:
+        if sys.platform == 'win32':
+            import ctypes
+            user32 = ctypes.windll.user32
+            hwnd = user32.GetForegroundWindow()
+            pid = ctypes.c_ulong()
+            user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+            return pid.value == os.getpid()
+        elif sys.platform.startswith('linux'):
+            return _get_x11_window_pid() == os.getpid()
+    except Exception as e:
+        print(f"获取前台窗口进程失败: {e}")
+    return False
+
+
+def _get_x11_active_window():
+    """获取 X11 的活动窗口，没有时返回 None"""
+    global _x11_display
+    from Xlib import X, display
+    if _x11_display is None:
+        _x11_display = display.Display()
+    root = _x11_display.screen().root
+    atom = _x11_display.intern_atom('_NET_ACTIVE_WINDOW')
+    prop = root.get_full_property(atom, X.AnyPropertyType)
+    if not prop or not prop.value:
+        return None
+    return _x11_display.create_resource_object('window', prop.value[0])
+
+
+def _get_x11_window_class():
+    """通过 Xlib 获取 X11 前台窗口的 WM_CLASS"""
+    window = _get_x11_active_window()
+    wm_class = window.get_wm_class() if window is not None else None
+    if wm_class:
+        # WM_CLASS 为 (实例名, 类名)，使用类名
+        return wm_class[1]
+    return "default"
+
+
+def _get_x11_window_pid():
+    """通过 _NET_WM_PID 获取 X11 前台窗口所属的进程ID"""
+    from Xlib import X
+    window = _get_x11_active_window()
+    if window is None:
+        return None
+    prop = window.get_full_property(_x11_display.intern_atom('_NET_WM_PID'), X.AnyPropertyType)
+    return prop.value[0] if prop and prop.value else None
+
+
+class InjectionPacer:
+    """注入节奏控制器
+
+    每个窗口类的固定间隔(校准结果，未校准时为默认间隔)作为下限。给定注入事件台账时，
+    每批注入开始前检查上一批注入的回显: 有回显在台账中过期仍未到达，说明事件在到达
+    目标程序之前就已丢失(如钩子超时或输入队列溢出)，按倍数退避；连续若干批没有丢失后
+    逐步回落到下限。到达目标程序之后才丢失的事件看不到回显差异，由读回目标输入框的
+    校准发现，校准也可以通过 report_drop() 报告读回不一致。
+    """
+    
+    # 校准时依次尝试的候选间隔(秒)
+    CALIBRATION_DELAYS = (0.0, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05)
+    
+    def __init__(self, config_manager, ledger=None):
+        """初始化注入节奏控制器，ledger 为后端能看到注入事件回显时的注入事件台账"""
+        self.config_manager = config_manager
+        self.ledger = ledger
+        self.lock = threading.Lock()
+        settings = config_manager.get_pacing_settings()
+        # 未校准窗口类的间隔
+        self.default_delay = settings.get("default_delay", 0.01)
+        # 退避上限
+        self.max_delay = settings.get("max_delay", 0.1)
+        # 检测到丢失事件时的退避倍数
+        self.backoff_factor = settings.get("backoff_factor", 2.0)
+        # 连续多少批没有丢失后缩短一次间隔
+        self.decay_after = settings.get("decay_after", 5)
+        # 每次缩短的比例
+        self.decay_factor = settings.get("decay_factor", 0.8)
+        # 校准结果: 窗口类 -> 最小可靠间隔，作为退避的下限
+        self.profiles = dict(settings.get("profiles", {}))
+        # 退避后的当前间隔和连续没有丢失的批数
+        self.delays = {}
+        self.success_streak = {}
+        # 回显尚未确认的上一批注入的窗口类
+        self.last_batch_class = None
+        # 前台窗口类缓存，避免每次注入都查询
+        self.window_class_ttl = 0.5
+        self._window_class = "default"
+        self._window_class_time = 0
+    
+    def current_window_class(self):
+        """获取(缓存的)前台窗口类"""
+        now = time.time()
+        if now - self._window_class_time > self.window_class_ttl:
+            self._window_class = get_foreground_window_class()
+            self._window_class_time = now
+        return self._window_class
+    
+    def get_floor(self, window_class):
+        """获取窗口类的间隔下限"""
+        with self.lock:
+            return self.profiles.get(window_class, self.default_delay)
+    
+    def get_delay(self, window_class):
+        """获取指定窗口类当前的注入间隔"""
+        with self.lock:
+            return self.delays.get(window_class, self.profiles.get(window_class, self.default_delay))
+    
+    def foreground_delay(self):
+        """开始一批注入: 根据上一批的回显调整间隔，返回前台窗口类的注入间隔"""
+        window_class = self.current_window_class()
+        if self.ledger is not None:
+            self._check_echoes()
+            self.last_batch_class = window_class
+        return self.get_delay(window_class)
+    
+    def _check_echoes(self):
+        """检查上一批注入的回显，有丢失时退避，全部到达时记一次成功"""
+        window_class = self.last_batch_class
+        if window_class is None:
+            return
+        missed, pending = self.ledger.collect_missed()
+        if missed:
+            self.report_drop(window_class, missed)
+        elif pending:
+            # 回显还可能到达，留到下一批再判断
+            return
+        else:
+            self.report_success(window_class)
+        self.last_batch_class = None
+    
+    def report_drop(self, window_class, count=1):
+        """检测到丢失事件，退避"""
+        delay = self.get_delay(window_class)
+        with self.lock:
+            new_delay = min(max(delay * self.backoff_factor, 0.001), self.max_delay)
+            self.delays[window_class] = new_delay
+            self.success_streak[window_class] = 0
+        print(f"检测到 {window_class} 丢失 {count} 个按键事件，注入间隔调整为 {new_delay * 1000:.1f}ms")
+    
+    def report_success(self, window_class):
+        """一批注入没有丢失事件，连续足够批数后向下限回落"""
+        floor = self.get_floor(window_class)
+        with self.lock:
+            delay = self.delays.get(window_class)
+            if delay is None:
+                return
+            streak = self.success_streak.get(window_class, 0) + 1
+            if streak >= self.decay_after:
+                new_delay = delay * self.decay_factor
+                # 与下限相差不到 0.5ms 时直接回落到下限
+                if new_delay - floor > 0.0005:
+                    self.delays[window_class] = new_delay
+                else:
+                    del self.delays[window_class]
+                streak = 0
+            self.success_streak[window_class] = streak
+    
+    def set_profile(self, window_class, delay):
+        """设置窗口类的注入间隔下限，之前的退避随之清除"""
+        with self.lock:
+            self.profiles[window_class] = delay
+            self.delays.pop(window_class, None)
+            self.success_streak.pop(window_class, None)
+    
+    def calibrate(self, inject, read_back, reset, sample="pacing1234567890", trials=3, settle=0.2):
+        """校准当前前台窗口类的最小可靠间隔
+
+        目标程序的输入框需要已获得焦点。inject(text, delay) 以给定间隔逐个注入字符；
+        read_back() 返回目标输入框实际收到的内容；reset() 清空目标输入框。
+        前台窗口属于本程序时抛出 RuntimeError。返回 (窗口类, 间隔)。
+        """
+        if foreground_window_is_own():
+            raise RuntimeError("前台窗口是本程序的窗口，请切换到需要校准的程序")
+        window_class = get_foreground_window_class()
+        result = self.CALIBRATION_DELAYS[-1]
+        for delay in self.CALIBRATION_DELAYS:
+            reliable = True
+            for _ in range(trials):
+                reset()
+                inject(sample, delay)
+                time.sleep(settle)
+                if read_back() != sample:
+                    reliable = False
+                    break
+            if reliable:
+                result = delay
+                break
+        
+        self.set_profile(window_class, result)
+        self.config_manager.set_pacing_profile(window_class, result)
+        return window_class, result
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+输入后端模块
+为 KeyboardManager 提供键盘监听、按键注入和鼠标控制的实现
+"""
+
+
+class PynputBackend:
+    """pynput 输入后端
+
+    keyboard 需要提供 Key、KeyCode、Listener、Controller，mouse 需要提供
+    Controller、Button，接口与 pynput 一致，close() 释放后端资源。其他后端
+    按相同接口实现即可。echoes_injected 表示监听器能收到本程序注入的事件。
+    """
+
+    name = "pynput"
+    # Windows 底层钩子和 X RECORD 都能收到注入的事件
+    echoes_injected = True
+
+    def __init__(self):
+        """初始化 pynput 输入后端"""
+        from pynput import keyboard, mouse
+        self.keyboard = keyboard
+        self.mouse = mouse
+
+    def close(self):
+        """释放后端资源，pynput 没有需要释放的资源"""
+        pass
+
+
+def create_backend(name="pynput", config_manager=None):
+    """按名称创建输入后端，config_manager 用于读取后端自身的配置"""
+    if name == "pynput":
+        return PynputBackend()
+    if name == "evdev":
+        # 只在 Linux 上可用，按需导入
+        from evdev_backend import EvdevBackend
+        if config_manager is None:
+            return EvdevBackend()
+        return EvdevBackend(
+            devices=config_manager.get_setting("evdev_devices", None),
+            screen_size=tuple(config_manager.get_setting("evdev_screen_size", [1920, 1080]))
+        )
+    raise ValueError(f"未知的输入后端: {name}")
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+输入围栏模块
+动作注入按键期间暂扣用户的真实按键，动作结束后按原顺序重放，
+用户的输入不会插入到退格和快捷键之间
+"""
+
+import threading
+import time
+
+
+class InputFence:
+    """输入围栏
+
+    open() 与 close() 之间(可以嵌套)到达的按键由 hold() 暂扣。围栏开启前
+    按下的键，其释放事件直接放行。暂扣的按键超过 max_keys 个或最早的按键
+    已等待超过 max_hold 秒时围栏失效：暂扣的按键立即重放，之后的按键
+    直接放行，直到本次围栏关闭，卡住的动作不会吞掉用户的输入。
+    """
+
+    # hold() 的返回动作
+    PASS = 0   # 放行当前按键
+    HOLD = 1   # 暂扣当前按键
+    BREAK = 2  # 围栏失效，拦截当前按键并立即重放暂扣的按键和当前按键
+
+    def __init__(self, max_keys=32, max_hold=1.0):
+        """初始化输入围栏"""
+        self.max_keys = max_keys
+        self.max_hold = max_hold
+        self.lock = threading.Lock()
+        self.depth = 0
+        # 围栏已关闭但暂扣的按键尚未重放完，期间的按键继续暂扣
+        self.draining = False
+        self.broken = False
+        # 暂扣的按键: [(虚拟键码, 是否为释放)]
+        self.held = []
+        self.held_since = 0
+        # 按下事件被暂扣的键，它们的释放事件也必须暂扣
+        self.held_down = set()
+        # 按键回调只读取该标志，围栏未开启时不加锁
+        self.active = False
+
+    def open(self):
+        """开启围栏"""
+        with self.lock:
+            if self.depth == 0 and not self.draining:
+                self.broken = False
+            self.depth += 1
+            self.active = True
+
+    def close(self):
+        """关闭围栏，之后需要反复调用 drain() 直到返回空列表"""
+        with self.lock:
+            self.depth -= 1
+            if self.depth == 0:
+                self.draining = True
+
+    def drain(self):
+        """取出暂扣的按键用于重放；没有暂扣的按键时围栏真正关闭，返回空列表"""
+        with self.lock:
+            if self.held:
+                held = self.held
+                self.held = []
+                self.held_down.clear()
+                return held
+            if self.depth == 0:
+                self.draining = False
+                self.active = False
+            return []
+
+    def hold(self, vk, release, now=None):
+        """处理一个真实按键事件，返回 (动作, 需要立即重放的按键列表)"""
+        if now is None:
+            now = time.monotonic()
+        with self.lock:
+            if not self.active or self.broken:
+                return self.PASS, None
+            if release and vk not in self.held_down:
+                return self.PASS, None
+            if not self.held:
+                self.held_since = now
+            self.held.append((vk, release))
+            if not release:
+                self.held_down.add(vk)
+            if len(self.held) > self.max_keys or now - self.held_since > self.max_hold:
+                return self.BREAK, self._break()
+            return self.HOLD, None
+
+    def expire(self):
+        """暂扣时间超过上限时调用，返回需要立即重放的按键列表"""
+        with self.lock:
+            if not self.held or time.monotonic() - self.held_since < self.max_hold:
+                return []
+            return self._break()
+
+    def _break(self):
+        """围栏失效，取出全部暂扣的按键"""
+        self.broken = True
+        held = self.held
+        self.held = []
+        self.held_down.clear()
+        return held
@@ -7,82 +7,231 @@
 """
 
 import threading
-from pynput import keyboard, mouse
 import time
+import sys
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加src目录到Python路径
+sys.path.append(os.path.join(os.path.dirname(__file__)))
+
+from injection_pacer import InjectionPacer
+from injection_ledger import InjectionLedger
+from trigger_suppressor import TriggerSuppressor
+from trace_recorder import TraceRecorder
+from deadline_timer import DeadlineTimer
+from event_stream import EventStream
+from input_backend import create_backend
+from input_fence import InputFence
+from pattern_matcher import expand_template
+from plugin_runner import PluginRunner
+from usage_log import UsageLog
+import image_anchor
+
+# Windows 底层键盘钩子常量
+WM_KEYDOWN = 0x0100
+WM_SYSKEYDOWN = 0x0104
+WM_KEYUP = 0x0101
+WM_SYSKEYUP = 0x0105
+LLKHF_INJECTED = 0x10
+
+# 可参与拦截匹配的虚拟键码: 数字键和字母键
+VK_CHARS = {0x30 + i: str(i) for i in range(10)}
+VK_CHARS.update({0x41 + i: chr(ord('a') + i) for i in range(26)})
 
 class KeyboardManager:
     """键盘管理器"""
     
-    def __init__(self, config_manager):
-        """初始化键盘管理器"""
+    def __init__(self, config_manager, backend=None):
+        """初始化键盘管理器，backend 为输入后端，默认按配置创建"""
         self.config_manager = config_manager
+        if backend is None:
+            backend = create_backend(config_manager.get_setting("input_backend", "pynput"), config_manager)
+        self.backend = backend
+        self.keyboard = backend.keyboard
+        self.mouse = backend.mouse
+        keyboard = self.keyboard
+        # 当前映射快照，配置变更时整体替换
+        self.mapping_snapshot = config_manager.get_snapshot()
         self.listener = None
         self.active = False
         self.current_keys = set()
-        self.key_buffer = []
+        # 最后按下且尚未释放的键及其按下时间，用于识别系统自动重复
+        self.repeat_key_id = None
+        self.repeat_key_time = 0
+        # Windows 的虚拟键码和 evdev 的键码对应物理按键，与 Shift、Ctrl 的状态无关；
+        # 其他后端按小写字符识别按键
+        self.key_id_by_vk = sys.platform == 'win32' or backend.name == 'evdev'
         self.buffer_timeout = 1.0  # 缓冲区超时时间(秒)
         self.last_key_time = 0
-        # 实时按键记录
-        self.current_input = ""
+        # 实时按键记录: 每次按键追加一个显示片段，需要显示时才拼接成文本，
+        # 超过上限时只保留末尾部分
+        self.input_parts = []
+        self.max_input_length = 64
+        # 按键 -> (匹配用文本, 显示片段) 的缓存，避免每次按键都生成新字符串
+        self.char_labels = {}
+        self.key_labels = {}
         # 定义启动/停止监听的组合键 (Ctrl+Shift+F12)
         self.toggle_key_combination = {keyboard.Key.ctrl_l, keyboard.Key.shift_l, keyboard.Key.f12}
         # 状态变化回调函数
         self.status_callback = None
         # 悬浮窗口回调函数
         self.overlay_callback = None
-        # 用于在非活动状态下监听启动组合键的监听器
-        self.toggle_listener = None
+        # 候选触发序列提示回调函数
+        self.candidates_callback = None
+        # 当前匹配器节点，None 表示本轮输入已无法匹配任何触发序列
+        self.match_node = self.mapping_snapshot.matcher
+        # 本轮匹配已输入的按键文本，模式触发序列触发时用于取出捕获组
+        self.match_keys = []
+        self._last_preview = ""
+        # 消歧延迟(秒): 有更长延伸的触发序列等待该时间没有后续输入才触发，0 表示立即触发
+        self.disambiguation_delay = config_manager.get_setting("disambiguation_delay_ms", 0) / 1000.0
+        self.pending_node = None
+        # 等待消歧时本轮匹配已输入的按键，计时线程触发时不读取监听线程正在修改的 match_keys
+        self.pending_keys = ()
+        # 计时线程已触发等待中的触发序列，监听线程处理下一个按键前回到根节点
+        self.pending_fired = False
+        self.pending_lock = threading.Lock()
+        self.disambiguation_timer = DeadlineTimer(self._fire_pending_trigger, "disambiguation")
         # 鼠标控制器
-        self.mouse_controller = mouse.Controller()
+        self.mouse_controller = self.mouse.Controller()
         # 获取鼠标位置的回调函数
         self.get_mouse_position_callback = None
         # 定义获取鼠标位置的组合键 (Ctrl+Shift+F11)
         self.get_mouse_position_combination = {keyboard.Key.ctrl_l, keyboard.Key.shift_l, keyboard.Key.f11}
-        # 在初始化时就启动用于监听启动组合键的监听器
-        self._start_toggle_listener()
+        # 注入事件台账，用于丢弃自身注入事件的回显
+        self.injection_ledger = InjectionLedger()
+        # 注入节奏控制器，后端能看到注入事件的回显时用台账中丢失的回显检测丢失事件
+        self.injection_pacer = InjectionPacer(
+            config_manager, self.injection_ledger if getattr(self.backend, 'echoes_injected', False) else None
+        )
+        # 触发键拦截模式: 暂扣触发序列的按键而不是事后用退格删除
+        self.suppress_mode = bool(config_manager.get_setting("suppress_triggers", False))
+        if self.suppress_mode and sys.platform != 'win32':
+            print("触发键拦截模式仅支持Windows，将使用退格删除模式")
+            self.suppress_mode = False
+        self.trigger_suppressor = TriggerSuppressor(
+            self.buffer_timeout,
+            config_manager.get_setting("suppress_max_hold", 16)
+        )
+        self.trigger_suppressor.rebuild(self.mapping_snapshot.matcher)
+        # 暂扣按键的超时重放定时器
+        self.hold_timer = DeadlineTimer(self._flush_held_keys, "hold-flush")
+        # 输入围栏: 动作注入期间暂扣用户的按键，动作结束后按顺序重放，仅支持Windows
+        self.fence_enabled = bool(config_manager.get_setting("input_fence", True)) and sys.platform == 'win32'
+        self.input_fence = InputFence(
+            config_manager.get_setting("fence_max_keys", 32),
+            config_manager.get_setting("fence_max_ms", 1000) / 1000.0
+        )
+        self.fence_timer = DeadlineTimer(self._expire_fence, "fence-expire")
+        # 所有按键释放后超时清空输入显示的定时器
+        self.clear_input_timer = DeadlineTimer(self._clear_input_display, "clear-input")
+        # 动作执行器: 单个常驻线程按顺序执行触发的动作
+        self.action_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="action")
+        # 围栏失效时立即重放暂扣按键的常驻线程，动作线程此时正卡在动作中
+        self.fence_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fence-replay")
+        # 订阅映射快照的更新
+        config_manager.add_snapshot_listener(self._on_snapshot)
+        # 流水线跟踪记录器(默认关闭)
+        trace_settings = config_manager.get_setting("trace", {})
+        self.tracer = TraceRecorder(
+            trace_settings.get("capacity", 8192),
+            trace_settings.get("enabled", False)
+        )
+        # 导出跟踪记录时包含的最近秒数
+        self.trace_dump_seconds = trace_settings.get("dump_seconds", 10)
+        # 定义导出跟踪记录的组合键 (Ctrl+Shift+F10)
+        self.dump_trace_combination = {keyboard.Key.ctrl_l, keyboard.Key.shift_l, keyboard.Key.f10}
+        # 每秒按键事件预算，超出的事件跳过匹配和显示，0 表示不限制
+        self.event_budget = config_manager.get_setting("max_events_per_second", 100)
+        self.budget_window_start = 0
+        self.budget_used = 0
+        self.shed_count = 0
+        # 组合键中的修饰键，长时间按住也不会被当作释放事件丢失的按键清除
+        self.chord_modifiers = frozenset(
+            (self.toggle_key_combination | self.get_mouse_position_combination | self.dump_trace_combination)
+            - {keyboard.Key.f10, keyboard.Key.f11, keyboard.Key.f12}
+        )
+        # 按下的键少于该数量时不可能构成组合键，跳过组合键检查
+        self.min_chord_size = min(
+            len(self.toggle_key_combination),
+            len(self.get_mouse_position_combination),
+            len(self.dump_trace_combination)
+        )
+        # 图像锚定定位器，首次执行图像锚定的鼠标映射时创建
+        self.image_locator = None
+        # 触发使用记录，由后台线程写入，不在每次触发时改写配置文件
+        self.usage_log = UsageLog(*config_manager.get_usage_log_paths())
+        self.usage_log.register(self.mapping_snapshot.actions)
+        # 本地事件流，向外部监控程序推送触发、延迟和状态变化事件(默认关闭)
+        self.event_stream = EventStream(
+            config_manager.get_setting("event_stream_queue", 256),
+            config_manager.get_setting("event_stream_port", 47614)
+        )
+        if config_manager.get_setting("event_stream", False):
+            self.event_stream.start()
+        # 插件执行器，配置中有插件映射时创建并预热工作进程
+        self.plugin_runner = None
+        self._ensure_plugin_runner(self.mapping_snapshot)
+        # 在初始化时就启动常驻的监听器，非活动状态下只响应组合键
+        self._ensure_listener()
     
     def set_get_mouse_position_callback(self, callback):
         """设置获取鼠标位置的回调函数"""
         self.get_mouse_position_callback = callback
     
-    def _start_toggle_listener(self):
-        """启动专门用于监听启动组合键的监听器"""
-        if not self.active and not self.toggle_listener:
-            self.toggle_listener = keyboard.Listener(
-                on_press=self._toggle_on_press,
-                on_release=self.on_release
-            )
-            self.toggle_listener.start()
+    def _ensure_listener(self):
+        """创建并启动常驻的键盘监听器
+
+        启动/停止监听只切换 active 标志，整个生命周期只使用一个监听器，
+        不会每次切换都新建监听线程。
+        """
+        if self.listener is not None:
+            return
+        listener_kwargs = {}
+        if self.suppress_mode or self.fence_enabled:
+            # 通过底层钩子过滤器逐个拦截按键
+            listener_kwargs['win32_event_filter'] = self._win32_event_filter
+        self.listener = self.keyboard.Listener(
+            on_press=self.on_press,
+            on_release=self.on_release,
+            **listener_kwargs
+        )
+        self.listener.start()
     
     def start_listening(self):
         """开始监听键盘事件"""
         self.active = True
-        # 停止专门用于监听启动组合键的监听器
-        if self.toggle_listener:
-            self.toggle_listener.stop()
-            self.toggle_listener = None
-            
-        self.listener = keyboard.Listener(
-            on_press=self.on_press,
-            on_release=self.on_release
-        )
-        self.listener.start()
+        self._ensure_listener()
+        self.event_stream.publish("status", active=True)
         print("键盘监听已启动")
     
     def stop_listening(self):
         """停止监听键盘事件"""
         self.active = False
+        # 监听器继续运行，以便响应启动组合键
+        self._ensure_listener()
+        self.event_stream.publish("status", active=False)
+        print("键盘监听已停止")
+    
+    def shutdown(self):
+        """停止监听器和后台线程，退出程序或测试结束时调用"""
+        self.active = False
         if self.listener:
             self.listener.stop()
             self.listener = None
-            
-        # 启动一个专门用于监听启动组合键的监听器
-        self.toggle_listener = keyboard.Listener(
-            on_press=self._toggle_on_press,
-            on_release=self.on_release
-        )
-        self.toggle_listener.start()
-        print("键盘监听已停止")
+        self.hold_timer.stop()
+        self.fence_timer.stop()
+        self.clear_input_timer.stop()
+        self.disambiguation_timer.stop()
+        self.action_executor.shutdown(wait=False)
+        self.fence_executor.shutdown(wait=False)
+        self.usage_log.close()
+        self.event_stream.close()
+        if self.plugin_runner:
+            self.plugin_runner.shutdown()
+            self.plugin_runner = None
+        self.backend.close()
     
     def toggle_listening(self):
         """切换键盘监听状态"""
@@ -99,16 +248,29 @@ class KeyboardManager:
     
     def on_press(self, key):
         """按键按下事件处理"""
+        start = self.tracer.now()
+        result = self._handle_press(key)
+        self.tracer.record("hook", start)
+        return result
+    
+    def _handle_press(self, key):
+        """按键按下事件的实际处理"""
+        # 丢弃自身注入事件的回显
+        if self.injection_ledger.consume_press(key):
+            return True
+        
         if not self.active:
             # 即使在非活动状态下也要检查组合键
             self.current_keys.add(key)
+            if len(self.current_keys) < self.min_chord_size:
+                return True
             
             # 检查是否按下了启动/停止监听的组合键
             if self.current_keys.issuperset(self.toggle_key_combination):
                 self.toggle_listening()
                 # 清空按键集合以避免重复触发
                 self.current_keys.clear()
-                return False  # 抑制该按键事件
+                return True  # 返回False会停止常驻的监听器
             
             # 检查是否按下了获取鼠标位置的组合键
             if self.current_keys.issuperset(self.get_mouse_position_combination):
@@ -117,55 +279,114 @@ class KeyboardManager:
                     threading.Thread(target=self.get_mouse_position_callback, daemon=True).start()
                 # 清空按键集合以避免重复触发
                 self.current_keys.clear()
-                return False  # 抑制该按键事件
+                return True  # 返回False会停止常驻的监听器
+            
+            # 检查是否按下了导出跟踪记录的组合键
+            if self.current_keys.issuperset(self.dump_trace_combination):
+                threading.Thread(target=self.dump_trace, daemon=True).start()
+                self.current_keys.clear()
+                return True
             
             return True
             
+        # 系统自动重复只重复最后按下的键: 同一物理按键在没有释放、没有按下其他键的情况下
+        # 再次按下才算自动重复。释放事件丢失(如切换焦点)时，超过缓冲超时也不再算作重复
+        key_id = self._key_id(key)
+        now = time.monotonic()
+        repeat = key_id == self.repeat_key_id and now - self.repeat_key_time < self.buffer_timeout
+        self.repeat_key_id = key_id
+        self.repeat_key_time = now
         # 记录当前按下的键
         self.current_keys.add(key)
         
-        # 检查是否按下了启动/停止监听的组合键
-        if self.current_keys.issuperset(self.toggle_key_combination):
-            self.toggle_listening()
-            # 清空按键集合以避免重复触发
-            self.current_keys.clear()
-            return False  # 抑制该按键事件
+        # 自动重复不改变按下的键，组合键检查的结果与上一次相同
+        if not repeat and len(self.current_keys) >= self.min_chord_size:
+            # 检查是否按下了启动/停止监听的组合键
+            if self.current_keys.issuperset(self.toggle_key_combination):
+                self.toggle_listening()
+                # 清空按键集合以避免重复触发
+                self.current_keys.clear()
+                return True  # 返回False会停止常驻的监听器
+            
+            # 检查是否按下了获取鼠标位置的组合键
+            if self.current_keys.issuperset(self.get_mouse_position_combination):
+                if self.get_mouse_position_callback:
+                    # 在新线程中执行获取鼠标位置，避免阻塞键盘监听
+                    threading.Thread(target=self.get_mouse_position_callback, daemon=True).start()
+                # 清空按键集合以避免重复触发
+                self.current_keys.clear()
+                return True  # 返回False会停止常驻的监听器
+            
+            # 检查是否按下了导出跟踪记录的组合键
+            if self.current_keys.issuperset(self.dump_trace_combination):
+                threading.Thread(target=self.dump_trace, daemon=True).start()
+                self.current_keys.clear()
+                return True
         
-        # 检查是否按下了获取鼠标位置的组合键
-        if self.current_keys.issuperset(self.get_mouse_position_combination):
-            if self.get_mouse_position_callback:
-                # 在新线程中执行获取鼠标位置，避免阻塞键盘监听
-                threading.Thread(target=self.get_mouse_position_callback, daemon=True).start()
-            # 清空按键集合以避免重复触发
-            self.current_keys.clear()
-            return False  # 抑制该按键事件
+        # 自动重复和超出每秒事件预算的按键跳过匹配和悬浮窗口更新
+        if self._should_shed(key, repeat):
+            return True
         
         # 将按键转换为字符串形式并更新实时输入显示
+        # 未匹配的按键是最常见的情况，这条路径上不分配新对象
         try:
-            if hasattr(key, 'char') and key.char:
-                key_str = key.char
-                # 更新实时输入
-                self.current_input += key_str
-            else:
-                key_str = str(key).replace('Key.', '')
-                # 对于特殊键，添加方括号标记
-                self.current_input += f"[{key_str}]"
+            convert_start = self.tracer.now()
+            key_str, label = self._get_key_label(key)
+            # 更新实时输入
+            parts = self.input_parts
+            parts.append(label)
+            if len(parts) > 2 * self.max_input_length:
+                # 只保留末尾部分，避免长时间输入不停顿时无限增长
+                del parts[:-self.max_input_length]
+            self.tracer.record("convert", convert_start)
             
             # 更新悬浮窗口显示
-            self._notify_overlay_update(self.current_input)
+            self._notify_overlay_update()
             
-            # 添加到缓冲区
+            # 超时后匹配器回到根节点，相当于清空按键缓冲区
             current_time = time.time()
             if current_time - self.last_key_time > self.buffer_timeout:
-                # 超时清空缓冲区
-                self.key_buffer = []
-            
-            self.key_buffer.append(key_str.lower())
+                self._reset_match()
+                # 释放事件丢失的按键不再留在按下的键中，组合键的修饰键除外
+                if len(self.current_keys) > 1:
+                    self.current_keys.intersection_update(self.chord_modifiers)
+                    self.current_keys.add(key)
             self.last_key_time = current_time
             
-            # 检查是否匹配自定义映射
-            buffer_str = ''.join(self.key_buffer)
-            self.check_custom_mapping(buffer_str)
+            # 沿前缀树前进，等价于比较整个缓冲区与触发序列
+            match_start = self.tracer.now()
+            if self.pending_node is not None or self.pending_fired:
+                self._resolve_pending_trigger(key, key_str)
+            node = self.match_node
+            if node is not None:
+                if len(key_str) == 1:
+                    node = node.children.get(key_str)
+                else:
+                    node = node.step(key_str)
+            self.match_node = node
+            if node is not None and self.mapping_snapshot.patterns:
+                keys = self.match_keys
+                keys.append(key_str)
+                if len(keys) > 2 * self.max_input_length:
+                    # 模式中的 * 和 + 可以无限延伸，过长的输入不再匹配
+                    self.match_node = node = None
+            
+            # 检查是否匹配自定义映射，拦截模式下由钩子过滤器负责匹配
+            if node is not None and node.action is not None and not self.suppress_mode:
+                if node.children and self.disambiguation_delay:
+                    # 该触发序列还有更长的延伸，等待消歧延迟后再触发
+                    with self.pending_lock:
+                        self.pending_keys = tuple(self.match_keys)
+                        self.pending_node = node
+                    self.disambiguation_timer.schedule(self.disambiguation_delay)
+                else:
+                    self.check_custom_mapping(node.trigger)
+                    # 触发字符会被删除，下一次输入重新从根节点开始匹配
+                    self._reset_match()
+            self.tracer.record("match", match_start)
+            
+            # 更新候选提示，候选文本已在编译时生成
+            self._notify_candidates_update(node.preview if node is not None else "")
             
         except AttributeError:
             pass
@@ -174,71 +395,341 @@ class KeyboardManager:
         # 但我们只在匹配到自定义映射时才抑制
         return True
     
+    def _should_shed(self, key, repeat):
+        """判断按键事件是否跳过匹配和显示
+
+        自动重复事件只有在按键属于 repeat_triggers 中的触发序列时才正常处理；
+        每秒按键事件超过 max_events_per_second 时，超出的事件全部跳过。
+        """
+        now = time.monotonic()
+        if now - self.budget_window_start >= 1.0:
+            if self.shed_count:
+                print(f"按键事件过多，上一秒跳过了 {self.shed_count} 个事件的匹配和显示")
+            self.budget_window_start = now
+            self.budget_used = 0
+            self.shed_count = 0
+        self.budget_used += 1
+        if repeat and self._get_key_label(key)[0] not in self.mapping_snapshot.repeat_keys:
+            return self._shed_event()
+        if self.event_budget and self.budget_used > self.event_budget:
+            return self._shed_event()
+        return False
+    
+    def _shed_event(self):
+        """跳过一个按键事件，输入中多出的字符使本轮匹配失效"""
+        self.shed_count += 1
+        if self.pending_node is not None:
+            self._cancel_pending_trigger()
+        self.match_node = None
+        self.match_keys.clear()
+        self._notify_candidates_update("")
+        return True
+    
+    def _get_key_label(self, key):
+        """获取按键的 (匹配用文本, 显示片段)，结果按字符或特殊键缓存"""
+        char = getattr(key, 'char', None)
+        if char:
+            labels = self.char_labels.get(char)
+            if labels is None:
+                labels = (char.lower(), char)
+                self._cache_label(self.char_labels, char, labels)
+            return labels
+        labels = self.key_labels.get(key)
+        if labels is None:
+            key_str = str(key).replace('Key.', '')
+            # 对于特殊键，添加方括号标记
+            labels = (key_str.lower(), f"[{key_str}]")
+            self._cache_label(self.key_labels, key, labels)
+        return labels
+    
+    def _key_id(self, key):
+        """获取按键对应物理按键的标识，按下和释放时 Shift 或 Ctrl 状态不同也相同"""
+        if self.key_id_by_vk:
+            vk = getattr(key, 'vk', None)
+            if vk is not None:
+                return vk
+        return self._get_key_label(key)[0]
+    
+    def _cache_label(self, cache, key, labels):
+        """缓存按键显示片段，缓存数量有上限"""
+        if len(cache) < 512:
+            cache[key] = labels
+    
+    def get_current_input(self):
+        """获取实时输入文本"""
+        return "".join(self.input_parts)
+    
     def on_release(self, key):
         """按键释放事件处理"""
+        # 丢弃自身注入事件的回显
+        if self.injection_ledger.consume_release(key):
+            return
+        
         try:
-            self.current_keys.discard(key)
+            key_id = self._key_id(key)
+            if key_id == self.repeat_key_id:
+                self.repeat_key_id = None
+            if key in self.current_keys:
+                self.current_keys.remove(key)
+            elif self.current_keys:
+                # 按下和释放时的字符不同，如先松开 Shift 再松开字母，或 Ctrl+字母报告为控制字符
+                for pressed in [pressed for pressed in self.current_keys if self._key_id(pressed) == key_id]:
+                    self.current_keys.discard(pressed)
             
             # 检查是否所有键都已释放，如果是则在超时后清空输入显示
             if not self.current_keys:
-                # 启动一个定时器，在超时后清空输入显示
-                threading.Timer(self.buffer_timeout, self._clear_input_display).start()
+                # 重新调度常驻定时器，在超时后清空输入显示
+                self.clear_input_timer.schedule(self.buffer_timeout)
         except KeyError:
             pass
     
-    def _toggle_on_press(self, key):
-        """在非活动状态下监听启动组合键的专用方法"""
-        # 记录当前按下的键
-        self.current_keys.add(key)
-        
-        # 检查是否按下了启动/停止监听的组合键
-        if self.current_keys.issuperset(self.toggle_key_combination):
-            self.toggle_listening()
-            # 清空按键集合以避免重复触发
-            self.current_keys.clear()
-            return False  # 抑制该按键事件
+    def _on_snapshot(self, snapshot):
+        """配置变更后切换到新的映射快照"""
+        self.mapping_snapshot = snapshot
+        self.usage_log.register(snapshot.actions)
+        self._ensure_plugin_runner(snapshot)
+        self.trigger_suppressor.rebuild(snapshot.matcher)
+    
+    def _win32_event_filter(self, msg, data):
+        """Windows 底层钩子过滤器，暂扣输入围栏期间的按键和可能构成触发序列的按键"""
+        # 注入的事件(包括重放的按键)直接放行
+        if data.flags & LLKHF_INJECTED:
+            return True
+        if self.input_fence.active and msg in (WM_KEYDOWN, WM_SYSKEYDOWN, WM_KEYUP, WM_SYSKEYUP):
+            action, events = self.input_fence.hold(data.vkCode, msg in (WM_KEYUP, WM_SYSKEYUP))
+            if action != InputFence.PASS:
+                if action == InputFence.BREAK:
+                    self._replay_fenced_now(events)
+                else:
+                    # 截止时间从最早暂扣的按键算起，之后暂扣的按键不会推迟它
+                    self.fence_timer.schedule(self.input_fence.held_since + self.input_fence.max_hold - time.monotonic())
+                self.listener.suppress_event()
+        # 只在监听状态下处理用户按下的按键
+        if not self.suppress_mode or not self.active or msg not in (WM_KEYDOWN, WM_SYSKEYDOWN):
+            return True
+        action, payload = self.trigger_suppressor.feed(VK_CHARS.get(data.vkCode), data.vkCode)
+        if action == TriggerSuppressor.PASS:
+            return True
         
-        # 检查是否按下了获取鼠标位置的组合键
-        if self.current_keys.issuperset(self.get_mouse_position_combination):
-            if self.get_mouse_position_callback:
-                # 在新线程中执行获取鼠标位置，避免阻塞键盘监听
-                threading.Thread(target=self.get_mouse_position_callback, daemon=True).start()
-            # 清空按键集合以避免重复触发
-            self.current_keys.clear()
-            return False  # 抑制该按键事件
+        if action == TriggerSuppressor.HOLD:
+            self.hold_timer.schedule(self.buffer_timeout)
+            # 在悬浮窗口中显示暂扣的字符
+            self._notify_overlay_update(self.get_current_input() + self.trigger_suppressor.get_held_text())
+        elif action == TriggerSuppressor.COMPLETE:
+            self.hold_timer.cancel()
+            self._notify_overlay_update()
+            # 触发字符从未到达目标程序，无需删除；模式触发序列用暂扣的文本取出捕获组
+            trigger, typed = payload
+            self.check_custom_mapping(trigger, delete_length=0, keys=typed)
+        else:
+            self.hold_timer.cancel()
+            self._replay_keys(payload)
         
-        return True
+        # 抑制该按键事件
+        self.listener.suppress_event()
     
-    def check_custom_mapping(self, key_str):
-        """检查自定义按键映射"""
-        # 获取按键映射
-        mappings = self.config_manager.get_mappings()
-        
-        # 检查是否匹配任何按键映射
-        if key_str in mappings:
-            hotkey = mappings[key_str]
-            # 记录触发字符的长度
-            trigger_length = len(key_str)
-            # 在新线程中执行快捷键，避免阻塞键盘监听
-            threading.Thread(target=self.execute_hotkey_and_delete, args=(hotkey, trigger_length), daemon=True).start()
-            return True
+    def _flush_held_keys(self):
+        """超时后重放暂扣的按键"""
+        replay = self.trigger_suppressor.flush()
+        if replay:
+            self._replay_keys(replay)
+    
+    def _replay_keys(self, vks):
+        """在动作线程中按顺序重放按键，重放的按键作为注入事件不会再次被暂扣"""
+        def replay():
+            try:
+                controller = self.keyboard.Controller()
+                for vk in vks:
+                    key = self.keyboard.KeyCode.from_vk(vk)
+                    controller.press(key)
+                    controller.release(key)
+            except Exception as e:
+                print(f"重放按键失败: {e}")
         
-        # 获取鼠标点击映射
-        mouse_mappings = self.config_manager.get_mouse_mappings()
+        # 与触发的动作共用同一个执行器，保证重放和动作的先后顺序
+        self.action_executor.submit(replay)
+    
+    def _open_fence(self):
+        """匹配到触发序列或动作开始注入前开启输入围栏"""
+        if self.fence_enabled:
+            self.input_fence.open()
+    
+    def _close_fence(self):
+        """动作结束后关闭输入围栏，并在当前线程中按顺序重放暂扣的按键"""
+        if not self.fence_enabled:
+            return
+        self.input_fence.close()
+        # 重放期间到达的按键继续暂扣，直到全部重放完
+        events = self.input_fence.drain()
+        while events:
+            self._inject_fenced(events)
+            events = self.input_fence.drain()
+        self.fence_timer.cancel()
+    
+    def _expire_fence(self):
+        """暂扣的按键等待过久，说明动作卡住，立即重放"""
+        events = self.input_fence.expire()
+        if events:
+            print(f"动作执行超过 {self.input_fence.max_hold:.1f} 秒，立即重放 {len(events)} 个暂扣的按键")
+            self._inject_fenced(events)
+    
+    def _replay_fenced_now(self, events):
+        """围栏失效，不等动作结束，在重放线程中立即重放暂扣的按键"""
+        print(f"动作执行期间暂扣的按键超过上限，立即重放 {len(events)} 个按键")
+        try:
+            self.fence_executor.submit(self._inject_fenced, events)
+        except RuntimeError as e:
+            # 重放执行器已关闭
+            print(f"重放暂扣的按键失败: {e}")
+    
+    def _inject_fenced(self, events):
+        """重放围栏暂扣的按键事件，重放的事件作为注入事件不会再次被暂扣"""
+        try:
+            controller = self.keyboard.Controller()
+            for vk, release in events:
+                key = self.keyboard.KeyCode.from_vk(vk)
+                if release:
+                    controller.release(key)
+                else:
+                    controller.press(key)
+        except Exception as e:
+            print(f"重放暂扣的按键失败: {e}")
+    
+    def check_custom_mapping(self, key_str, delete_length=None, keys=None, retype=None):
+        """检查自定义按键映射，delete_length 为需要删除的触发字符数，默认为触发序列长度
+
+        模式触发序列用本轮匹配输入的按键(keys，默认为 match_keys)取出捕获组，
+        代入动作中的 {n} 占位符，删除的字符数为本轮匹配输入的按键数。
+        retype 为触发序列之后已经输入的一个按键，随触发字符一起删除，动作完成后重新输入。
+        """
+        # 只读取当前快照，不访问可变的配置
+        snapshot = self.mapping_snapshot
+        action = snapshot.actions.get(key_str)
+        if action is None:
+            return False
+        kind, value = action
+        typed = key_str
         
-        # 检查是否匹配任何鼠标点击映射
-        if key_str in mouse_mappings:
-            position = mouse_mappings[key_str]
-            # 记录触发字符的长度
-            trigger_length = len(key_str)
-            # 在新线程中执行鼠标点击，避免阻塞键盘监听
-            threading.Thread(target=self.execute_mouse_click_and_delete, args=(position, trigger_length), daemon=True).start()
-            return True
+        pattern = snapshot.patterns.get(key_str)
+        if pattern is not None:
+            if keys is None:
+                keys = self.match_keys
+            typed = "".join(keys)
+            match = pattern.fullmatch(typed)
+            if match is None:
+                return False
+            if kind != 'plugin':
+                value = expand_template(value, match)
+            if delete_length is None:
+                delete_length = len(keys)
         
-        return False
+        # 记录触发字符的长度
+        trigger_length = len(key_str) if delete_length is None else delete_length
+        if retype is not None:
+            trigger_length += 1
+        args = (value, trigger_length)
+        if kind == 'hotkey':
+            target = self.execute_hotkey_and_delete
+        elif kind == 'plugin':
+            target = self.execute_plugin_and_delete
+            args = (value, trigger_length, typed)
+        else:
+            target = self.execute_mouse_click_and_delete
+        # 匹配时就开启输入围栏，动作排队等待期间用户继续输入的按键也会暂扣，
+        # 不会跑到退格和快捷键前面；动作结束时关闭
+        self._open_fence()
+        # 提交到动作执行器，避免阻塞键盘监听
+        enqueue_start = self.tracer.now()
+        try:
+            self.action_executor.submit(self._run_action, target, args, enqueue_start, key_str, time.perf_counter(), retype)
+        except RuntimeError as e:
+            # 动作执行器已关闭
+            self._close_fence()
+            print(f"提交动作失败: {e}")
+            return False
+        self.tracer.record("enqueue", enqueue_start, args={"trigger": key_str})
+        self.event_stream.publish("trigger", trigger=key_str, kind=kind, typed=typed)
+        return True
+    
+    def _cancel_pending_trigger(self):
+        """放弃等待消歧的触发序列"""
+        with self.pending_lock:
+            self.pending_node = None
+        self.disambiguation_timer.cancel()
     
-    def execute_hotkey(self, hotkey):
-        """执行快捷键"""
+    def _resolve_pending_trigger(self, key, key_str):
+        """监听线程收到新按键时处理等待消歧的触发序列
+
+        新按键能延伸该触发序列时说明用户还在继续输入，放弃触发；不能延伸时
+        (如等待 "cop" 时输入空格)先触发它，新按键随触发字符一起删除并在动作后重新输入。
+        计时线程已经触发时，匹配器回到根节点。之后新按键从根节点开始匹配。
+        """
+        with self.pending_lock:
+            node = self.pending_node
+            keys = self.pending_keys
+            fired = self.pending_fired
+            self.pending_node = None
+            self.pending_keys = ()
+            self.pending_fired = False
+        if node is not None:
+            self.disambiguation_timer.cancel()
+            if (node.children.get(key_str) if len(key_str) == 1 else node.step(key_str)) is not None:
+                return
+            fired = self.check_custom_mapping(node.trigger, keys=keys, retype=key)
+        if fired:
+            self._reset_match()
+    
+    def _fire_pending_trigger(self):
+        """消歧延迟内没有后续输入，在计时线程中触发等待中的触发序列
+
+        只提交动作，不修改匹配状态；匹配器由监听线程在下一个按键前重置。
+        """
+        with self.pending_lock:
+            node = self.pending_node
+            if node is None:
+                return
+            # 先设置标志再清空等待节点，监听线程不加锁读取时总能看到其中之一
+            self.pending_fired = True
+            self.pending_node = None
+            keys = self.pending_keys
+            self.pending_keys = ()
+            self.check_custom_mapping(node.trigger, keys=keys)
+    
+    def _retype_key(self, key):
+        """在动作线程中重新输入随触发字符一起删除的按键"""
+        try:
+            controller = self.keyboard.Controller()
+            self._inject_press(controller, key)
+            self._inject_release(controller, key)
+        except Exception as e:
+            print(f"重新输入按键失败: {e}")
+    
+    def _run_action(self, target, args, enqueue_start, trigger, matched_at, retype=None):
+        """在动作线程中执行动作，并记录从提交到开始执行的等待时间和触发使用记录
+
+        输入围栏已在匹配时开启，动作结束后在这里关闭。retype 为动作完成后需要重新输入的按键。
+        """
+        self.tracer.record("dequeue", enqueue_start, args={"trigger": trigger})
+        started = time.perf_counter()
+        try:
+            target(*args)
+            if retype is not None:
+                self._retype_key(retype)
+        except Exception as e:
+            print(f"执行动作失败: {e}")
+            self.event_stream.publish("latency", trigger=trigger, ok=False, error=str(e))
+            return
+        finally:
+            self._close_fence()
+        latency = time.perf_counter() - matched_at
+        self.usage_log.record(trigger, latency)
+        self.event_stream.publish(
+            "latency", trigger=trigger, ok=True,
+            queue_ms=round((started - matched_at) * 1000, 3), total_ms=round(latency * 1000, 3)
+        )
+    
+    def execute_hotkey(self, hotkey, delay=0):
+        """执行快捷键，delay 为相邻注入事件之间的间隔(秒)"""
         try:
             print(f"执行快捷键: {hotkey}")
             
@@ -264,84 +755,156 @@ class KeyboardManager:
                     key_combination.append(k)
             
             # 使用pynput执行快捷键
-            controller = keyboard.Controller()
+            controller = self.keyboard.Controller()
             # 按下控制键
             if ctrl:
-                controller.press(keyboard.Key.ctrl)
+                self._inject_press(controller, self.keyboard.Key.ctrl)
             if shift:
-                controller.press(keyboard.Key.shift)
+                self._inject_press(controller, self.keyboard.Key.shift)
             if alt:
-                controller.press(keyboard.Key.alt)
+                self._inject_press(controller, self.keyboard.Key.alt)
+            if delay and (ctrl or shift or alt):
+                time.sleep(delay)
             
             # 按下普通键
             for key_char in key_combination:
                 if len(key_char) == 1:
                     # 字符键
-                    controller.press(key_char)
-                    controller.release(key_char)
+                    self._inject_press(controller, key_char)
+                    self._inject_release(controller, key_char)
+                    if delay:
+                        time.sleep(delay)
                 else:
                     # 特殊键
                     special_keys = {
-                        'enter': keyboard.Key.enter,
-                        'space': keyboard.Key.space,
-                        'tab': keyboard.Key.tab,
-                        'esc': keyboard.Key.esc,
-                        'backspace': keyboard.Key.backspace,
-                        'delete': keyboard.Key.delete,
-                        'home': keyboard.Key.home,
-                        'end': keyboard.Key.end,
-                        'pageup': keyboard.Key.page_up,
-                        'pagedown': keyboard.Key.page_down,
-                        'up': keyboard.Key.up,
-                        'down': keyboard.Key.down,
-                        'left': keyboard.Key.left,
-                        'right': keyboard.Key.right,
-                        'f1': keyboard.Key.f1,
-                        'f2': keyboard.Key.f2,
-                        'f3': keyboard.Key.f3,
-                        'f4': keyboard.Key.f4,
-                        'f5': keyboard.Key.f5,
-                        'f6': keyboard.Key.f6,
-                        'f7': keyboard.Key.f7,
-                        'f8': keyboard.Key.f8,
-                        'f9': keyboard.Key.f9,
-                        'f10': keyboard.Key.f10,
-                        'f11': keyboard.Key.f11,
-                        'f12': keyboard.Key.f12,
+                        'enter': self.keyboard.Key.enter,
+                        'space': self.keyboard.Key.space,
+                        'tab': self.keyboard.Key.tab,
+                        'esc': self.keyboard.Key.esc,
+                        'backspace': self.keyboard.Key.backspace,
+                        'delete': self.keyboard.Key.delete,
+                        'home': self.keyboard.Key.home,
+                        'end': self.keyboard.Key.end,
+                        'pageup': self.keyboard.Key.page_up,
+                        'pagedown': self.keyboard.Key.page_down,
+                        'up': self.keyboard.Key.up,
+                        'down': self.keyboard.Key.down,
+                        'left': self.keyboard.Key.left,
+                        'right': self.keyboard.Key.right,
+                        'f1': self.keyboard.Key.f1,
+                        'f2': self.keyboard.Key.f2,
+                        'f3': self.keyboard.Key.f3,
+                        'f4': self.keyboard.Key.f4,
+                        'f5': self.keyboard.Key.f5,
+                        'f6': self.keyboard.Key.f6,
+                        'f7': self.keyboard.Key.f7,
+                        'f8': self.keyboard.Key.f8,
+                        'f9': self.keyboard.Key.f9,
+                        'f10': self.keyboard.Key.f10,
+                        'f11': self.keyboard.Key.f11,
+                        'f12': self.keyboard.Key.f12,
                     }
                     
                     if key_char in special_keys:
-                        controller.press(special_keys[key_char])
-                        controller.release(special_keys[key_char])
+                        self._inject_press(controller, special_keys[key_char])
+                        self._inject_release(controller, special_keys[key_char])
+                        if delay:
+                            time.sleep(delay)
             
             # 释放控制键
             if alt:
-                controller.release(keyboard.Key.alt)
+                self._inject_release(controller, self.keyboard.Key.alt)
             if shift:
-                controller.release(keyboard.Key.shift)
+                self._inject_release(controller, self.keyboard.Key.shift)
             if ctrl:
-                controller.release(keyboard.Key.ctrl)
+                self._inject_release(controller, self.keyboard.Key.ctrl)
                     
         except Exception as e:
             print(f"执行快捷键失败: {e}")
     
+    def _inject_press(self, controller, key):
+        """注入按下事件并记入台账"""
+        self.injection_ledger.record_press(key)
+        controller.press(key)
+    
+    def _inject_release(self, controller, key):
+        """注入释放事件并记入台账"""
+        self.injection_ledger.record_release(key)
+        controller.release(key)
+    
+    def type_text(self, text, delay=0):
+        """以给定间隔逐个输入字符"""
+        try:
+            controller = self.keyboard.Controller()
+            for char in text:
+                self._inject_press(controller, char)
+                self._inject_release(controller, char)
+                if delay:
+                    time.sleep(delay)
+        except Exception as e:
+            print(f"输入文本失败: {e}")
+    
     def execute_mouse_click(self, position):
         """执行鼠标点击"""
         try:
             print(f"执行鼠标点击: {position}")
             
-            # 解析位置字符串 "x,y"
-            x, y = map(int, position.split(','))
+            if image_anchor.is_image_position(position):
+                # 在屏幕上查找参考图像，点击其中心
+                coordinates = self._locate_image(position)
+                if coordinates is None:
+                    print(f"未在屏幕上找到图像锚点: {position}")
+                    return
+                x, y = coordinates
+            else:
+                # 解析位置字符串 "x,y"
+                x, y = map(int, position.split(','))
             
             # 移动鼠标到指定位置
             self.mouse_controller.position = (x, y)
             
             # 执行鼠标左键点击
-            self.mouse_controller.click(mouse.Button.left, 1)
+            self.mouse_controller.click(self.mouse.Button.left, 1)
             
         except Exception as e:
             print(f"执行鼠标点击失败: {e}")
     
+    def _locate_image(self, position):
+        """查找图像锚定位置的屏幕坐标"""
+        if not image_anchor.is_available():
+            print("图像锚定需要安装 numpy 和 Pillow")
+            return None
+        if self.image_locator is None:
+            self.image_locator = image_anchor.ImageLocator(
+                self.config_manager.get_setting("image_match_threshold", 0.8),
+                base_dir=os.path.dirname(os.path.abspath(self.config_manager.config_file))
+            )
+        return self.image_locator.locate(position)
+    
+    def get_device_stats(self):
+        """获取输入后端的设备统计: 设备路径 -> 统计字典，后端不提供统计时为空"""
+        get_stats = getattr(self.backend, 'get_device_stats', None)
+        if get_stats is None:
+            return {}
+        try:
+            return get_stats()
+        except Exception as e:
+            print(f"读取输入设备统计失败: {e}")
+            return {}
+    
+    def dump_trace(self, path=None):
+        """导出最近的跟踪记录为 Chrome trace JSON 文件"""
+        if not self.tracer.enabled:
+            print("跟踪记录未启用，请使用 --trace 参数启动或在配置中启用 trace.enabled")
+            return None
+        try:
+            path = self.tracer.dump(path, self.trace_dump_seconds)
+            print(f"跟踪记录已导出到 {path}")
+            return path
+        except Exception as e:
+            print(f"导出跟踪记录失败: {e}")
+            return None
+    
     def is_active(self):
         """检查键盘监听是否处于活动状态"""
         return self.active
@@ -362,53 +925,175 @@ class KeyboardManager:
         """设置悬浮窗口更新回调函数"""
         self.overlay_callback = callback
     
-    def _notify_overlay_update(self, text):
-        """通知悬浮窗口更新显示"""
+    def _notify_overlay_update(self, text=None):
+        """通知悬浮窗口更新显示，text 为 None 时显示实时输入"""
         if self.overlay_callback:
             try:
-                self.overlay_callback(text)
+                self.overlay_callback(self.get_current_input() if text is None else text)
             except Exception as e:
                 print(f"悬浮窗口回调执行失败: {e}")
     
+    def reset_key_state(self):
+        """清空按键状态和缓冲区"""
+        self.current_keys.clear()
+        self.repeat_key_id = None
+        self.last_key_time = 0
+        self._reset_match()
+    
+    def _reset_match(self):
+        """匹配器回到根节点，重新开始匹配"""
+        self.match_node = self.mapping_snapshot.matcher
+        self.match_keys.clear()
+    
+    def set_candidates_callback(self, callback):
+        """设置候选触发序列提示回调函数"""
+        self.candidates_callback = callback
+    
+    def _notify_candidates_update(self, preview):
+        """通知悬浮窗口更新候选提示，内容不变时不通知"""
+        if preview is self._last_preview or not self.candidates_callback:
+            return
+        self._last_preview = preview
+        try:
+            self.candidates_callback(preview)
+        except Exception as e:
+            print(f"候选提示回调执行失败: {e}")
+    
     def _clear_input_display(self):
         """清空输入显示"""
-        self.current_input = ""
+        self.input_parts.clear()
         self._notify_overlay_update("")
+        self._notify_candidates_update("")
     
     def execute_hotkey_and_delete(self, hotkey, delete_length):
         """执行快捷键并删除触发字符"""
+        # 按前台窗口类获取注入间隔
+        delay = self.injection_pacer.foreground_delay()
+        
         # 首先删除触发字符
-        self.delete_trigger_chars(delete_length)
+        delete_start = self.tracer.now()
+        self.delete_trigger_chars(delete_length, delay)
+        self.tracer.record("delete", delete_start, args={"count": delete_length})
         
         # 然后执行快捷键
-        self.execute_hotkey(hotkey)
+        inject_start = self.tracer.now()
+        self.execute_hotkey(hotkey, delay)
+        self.tracer.record("inject", inject_start, args={"hotkey": hotkey})
     
     def execute_mouse_click_and_delete(self, position, delete_length):
         """执行鼠标点击并删除触发字符"""
+        delay = self.injection_pacer.foreground_delay()
+        
         # 首先删除触发字符
-        self.delete_trigger_chars(delete_length)
+        delete_start = self.tracer.now()
+        self.delete_trigger_chars(delete_length, delay)
+        self.tracer.record("delete", delete_start, args={"count": delete_length})
         
         # 然后执行鼠标点击
+        inject_start = self.tracer.now()
         self.execute_mouse_click(position)
+        self.tracer.record("inject", inject_start, args={"position": position})
+    
+    def _ensure_plugin_runner(self, snapshot):
+        """快照中有插件映射时创建插件执行器，删除最后一个插件映射后关闭它"""
+        if not snapshot.plugin_mappings:
+            runner = self.plugin_runner
+            if runner is not None:
+                self.plugin_runner = None
+                runner.shutdown()
+            return
+        if self.plugin_runner is not None:
+            return
+        try:
+            self.plugin_runner = PluginRunner(
+                self.config_manager.get_setting("plugin_dir", "plugins"),
+                self.config_manager.get_setting("plugin_workers", 1),
+                self.config_manager.get_setting("plugin_max_result_chars", 10000)
+            )
+        except Exception as e:
+            print(f"创建插件执行器失败: {e}")
     
-    def delete_trigger_chars(self, length):
-        """删除指定长度的触发字符"""
+    def execute_plugin_and_delete(self, plugin, delete_length, trigger):
+        """删除触发字符并提交插件调用，插件结果返回后再回到动作线程输出"""
+        function, source, output, timeout = plugin
+        if self.plugin_runner is None:
+            print(f"插件执行器不可用，无法执行插件: {function}")
+            return
+        delay = self.injection_pacer.foreground_delay()
+        delete_start = self.tracer.now()
+        self.delete_trigger_chars(delete_length, delay)
+        self.tracer.record("delete", delete_start, args={"count": delete_length})
+        
+        context = {"trigger": trigger, "clipboard": None}
+        if source == "clipboard":
+            try:
+                import pyperclip
+                context["clipboard"] = pyperclip.paste()
+            except Exception as e:
+                print(f"读取剪贴板失败: {e}")
+        print(f"执行插件: {function}")
+        # 不在动作线程中等待插件，插件执行期间其他动作照常执行
+        future = self.plugin_runner.submit(function, context, timeout)
+        future.add_done_callback(lambda done: self._on_plugin_done(done, function, output))
+    
+    def _on_plugin_done(self, future, function, output):
+        """插件调用结束，把结果交回动作线程输出"""
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"执行插件 {function} 失败: {e}")
+            return
+        if result is None or output == "none":
+            return
+        try:
+            self.action_executor.submit(self._output_plugin_result, result, output)
+        except RuntimeError as e:
+            # 动作执行器已关闭
+            print(f"输出插件结果失败: {e}")
+    
+    def _output_plugin_result(self, result, output):
+        """在动作线程中输出插件结果"""
+        if output == "clipboard":
+            try:
+                import pyperclip
+                pyperclip.copy(result)
+            except Exception as e:
+                print(f"写入剪贴板失败: {e}")
+            return
+        delay = self.injection_pacer.foreground_delay()
+        inject_start = self.tracer.now()
+        self._open_fence()
+        try:
+            self.type_text(result, delay)
+        finally:
+            self._close_fence()
+        self.tracer.record("inject", inject_start, args={"chars": len(result)})
+    
+    def _trim_input(self, length):
+        """从实时输入末尾删除 length 个字符"""
+        parts = self.input_parts
+        while length > 0 and parts:
+            last = parts.pop()
+            if len(last) > length:
+                parts.append(last[:-length])
+                break
+            length -= len(last)
+    
+    def delete_trigger_chars(self, length, delay=0.01):
+        """删除指定长度的触发字符，delay 为相邻退格之间的间隔(秒)"""
         try:
             # 使用退格键删除触发字符
-            controller = keyboard.Controller()
+            controller = self.keyboard.Controller()
             for _ in range(length):
-                controller.press(keyboard.Key.backspace)
-                controller.release(keyboard.Key.backspace)
-                time.sleep(0.01)  # 短暂延迟确保删除操作完成
+                self._inject_press(controller, self.keyboard.Key.backspace)
+                self._inject_release(controller, self.keyboard.Key.backspace)
+                if delay:
+                    time.sleep(delay)  # 按目标窗口调整的间隔，确保删除操作完成
             
             # 同时更新当前输入显示
-            if len(self.current_input) >= length:
-                self.current_input = self.current_input[:-length]
-                self._notify_overlay_update(self.current_input)
-            
-            # 清空按键缓冲区
-            if len(self.key_buffer) >= length:
-                self.key_buffer = self.key_buffer[:-length]
+            if length and sum(map(len, self.input_parts)) >= length:
+                self._trim_input(length)
+                self._notify_overlay_update()
                 
         except Exception as e:
             print(f"删除触发字符失败: {e}")
\ No newline at end of file
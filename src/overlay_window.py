@@ -13,10 +13,13 @@ import threading
 class OverlayWindow:
     """悬浮窗口类"""
     
-    def __init__(self):
+    def __init__(self, tracer=None):
         """初始化悬浮窗口"""
+        # 流水线跟踪记录器，用于记录悬浮窗口的渲染耗时
+        self.tracer = tracer
         self.root = None
         self.text_var = None
+        self.candidates_var = None
         self.window_visible = False
         self.window_thread = None
         self.window_lock = threading.Lock()
@@ -30,7 +33,7 @@ class OverlayWindow:
             # 创建顶层窗口
             self.root = tk.Tk()
             self.root.title("按键输入显示")
-            self.root.geometry("300x60+100+100")
+            self.root.geometry("+100+100")
             self.root.overrideredirect(True)  # 无边框窗口
             self.root.attributes('-topmost', True)  # 置顶显示
             self.root.attributes('-alpha', 0.8)  # 半透明效果
@@ -46,11 +49,28 @@ class OverlayWindow:
                 bg='#2c3e50',
                 fg='white',
                 font=('Arial', 12),
+                width=30,
+                anchor=tk.W,
                 padx=10,
                 pady=10
             )
             label.pack(fill=tk.BOTH, expand=True)
             
+            # 创建候选触发序列提示标签
+            self.candidates_var = tk.StringVar(value="")
+            candidates_label = tk.Label(
+                self.root,
+                textvariable=self.candidates_var,
+                bg='#2c3e50',
+                fg='#95a5a6',
+                font=('Arial', 10),
+                anchor=tk.W,
+                justify=tk.LEFT,
+                wraplength=300,
+                padx=10
+            )
+            candidates_label.pack(fill=tk.X)
+            
             # 隐藏窗口直到有内容显示
             self.root.withdraw()
             self.window_visible = False
@@ -87,9 +107,22 @@ class OverlayWindow:
             return
             
         # 在主线程中更新UI
-        self.root.after(0, self._update_text_ui, text)
+        start = self.tracer.now() if self.tracer else 0
+        self.root.after(0, self._update_text_ui, text, start)
+    
+    def update_candidates(self, preview):
+        """更新候选触发序列提示"""
+        if self.root is None:
+            return
+        
+        self.root.after(0, self._update_candidates_ui, preview)
     
-    def _update_text_ui(self, text):
+    def _update_candidates_ui(self, preview):
+        """在UI线程中更新候选提示"""
+        if self.candidates_var:
+            self.candidates_var.set(f"→ {preview}" if preview else "")
+    
+    def _update_text_ui(self, text, start=0):
         """在UI线程中更新文本"""
         if self.text_var:
             self.text_var.set(text)
@@ -101,6 +134,10 @@ class OverlayWindow:
             elif not text and self.window_visible:
                 self.root.withdraw()  # 隐藏窗口
                 self.window_visible = False
+            
+            # 记录从请求更新到渲染完成的耗时
+            if self.tracer:
+                self.tracer.record("overlay", start)
     
     def hide_window(self):
         """隐藏悬浮窗口"""
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+模式触发序列模块
+以 "re:" 开头的触发序列是受限的正则表达式，例如 re:s(\\d{1,2}); 。
+所有模式与普通触发序列一起编译为一个确定有限自动机(DFA)，每次按键仍然
+只做一次字典查找；触发时再用 re.fullmatch 取出捕获组，代入动作中的
+{1} 或 $1 占位符。
+"""
+
+import functools
+import heapq
+import os
+import re
+import string
+import sys
+
+# 添加src目录到Python路径
+sys.path.append(os.path.join(os.path.dirname(__file__)))
+
+from trigger_matcher import MatcherNode, describe_action, set_candidates
+
+PATTERN_PREFIX = "re:"
+# 模式中 . 和取反字符类可以匹配的字符: 可打印 ASCII 字符(按键文本均为小写)
+ALPHABET = frozenset(chr(code) for code in range(0x20, 0x7f)) - frozenset(string.ascii_uppercase)
+SHORTHANDS = {
+    'd': frozenset(string.digits),
+    'w': frozenset(string.ascii_lowercase + string.digits + '_'),
+    's': frozenset(' \t'),
+}
+# {m,n} 中允许的最大次数
+MAX_REPEAT = 32
+
+
+class PatternError(ValueError):
+    """模式语法错误或模式集合过大"""
+
+
+def is_pattern(trigger):
+    """触发序列是否为模式"""
+    return trigger.startswith(PATTERN_PREFIX)
+
+
+def pattern_label(trigger):
+    """模式在候选提示中显示的文本"""
+    return trigger[len(PATTERN_PREFIX):]
+
+
+# ========== 语法分析 ==========
+
+class _Parser:
+    """把受限的正则表达式解析为语法树
+
+    支持字面字符、转义、. 、\\d \\w \\s、字符类 [a-z0-9] 和 [^...]、分组 (...) 和
+    (?:...)、| 以及 ? * + {m} {m,n} 量词。不支持锚点、反向引用、环视和非贪婪量词。
+    语法树节点: ('set', 字符集合)、('cat', [节点])、('alt', [节点])、('rep', 节点, 最少, 最多或None)
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.pos = 0
+
+    def error(self, message):
+        return PatternError(f"模式 {self.source!r} 第 {self.pos + 1} 个字符: {message}")
+
+    def peek(self):
+        return self.source[self.pos] if self.pos < len(self.source) else None
+
+    def take(self):
+        char = self.peek()
+        if char is None:
+            raise self.error("模式不完整")
+        self.pos += 1
+        return char
+
+    def parse(self):
+        node = self.parse_alt()
+        if self.peek() is not None:
+            raise self.error(f"多余的 {self.peek()!r}")
+        return node
+
+    def parse_alt(self):
+        branches = [self.parse_cat()]
+        while self.peek() == '|':
+            self.pos += 1
+            branches.append(self.parse_cat())
+        return branches[0] if len(branches) == 1 else ('alt', branches)
+
+    def parse_cat(self):
+        items = []
+        while self.peek() not in (None, '|', ')'):
+            items.append(self.parse_repeat())
+        return ('cat', items)
+
+    def parse_repeat(self):
+        node = self.parse_atom()
+        char = self.peek()
+        if char == '?':
+            low, high = 0, 1
+        elif char == '*':
+            low, high = 0, None
+        elif char == '+':
+            low, high = 1, None
+        elif char == '{':
+            return self.parse_braces(node)
+        else:
+            return node
+        self.pos += 1
+        if self.peek() in ('?', '+'):
+            raise self.error("不支持非贪婪或占有量词")
+        return ('rep', node, low, high)
+
+    def parse_braces(self, node):
+        end = self.source.find('}', self.pos)
+        match = re.fullmatch(r'\{(\d+)(?:,(\d+))?\}', self.source[self.pos:end + 1]) if end >= 0 else None
+        if match is None:
+            raise self.error("量词应为 {m} 或 {m,n}")
+        low = int(match.group(1))
+        high = int(match.group(2)) if match.group(2) is not None else low
+        if low > high or high > MAX_REPEAT:
+            raise self.error(f"重复次数应满足 m <= n <= {MAX_REPEAT}")
+        self.pos = end + 1
+        return ('rep', node, low, high)
+
+    def parse_atom(self):
+        char = self.take()
+        if char == '(':
+            if self.source.startswith('?:', self.pos):
+                self.pos += 2
+            elif self.peek() == '?':
+                raise self.error("只支持 (...) 和 (?:...) 分组")
+            node = self.parse_alt()
+            if self.take() != ')':
+                raise self.error("缺少 )")
+            return node
+        if char == '[':
+            return ('set', self.parse_class())
+        if char == '.':
+            return ('set', ALPHABET)
+        if char == '\\':
+            return ('set', self.parse_escape())
+        if char in '^$':
+            raise self.error("不支持锚点，模式总是匹配整段输入")
+        if char in ')*+?{|':
+            raise self.error(f"意外的 {char!r}")
+        return ('set', frozenset(char.lower()))
+
+    def parse_escape(self):
+        char = self.take()
+        if char in SHORTHANDS:
+            return SHORTHANDS[char]
+        if char.isalnum():
+            raise self.error(f"不支持的转义 \\{char}")
+        return frozenset(char)
+
+    def parse_class(self):
+        negate = self.peek() == '^'
+        if negate:
+            self.pos += 1
+        chars = set()
+        first = True
+        while True:
+            char = self.take()
+            if char == ']' and not first:
+                break
+            first = False
+            if char == '\\':
+                chars |= self.parse_escape()
+                continue
+            if self.peek() == '-' and self.source[self.pos + 1:self.pos + 2] not in ('', ']'):
+                self.pos += 1
+                end = self.take()
+                if ord(end) < ord(char):
+                    raise self.error(f"字符范围 {char}-{end} 无效")
+                chars.update(chr(code).lower() for code in range(ord(char), ord(end) + 1))
+            else:
+                chars.add(char.lower())
+        return ALPHABET - chars if negate else frozenset(chars)
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_pattern(trigger):
+    """检查模式语法，返回 (语法树, 编译后的 Python 正则表达式)
+
+    结果按模式缓存，配置变更重新编译快照时未变的模式不再重复解析。
+    """
+    source = pattern_label(trigger)
+    if not source:
+        raise PatternError("模式不能为空")
+    tree = _Parser(source).parse()
+    try:
+        regex = re.compile(source, re.IGNORECASE)
+    except re.error as e:
+        raise PatternError(f"模式 {source!r} 无效: {e}")
+    return tree, regex
+
+
+def has_placeholders(template):
+    """模板中是否包含 {n} 或 $n 占位符"""
+    return re.search(r'\{\d+\}|\$\d+', template) is not None
+
+
+def expand_template(template, match):
+    """把模板中的 {n} 和 $n 替换为第 n 个捕获组，0 为整段输入"""
+    def replace(placeholder):
+        index = int(placeholder.group(1) or placeholder.group(2))
+        try:
+            return match.group(index) or ""
+        except IndexError:
+            return placeholder.group(0)
+    return re.sub(r'\{(\d+)\}|\$(\d+)', replace, template)
+
+
+# ========== 自动机 ==========
+
+class _Nfa:
+    """所有模式共用的非确定有限自动机"""
+
+    def __init__(self):
+        # 状态 -> [(字符集合, 目标状态)]
+        self.edges = []
+        # 状态 -> [空转移目标状态]
+        self.epsilon = []
+        # 状态 -> 所属模式序号
+        self.owner = []
+        # 接受状态 -> 模式序号
+        self.accepts = {}
+
+    def new_state(self, owner):
+        self.edges.append([])
+        self.epsilon.append([])
+        self.owner.append(owner)
+        return len(self.edges) - 1
+
+    def build(self, node, owner):
+        """按语法树构造片段，返回 (起始状态, 结束状态)"""
+        kind = node[0]
+        if kind == 'set':
+            start, end = self.new_state(owner), self.new_state(owner)
+            self.edges[start].append((node[1], end))
+            return start, end
+        if kind == 'cat':
+            start = end = self.new_state(owner)
+            for item in node[1]:
+                item_start, item_end = self.build(item, owner)
+                self.epsilon[end].append(item_start)
+                end = item_end
+            return start, end
+        if kind == 'alt':
+            start, end = self.new_state(owner), self.new_state(owner)
+            for branch in node[1]:
+                branch_start, branch_end = self.build(branch, owner)
+                self.epsilon[start].append(branch_start)
+                self.epsilon[branch_end].append(end)
+            return start, end
+        # 重复: 先串联 low 个必选副本，再接 high - low 个可选副本或一个循环
+        _, item, low, high = node
+        start = end = self.new_state(owner)
+        for _ in range(low):
+            item_start, item_end = self.build(item, owner)
+            self.epsilon[end].append(item_start)
+            end = item_end
+        if high is None:
+            item_start, item_end = self.build(item, owner)
+            self.epsilon[end].append(item_start)
+            self.epsilon[item_end].append(end)
+        else:
+            exit_state = self.new_state(owner)
+            for _ in range(high - low):
+                self.epsilon[end].append(exit_state)
+                item_start, item_end = self.build(item, owner)
+                self.epsilon[end].append(item_start)
+                end = item_end
+            self.epsilon[end].append(exit_state)
+            end = exit_state
+        return start, end
+
+    def closure(self, states):
+        """空转移闭包"""
+        result = set(states)
+        stack = list(states)
+        while stack:
+            for target in self.epsilon[stack.pop()]:
+                if target not in result:
+                    result.add(target)
+                    stack.append(target)
+        return frozenset(result)
+
+
+def compile_patterns(trie_root, patterns, preview_size=3, max_states=2000):
+    """把模式与普通触发序列的前缀树一起编译为 DFA，返回新的根节点
+
+    patterns 为 模式触发序列 -> 动作，按优先级排列。DFA 状态为
+    (前缀树节点, 模式 NFA 状态集合)；模式状态为空时直接复用前缀树节点，
+    只有同时跟踪模式的状态才新建节点。新建节点超过 max_states 时抛出 PatternError。
+    同一输入既完整匹配普通触发序列又匹配模式时，普通触发序列优先。
+    """
+    nfa = _Nfa()
+    triggers = list(patterns)
+    starts = []
+    for index, trigger in enumerate(triggers):
+        tree, _ = parse_pattern(trigger)
+        start, end = nfa.build(tree, index)
+        nfa.accepts[end] = index
+        starts.append(start)
+    labels = [(pattern_label(trigger), describe_action(patterns[trigger])) for trigger in triggers]
+
+    nodes = {}
+    pending = []
+
+    def get_node(trie_node, states):
+        """获取 DFA 状态对应的节点，新状态加入待展开列表"""
+        if not states:
+            return trie_node
+        key = (trie_node, states)
+        node = nodes.get(key)
+        if node is None:
+            if len(nodes) >= max_states:
+                raise PatternError(
+                    f"模式触发序列编译后超过 {max_states} 个状态，请减少模式数量或缩小 * + {{m,n}} 的范围"
+                    f"(配置项 pattern_max_states)"
+                )
+            node = nodes[key] = MatcherNode()
+            pending.append((node, trie_node, states))
+        return node
+
+    root = get_node(trie_root, nfa.closure(starts))
+    while pending:
+        node, trie_node, states = pending.pop()
+        # 当前状态下每个字符的模式后继
+        moves = {}
+        for state in states:
+            for chars, target in nfa.edges[state]:
+                for char in chars:
+                    moves.setdefault(char, set()).add(target)
+        trie_children = trie_node.children if trie_node is not None else {}
+        for char in moves.keys() | trie_children.keys():
+            targets = moves.get(char)
+            child = get_node(trie_children.get(char), nfa.closure(targets) if targets else frozenset())
+            if child is not None:
+                node.children[char] = child
+
+        accepted = sorted(nfa.accepts[state] for state in states if state in nfa.accepts)
+        if trie_node is not None and trie_node.action is not None:
+            node.trigger, node.action = trie_node.trigger, trie_node.action
+        elif accepted:
+            node.trigger = triggers[accepted[0]]
+            node.action = patterns[node.trigger]
+
+        # 候选: 前缀树子树中的候选加上仍可能匹配的模式
+        alive = sorted({nfa.owner[state] for state in states})
+        candidates = [labels[index] for index in alive]
+        count = len(alive)
+        if trie_node is not None:
+            candidates.extend(trie_node.candidates)
+            count += trie_node.count
+        node.count = count
+        set_candidates(node, heapq.nsmallest(
+            preview_size, candidates, key=lambda candidate: (len(candidate[0]), candidate[0])
+        ), count)
+    return root
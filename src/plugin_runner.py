@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+插件执行模块
+在常驻的进程池中调用用户提供的 Python 函数，带超时和结果大小限制，
+执行缓慢或卡死的插件不会阻塞键盘监听和动作执行器
+"""
+
+import importlib
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+
+# 添加src目录到Python路径
+sys.path.append(os.path.join(os.path.dirname(__file__)))
+
+from deadline_timer import DeadlineTimer
+
+# 插件结果的输出方式: 输入到当前程序、写入剪贴板、忽略
+PLUGIN_OUTPUTS = ("type", "clipboard", "none")
+# 插件输入: 无、当前剪贴板文本
+PLUGIN_INPUTS = ("none", "clipboard")
+
+
+def parse_plugin_mapping(entry, default_timeout=2.0):
+    """把配置中的插件映射转换为 (函数, 输入, 输出, 超时)，格式错误时返回 None
+
+    配置可以是 "模块:函数" 字符串，也可以是包含 function、input、output、
+    timeout 的字典。
+    """
+    if isinstance(entry, str):
+        entry = {"function": entry}
+    if not isinstance(entry, dict):
+        return None
+    function = entry.get("function")
+    if not isinstance(function, str) or ':' not in function:
+        return None
+    source = entry.get("input", "none")
+    output = entry.get("output", "type")
+    if source not in PLUGIN_INPUTS or output not in PLUGIN_OUTPUTS:
+        return None
+    try:
+        timeout = float(entry.get("timeout", default_timeout))
+    except (TypeError, ValueError):
+        return None
+    return (function, source, output, timeout)
+
+
+# ========== 工作进程 ==========
+
+def _worker_init(plugin_dir):
+    """工作进程初始化，使插件目录中的模块可以导入"""
+    sys.path.insert(0, os.path.abspath(plugin_dir))
+
+
+def _warm_up():
+    """空任务，用于提前启动工作进程"""
+    return os.getpid()
+
+
+def _call_plugin(function, context, max_result_chars):
+    """在工作进程中调用插件函数"""
+    module_name, _, func_name = function.partition(':')
+    # 模块导入一次后缓存在 sys.modules 中，之后的调用不再重复导入
+    func = getattr(importlib.import_module(module_name), func_name)
+    result = func(context)
+    if result is None:
+        return None
+    if not isinstance(result, str):
+        raise TypeError(f"插件 {function} 必须返回字符串或 None，实际返回 {type(result).__name__}")
+    if len(result) > max_result_chars:
+        raise ValueError(f"插件 {function} 返回 {len(result)} 个字符，超过上限 {max_result_chars}")
+    return result
+
+
+# ========== 插件执行器 ==========
+
+class PluginRunner:
+    """插件执行器
+
+    工作进程在创建时即预先启动并一直保留。每次调用返回一个 Future，
+    超时后 Future 以 TimeoutError 结束，同时结束整个进程池并重新创建，
+    卡死的插件进程不会继续占用工作进程；同一进程池中尚未超时的调用
+    可能已经执行了一部分，插件可能有副作用，不重新执行，以 RuntimeError 结束。
+    """
+
+    def __init__(self, plugin_dir="plugins", workers=1, max_result_chars=10000):
+        """初始化插件执行器并预热工作进程"""
+        self.plugin_dir = plugin_dir
+        self.workers = workers
+        self.max_result_chars = max_result_chars
+        self.lock = threading.Lock()
+        self.pool = None
+        # 进行中的调用: 结果 Future -> (截止时间, 所属进程池)
+        self.calls = {}
+        self.timeout_timer = DeadlineTimer(self._expire, "plugin-timeout")
+        self._create_pool()
+
+    def _create_pool(self):
+        """创建进程池并提前启动全部工作进程"""
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_worker_init,
+            initargs=(self.plugin_dir,)
+        )
+        for _ in range(self.workers):
+            self.pool.submit(_warm_up)
+
+    def submit(self, function, context, timeout):
+        """提交一次插件调用，返回结果 Future"""
+        result = Future()
+        with self.lock:
+            pool = self.pool
+            if pool is None:
+                result.set_exception(RuntimeError("插件执行器已关闭"))
+                return result
+            self.calls[result] = (time.monotonic() + timeout, pool)
+        self._schedule_timeout()
+        try:
+            future = pool.submit(_call_plugin, function, context, self.max_result_chars)
+        except RuntimeError:
+            # 进程池刚因其他调用超时被回收，调用已由 _expire() 结束
+            return result
+        future.add_done_callback(lambda done: self._complete(result, done))
+        return result
+
+    def _complete(self, result, done):
+        """工作进程返回后设置结果，已超时或已被中止的调用忽略返回值"""
+        with self.lock:
+            if self.calls.pop(result, None) is None:
+                return
+        if result.done():
+            return
+        exception = done.exception()
+        if exception is not None:
+            result.set_exception(exception)
+        else:
+            result.set_result(done.result())
+
+    def _schedule_timeout(self):
+        """按最早的截止时间调度超时检查"""
+        with self.lock:
+            if not self.calls:
+                self.timeout_timer.cancel()
+                return
+            earliest = min(call[0] for call in self.calls.values())
+        self.timeout_timer.schedule(max(earliest - time.monotonic(), 0))
+
+    def _expire(self):
+        """结束已超时的调用，并回收执行它们的进程池"""
+        now = time.monotonic()
+        expired = []
+        stale_pools = set()
+        aborted = []
+        with self.lock:
+            for result, (deadline, pool) in list(self.calls.items()):
+                if deadline <= now:
+                    expired.append(result)
+                    stale_pools.add(pool)
+                    del self.calls[result]
+            # 被一起结束的其他调用
+            for result, (deadline, pool) in list(self.calls.items()):
+                if pool in stale_pools:
+                    aborted.append(result)
+                    del self.calls[result]
+            if self.pool in stale_pools:
+                self._create_pool()
+        for result in expired:
+            if not result.done():
+                result.set_exception(TimeoutError("插件执行超时"))
+        for result in aborted:
+            if not result.done():
+                result.set_exception(RuntimeError("同一进程池中的其他插件调用超时，进程池已重启，本次调用被中止"))
+        for pool in stale_pools:
+            self._terminate_pool(pool)
+        if expired:
+            print(f"{len(expired)} 个插件调用执行超时，已重启插件进程池，中止了 {len(aborted)} 个进行中的调用")
+        self._schedule_timeout()
+
+    def _terminate_pool(self, pool):
+        """强制结束进程池中的工作进程"""
+        # ProcessPoolExecutor 没有公开的强制结束接口，shutdown 会等待卡死的任务
+        processes = list((getattr(pool, '_processes', None) or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            try:
+                process.terminate()
+            except Exception as e:
+                print(f"结束插件进程失败: {e}")
+
+    def shutdown(self):
+        """关闭插件执行器"""
+        self.timeout_timer.stop()
+        with self.lock:
+            pool = self.pool
+            self.pool = None
+            pending = list(self.calls)
+            self.calls.clear()
+        for result in pending:
+            if not result.done():
+                result.set_exception(RuntimeError("插件执行器已关闭"))
+        if pool is not None:
+            self._terminate_pool(pool)
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+单实例模块
+同一用户只运行一个实例。是否已有实例只由锁文件上的文件锁判断(Linux/macOS 为
+fcntl.flock，Windows 为 msvcrt.locking)，进程退出时操作系统自动释放锁，不会有
+检查和绑定之间的竞争。第一个实例另外监听一个本地套接字(Linux/macOS 为 Unix 域
+套接字，Windows 为只绑定本机地址的 TCP 端口)，只用于接收命令；之后启动的实例
+连接上去发送命令后立即退出，不会再创建第二套键盘钩子。
+"""
+
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+# Windows 上使用的本机端口
+DEFAULT_PORT = 47613
+
+
+def _socket_path():
+    """Unix 域套接字路径，按用户区分"""
+    directory = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(directory, f"shortcutseasier-{os.getuid()}.sock")
+
+
+def _lock_path():
+    """锁文件路径，按用户区分(Windows 的临时目录本身按用户区分)"""
+    if sys.platform == "win32":
+        return os.path.join(tempfile.gettempdir(), "shortcutseasier.lock")
+    directory = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(directory, f"shortcutseasier-{os.getuid()}.lock")
+
+
+def _lock(lock_file):
+    """以非阻塞方式锁定锁文件，已被其他进程锁定时抛出 OSError"""
+    if sys.platform == "win32":
+        lock_file.seek(0)
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+    else:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+
+def _use_unix_socket():
+    return hasattr(socket, "AF_UNIX") and sys.platform != "win32"
+
+
+def _connect(timeout):
+    """连接到正在运行的实例，没有实例时抛出 OSError"""
+    if _use_unix_socket():
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        address = _socket_path()
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        address = ("127.0.0.1", DEFAULT_PORT)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(address)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def send_command(command, timeout=2.0):
+    """向正在运行的实例发送命令，返回回复文本；没有正在运行的实例时返回 None
+
+    正在运行的实例可能刚拿到锁、还没有开始监听，连接失败时在 timeout 内重试。
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            sock = _connect(timeout)
+            break
+        except OSError:
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(0.05)
+    try:
+        with sock:
+            sock.sendall(command.encode('utf-8') + b"\n")
+            reply = b""
+            while not reply.endswith(b"\n"):
+                chunk = sock.recv(4096)
+                if not chunk:
+                    break
+                reply += chunk
+            return reply.decode('utf-8').strip()
+    except OSError as e:
+        print(f"向正在运行的实例发送命令失败: {e}")
+        return ""
+
+
+class InstanceServer:
+    """单实例锁和命令服务器
+
+    acquire() 成功即表示本进程是唯一实例，之后在后台线程中接收其他实例发来的命令，
+    按 handlers 中注册的函数处理。处理函数在服务线程中执行，需要操作Tk的处理函数
+    必须自己把操作交给UI线程。
+    """
+
+    def __init__(self):
+        """初始化单实例服务器"""
+        self.handlers = {}
+        self.lock_file = None
+        self.sock = None
+        self.thread = None
+        self.path = None
+
+    def acquire(self):
+        """尝试成为唯一实例，已有实例运行时返回 False"""
+        lock_file = open(_lock_path(), "a+")
+        try:
+            _lock(lock_file)
+        except OSError:
+            lock_file.close()
+            return False
+        self.lock_file = lock_file
+        try:
+            self._listen()
+        except OSError as e:
+            # 仍然是唯一实例，只是之后启动的实例无法发来命令
+            print(f"监听实例命令失败: {e}")
+        return True
+
+    def _listen(self):
+        """持有锁之后开始监听命令"""
+        if _use_unix_socket():
+            path = _socket_path()
+            # 持有锁时已有的套接字文件只能是上次异常退出留下的
+            if os.path.exists(path):
+                os.unlink(path)
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.bind(path)
+                os.chmod(path, 0o600)
+            except OSError:
+                sock.close()
+                raise
+            self.path = path
+        else:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            if hasattr(socket, "SO_EXCLUSIVEADDRUSE"):
+                # 防止其他进程在同一端口上抢先监听
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_EXCLUSIVEADDRUSE, 1)
+            try:
+                sock.bind(("127.0.0.1", DEFAULT_PORT))
+            except OSError:
+                sock.close()
+                raise
+        sock.listen(4)
+        self.sock = sock
+        self.thread = threading.Thread(target=self._serve, name="single-instance", daemon=True)
+        self.thread.start()
+
+    def set_handler(self, command, handler):
+        """注册命令处理函数，返回值(如果有)作为回复发回"""
+        self.handlers[command] = handler
+
+    def _serve(self):
+        """接收并处理其他实例发来的命令"""
+        sock = self.sock
+        while True:
+            try:
+                conn, _ = sock.accept()
+            except OSError:
+                # 套接字已关闭
+                return
+            with conn:
+                try:
+                    conn.settimeout(2.0)
+                    command = conn.makefile('r', encoding='utf-8').readline().strip()
+                    conn.sendall((self._handle(command) + "\n").encode('utf-8'))
+                except OSError as e:
+                    print(f"处理实例命令失败: {e}")
+
+    def _handle(self, command):
+        """执行一个命令并返回回复"""
+        if command == "ping":
+            return "ok"
+        handler = self.handlers.get(command)
+        if handler is None:
+            return f"error 未知命令: {command}"
+        try:
+            result = handler()
+        except Exception as e:
+            print(f"执行实例命令 {command} 失败: {e}")
+            return f"error {e}"
+        return "ok" if result is None else f"ok {result}"
+
+    def close(self):
+        """关闭服务器、删除套接字文件并释放锁"""
+        if self.sock is not None:
+            try:
+                # 唤醒阻塞在 accept() 中的线程
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.sock.close()
+            self.sock = None
+        if self.path is not None:
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+            self.path = None
+        if self.lock_file is not None:
+            # 锁文件本身保留，删除它会让另一个进程锁住一个新文件而绕过本进程的锁
+            self.lock_file.close()
+            self.lock_file = None
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+长时间运行压力测试模块
+用假输入后端向 KeyboardManager 回放大量合成按键和监听切换，
+定期采样 tracemalloc、RSS 和线程数，增长超出预算时判定失败
+
+用法: python src/soak_harness.py --keystrokes 2000000
+      python src/soak_harness.py --alloc-check  # 检查未匹配按键没有净内存分配
+"""
+
+import argparse
+import enum
+import gc
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+# 添加src目录到Python路径
+sys.path.append(os.path.join(os.path.dirname(__file__)))
+
+from config_manager import ConfigManager
+from keyboard_manager import KeyboardManager
+
+
+# ========== 假输入后端 ==========
+
+class FakeKeyCode:
+    """与 pynput.keyboard.KeyCode 接口一致的按键"""
+
+    def __init__(self, vk=None, char=None):
+        self.vk = vk
+        self.char = char
+
+    @classmethod
+    def from_char(cls, char):
+        return cls(char=char)
+
+    @classmethod
+    def from_vk(cls, vk):
+        return cls(vk=vk)
+
+    def __eq__(self, other):
+        if not isinstance(other, FakeKeyCode):
+            return False
+        if self.char is not None and other.char is not None:
+            return self.char == other.char
+        return self.vk == other.vk
+
+    def __hash__(self):
+        return hash(self.char if self.char is not None else self.vk)
+
+    def __repr__(self):
+        return repr(self.char) if self.char is not None else f"<{self.vk}>"
+
+
+_KEY_NAMES = [
+    'alt', 'alt_l', 'alt_r', 'alt_gr', 'backspace', 'ctrl', 'ctrl_l', 'ctrl_r',
+    'delete', 'down', 'end', 'enter', 'esc', 'home', 'left', 'page_down',
+    'page_up', 'right', 'shift', 'shift_l', 'shift_r', 'space', 'tab', 'up',
+] + [f'f{i}' for i in range(1, 21)]
+
+FakeKey = enum.Enum('Key', {name: FakeKeyCode(vk=1000 + i) for i, name in enumerate(_KEY_NAMES)})
+
+
+class FakeListener:
+    """不创建线程的假监听器，由压力测试直接调用回调"""
+
+    # 当前运行中的监听器，假控制器把注入的按键回送给它
+    active = None
+
+    def __init__(self, on_press=None, on_release=None, **kwargs):
+        self.on_press = on_press
+        self.on_release = on_release
+
+    def start(self):
+        FakeListener.active = self
+
+    def stop(self):
+        if FakeListener.active is self:
+            FakeListener.active = None
+
+
+class FakeKeyboardController:
+    """假键盘控制器，把注入的按键回送给监听器，模拟真实后端的回显"""
+
+    def press(self, key):
+        listener = FakeListener.active
+        if listener:
+            listener.on_press(FakeKeyCode.from_char(key) if isinstance(key, str) else key)
+
+    def release(self, key):
+        listener = FakeListener.active
+        if listener:
+            listener.on_release(FakeKeyCode.from_char(key) if isinstance(key, str) else key)
+
+
+class FakeMouseButton(enum.Enum):
+    left = 1
+    right = 2
+    middle = 3
+
+
+class FakeMouseController:
+    """假鼠标控制器"""
+
+    def __init__(self):
+        self.position = (0, 0)
+
+    def click(self, button, count=1):
+        pass
+
+
+class _Namespace:
+    """用于组装假后端的简单命名空间"""
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class FakeBackend:
+    """假输入后端，接口与 PynputBackend 一致"""
+
+    name = "fake"
+    echoes_injected = True
+
+    def __init__(self):
+        self.keyboard = _Namespace(
+            Key=FakeKey,
+            KeyCode=FakeKeyCode,
+            Listener=FakeListener,
+            Controller=FakeKeyboardController,
+        )
+        self.mouse = _Namespace(
+            Button=FakeMouseButton,
+            Controller=FakeMouseController,
+        )
+
+    def close(self):
+        pass
+
+
+# ========== 资源采样 ==========
+
+def get_rss_kb():
+    """获取当前进程的常驻内存(KB)"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError, AttributeError):
+        # 非 Linux 平台退化为峰值常驻内存
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def take_sample(keystrokes):
+    """采样一次资源使用情况"""
+    gc.collect()
+    heap_kb = tracemalloc.get_traced_memory()[0] // 1024
+    return {
+        "keystrokes": keystrokes,
+        "heap_kb": heap_kb,
+        "rss_kb": get_rss_kb(),
+        "threads": threading.active_count(),
+    }
+
+
+# ========== 压力测试 ==========
+
+class SoakHarness:
+    """长时间运行压力测试"""
+
+    def __init__(self, keystrokes=1000000, toggle_every=10000, trigger_every=50,
+                 sample_every=50000, warmup=20000, heap_budget_kb=512,
+                 rss_budget_kb=16384, thread_budget=2, seed=1):
+        """初始化压力测试"""
+        self.keystrokes = keystrokes
+        self.toggle_every = toggle_every
+        self.trigger_every = trigger_every
+        self.sample_every = sample_every
+        self.warmup = warmup
+        self.heap_budget_kb = heap_budget_kb
+        self.rss_budget_kb = rss_budget_kb
+        self.thread_budget = thread_budget
+        self.random = random.Random(seed)
+        self.samples = []
+
+        self.config_dir = tempfile.mkdtemp(prefix="soak-")
+        # 只使用临时目录中的用户配置层，不读取本机的系统和团队配置
+        self.config_manager = ConfigManager(os.path.join(self.config_dir, "config.json"), [])
+        self.config_manager.add_mouse_mapping("clk", "10,10")
+        self.triggers = sorted(self.config_manager.get_snapshot().triggers)
+        self.backend = FakeBackend()
+        self.keyboard_manager = KeyboardManager(self.config_manager, self.backend)
+        # 假后端没有前台窗口和真实延迟，关闭注入间隔和窗口类查询
+        pacer = self.keyboard_manager.injection_pacer
+        pacer.default_delay = 0
+        pacer.window_class_ttl = float('inf')
+        pacer._window_class_time = time.time()
+        # 合成按键的速率远高于真实输入，关闭每秒事件预算
+        self.keyboard_manager.event_budget = 0
+        self.keyboard_manager.start_listening()
+
+    def type_key(self, key):
+        """模拟一次按下和释放"""
+        listener = FakeListener.active
+        listener.on_press(key)
+        listener.on_release(key)
+
+    def type_trigger(self):
+        """模拟停顿后输入一个触发序列"""
+        self.keyboard_manager.reset_key_state()
+        for char in self.random.choice(self.triggers):
+            self.type_key(FakeKeyCode.from_char(char))
+
+    def drain(self):
+        """等待动作执行器处理完已提交的动作"""
+        self.keyboard_manager.action_executor.submit(lambda: None).result()
+
+    def run(self):
+        """运行压力测试，返回是否通过"""
+        letters = [FakeKeyCode.from_char(c) for c in "abcdefghijklmnopqrstuvwxyz"]
+        specials = [FakeKey.space, FakeKey.enter, FakeKey.backspace]
+        tracemalloc.start()
+        baseline = None
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            for count in range(1, self.keystrokes + 1):
+                if count % self.trigger_every == 0:
+                    self.type_trigger()
+                elif count % 10 == 0:
+                    self.type_key(self.random.choice(specials))
+                else:
+                    self.type_key(self.random.choice(letters))
+
+                if count % self.toggle_every == 0:
+                    self.keyboard_manager.toggle_listening()
+                    self.keyboard_manager.toggle_listening()
+
+                if count == self.warmup or count % self.sample_every == 0:
+                    self.drain()
+                    sample = take_sample(count)
+                    self.samples.append(sample)
+                    if count == self.warmup:
+                        baseline = sample
+        self.drain()
+        final = take_sample(self.keystrokes)
+        self.samples.append(final)
+        tracemalloc.stop()
+        self.keyboard_manager.shutdown()
+        shutil.rmtree(self.config_dir, ignore_errors=True)
+        return self.report(baseline or self.samples[0], final)
+
+    def check_allocations(self, keystrokes=20000, warmup=2000):
+        """检查未匹配任何触发序列的按键没有净内存分配，返回是否通过"""
+        # 只使用不出现在任何触发序列中的字母，每次按键都走未匹配的快速路径
+        used = set("".join(self.triggers))
+        keys = [FakeKeyCode.from_char(c) for c in "abcdefghijklmnopqrstuvwxyz" if c not in used]
+        if not keys:
+            print("没有可用于检查的字母")
+            return False
+        src_dir = os.path.dirname(os.path.abspath(__file__))
+        filters = [tracemalloc.Filter(True, os.path.join(src_dir, "*"))]
+
+        tracemalloc.start()
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            for count in range(warmup):
+                self.type_key(keys[count % len(keys)])
+            gc.collect()
+            before = tracemalloc.take_snapshot().filter_traces(filters)
+            for count in range(keystrokes):
+                self.type_key(keys[count % len(keys)])
+            gc.collect()
+            after = tracemalloc.take_snapshot().filter_traces(filters)
+        tracemalloc.stop()
+        self.keyboard_manager.shutdown()
+        shutil.rmtree(self.config_dir, ignore_errors=True)
+
+        stats = [stat for stat in after.compare_to(before, 'lineno') if stat.count_diff or stat.size_diff]
+        count_diff = sum(stat.count_diff for stat in stats)
+        size_diff = sum(stat.size_diff for stat in stats)
+        for stat in stats[:10]:
+            print(stat)
+        if count_diff > 0 or size_diff > 0:
+            print(f"失败: {keystrokes} 次未匹配按键后净增加 {count_diff} 个对象, {size_diff} 字节")
+            return False
+        print(f"通过: {keystrokes} 次未匹配按键没有净内存分配")
+        return True
+
+    def report(self, baseline, final):
+        """输出采样结果并检查预算"""
+        print(f"{'按键数':>10} {'堆(KB)':>10} {'RSS(KB)':>10} {'线程数':>6}")
+        for sample in self.samples:
+            print(f"{sample['keystrokes']:>10} {sample['heap_kb']:>10} {sample['rss_kb']:>10} {sample['threads']:>6}")
+
+        failures = []
+        heap_growth = final["heap_kb"] - baseline["heap_kb"]
+        rss_growth = final["rss_kb"] - baseline["rss_kb"]
+        thread_growth = final["threads"] - baseline["threads"]
+        if heap_growth > self.heap_budget_kb:
+            failures.append(f"堆内存增长 {heap_growth}KB 超出预算 {self.heap_budget_kb}KB")
+        if rss_growth > self.rss_budget_kb:
+            failures.append(f"RSS 增长 {rss_growth}KB 超出预算 {self.rss_budget_kb}KB")
+        if thread_growth > self.thread_budget:
+            failures.append(f"线程数增长 {thread_growth} 超出预算 {self.thread_budget}")
+
+        for failure in failures:
+            print(f"失败: {failure}")
+        if not failures:
+            print(f"通过: 堆 {heap_growth:+}KB, RSS {rss_growth:+}KB, 线程 {thread_growth:+}")
+        return not failures
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="KeyboardManager 长时间运行压力测试")
+    parser.add_argument('--keystrokes', type=int, default=1000000, help="合成按键总数")
+    parser.add_argument('--toggle-every', type=int, default=10000, help="每隔多少次按键切换一次监听状态")
+    parser.add_argument('--trigger-every', type=int, default=50, help="每隔多少次按键输入一个触发序列")
+    parser.add_argument('--sample-every', type=int, default=50000, help="每隔多少次按键采样一次")
+    parser.add_argument('--warmup', type=int, default=20000, help="预热按键数，之后的采样作为基线")
+    parser.add_argument('--heap-budget-kb', type=int, default=512, help="tracemalloc 堆内存增长预算")
+    parser.add_argument('--rss-budget-kb', type=int, default=16384, help="RSS 增长预算")
+    parser.add_argument('--thread-budget', type=int, default=2, help="线程数增长预算")
+    parser.add_argument('--seed', type=int, default=1, help="随机数种子")
+    parser.add_argument('--alloc-check', action='store_true', help="只检查未匹配按键的快速路径没有净内存分配")
+    args = parser.parse_args()
+
+    harness = SoakHarness(
+        keystrokes=args.keystrokes,
+        toggle_every=args.toggle_every,
+        trigger_every=args.trigger_every,
+        sample_every=args.sample_every,
+        warmup=args.warmup,
+        heap_budget_kb=args.heap_budget_kb,
+        rss_budget_kb=args.rss_budget_kb,
+        thread_budget=args.thread_budget,
+        seed=args.seed,
+    )
+    if args.alloc_check:
+        sys.exit(0 if harness.check_allocations() else 1)
+    sys.exit(0 if harness.run() else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+流水线跟踪模块
+用固定大小的环形缓冲区记录各处理阶段的耗时，并导出为 Chrome trace 格式
+"""
+
+import itertools
+import json
+import os
+import threading
+import time
+
+
+class TraceRecorder:
+    """流水线跟踪记录器
+
+    默认关闭，关闭时 now() 和 record() 只做一次属性判断。记录写入预先
+    分配的环形缓冲区，写满后覆盖最旧的记录，内存占用固定。
+    """
+
+    def __init__(self, capacity=8192, enabled=False):
+        """初始化跟踪记录器"""
+        self.enabled = enabled
+        self.capacity = capacity
+        # 每条记录: (阶段名, 开始纳秒, 结束纳秒, 线程ID, 附加参数)
+        self.events = [None] * capacity
+        # itertools.count 的 next() 在 CPython 中是原子操作，写入无需加锁
+        self._counter = itertools.count()
+        # perf_counter 与墙上时间的对应关系，导出时换算时间戳
+        self._origin_ns = time.perf_counter_ns()
+        self._origin_wall = time.time()
+
+    def now(self):
+        """获取当前时间戳(纳秒)，未启用时返回 0"""
+        if not self.enabled:
+            return 0
+        return time.perf_counter_ns()
+
+    def record(self, stage, start_ns, end_ns=None, args=None):
+        """记录一个阶段的耗时"""
+        if not self.enabled or not start_ns:
+            return
+        if end_ns is None:
+            end_ns = time.perf_counter_ns()
+        index = next(self._counter) % self.capacity
+        self.events[index] = (stage, start_ns, end_ns, threading.get_ident(), args)
+
+    def clear(self):
+        """清空全部记录"""
+        self.events = [None] * self.capacity
+
+    def get_events(self, seconds=None):
+        """获取最近 seconds 秒内结束的记录，按开始时间排序"""
+        events = [event for event in list(self.events) if event is not None]
+        if seconds is not None:
+            cutoff = time.perf_counter_ns() - int(seconds * 1e9)
+            events = [event for event in events if event[2] >= cutoff]
+        events.sort(key=lambda event: event[1])
+        return events
+
+    def to_chrome_trace(self, seconds=None):
+        """转换为 Chrome trace 事件格式 (可在 chrome://tracing 或 Perfetto 中打开)"""
+        pid = os.getpid()
+        origin_us = self._origin_wall * 1e6
+        trace_events = []
+        for stage, start_ns, end_ns, tid, args in self.get_events(seconds):
+            trace_events.append({
+                "name": stage,
+                "cat": "pipeline",
+                "ph": "X",
+                "ts": origin_us + (start_ns - self._origin_ns) / 1000.0,
+                "dur": (end_ns - start_ns) / 1000.0,
+                "pid": pid,
+                "tid": tid,
+                "args": args or {},
+            })
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    def dump(self, path=None, seconds=None):
+        """把最近 seconds 秒的记录写入 Chrome trace JSON 文件，返回文件路径"""
+        if path is None:
+            path = time.strftime("trace-%Y%m%d-%H%M%S.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_chrome_trace(seconds), f)
+        return path
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+系统托盘模块
+关闭主窗口后程序以托盘图标常驻，主窗口在需要时重新创建。
+需要可选依赖 pystray 和 Pillow，缺少时关闭主窗口即退出程序。
+"""
+
+import ctypes
+import gc
+import sys
+import threading
+
+try:
+    import pystray
+    from PIL import Image, ImageDraw
+except ImportError:
+    pystray = None
+
+
+def is_available():
+    """托盘图标所需的可选依赖是否已安装"""
+    return pystray is not None
+
+
+def trim_memory():
+    """回收垃圾并把空闲内存归还给操作系统，降低常驻内存"""
+    gc.collect()
+    try:
+        if sys.platform.startswith('linux'):
+            ctypes.CDLL("libc.so.6").malloc_trim(0)
+        elif sys.platform == 'win32':
+            # 把进程工作集中的空闲页换出
+            ctypes.windll.psapi.EmptyWorkingSet(ctypes.windll.kernel32.GetCurrentProcess())
+    except Exception as e:
+        print(f"释放空闲内存失败: {e}")
+
+
+def _create_image(size=64):
+    """绘制托盘图标，不依赖图片文件"""
+    image = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    draw.rounded_rectangle((4, 4, size - 4, size - 4), radius=size // 6, fill=(40, 120, 220, 255))
+    draw.text((size // 3, size // 4), "S", fill=(255, 255, 255, 255))
+    return image
+
+
+class TrayIcon:
+    """托盘图标
+
+    图标在后台线程中运行，菜单回调也在该线程中执行，回调中不能直接操作Tk。
+    """
+
+    def __init__(self, on_show, on_toggle, on_quit, is_active):
+        """初始化托盘图标，is_active 用于显示监听菜单项的勾选状态"""
+        self.icon = pystray.Icon(
+            "ShortcutsEasier",
+            _create_image(),
+            "ShortcutsEasier",
+            menu=pystray.Menu(
+                pystray.MenuItem("显示主窗口", lambda icon, item: on_show(), default=True),
+                pystray.MenuItem("键盘监听", lambda icon, item: on_toggle(),
+                                 checked=lambda item: is_active()),
+                pystray.MenuItem("退出", lambda icon, item: on_quit()),
+            )
+        )
+        self.thread = None
+
+    def start(self):
+        """在后台线程中显示托盘图标"""
+        self.thread = threading.Thread(target=self.icon.run, name="tray-icon", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """移除托盘图标"""
+        try:
+            self.icon.stop()
+        except Exception as e:
+            print(f"移除托盘图标失败: {e}")
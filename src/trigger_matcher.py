@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+触发序列匹配模块
+把所有触发序列编译为前缀树，每个节点预先计算可到达的候选触发序列
+"""
+
+import heapq
+
+
+class MatcherNode:
+    """匹配器节点
+
+    编译完成后只读：children 为 字符 -> 子节点，action 为到达该节点时
+    触发的动作，candidates 为从该节点可到达的最短几个触发序列，
+    preview 为预先格式化好的候选提示文本，count 为子树中的触发序列总数。
+    """
+
+    __slots__ = ('children', 'trigger', 'action', 'candidates', 'preview', 'count')
+
+    def __init__(self):
+        self.children = {}
+        self.trigger = None
+        self.action = None
+        self.candidates = ()
+        self.preview = ""
+        self.count = 0
+
+    def copy(self):
+        """浅复制节点，子节点与原节点共用"""
+        node = MatcherNode()
+        node.children = dict(self.children)
+        node.trigger = self.trigger
+        node.action = self.action
+        node.candidates = self.candidates
+        node.preview = self.preview
+        node.count = self.count
+        return node
+
+    def step(self, text):
+        """沿 text 中的字符前进，无法继续匹配时返回 None"""
+        node = self
+        for char in text:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+
+def describe_action(action):
+    """生成动作的简短描述"""
+    kind, value = action
+    if kind == 'mouse':
+        return f"点击 {value}"
+    if kind == 'plugin':
+        return f"插件 {value[0]}"
+    return value
+
+
+def compile_matcher(actions, preview_size=3):
+    """把 触发序列 -> 动作 编译为前缀树，返回根节点"""
+    root = MatcherNode()
+    for trigger, action in actions.items():
+        node = root
+        for char in trigger:
+            child = node.children.get(char)
+            if child is None:
+                child = node.children[char] = MatcherNode()
+            node = child
+        node.trigger = trigger
+        node.action = action
+
+    # 自底向上合并子节点的候选，每个节点只保留最短的 preview_size 个
+    order = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        stack.extend(node.children.values())
+    for node in reversed(order):
+        _refresh(node, preview_size)
+    return root
+
+
+def update_matcher(root, changes, preview_size=3):
+    """在已编译的前缀树上应用少量变更，返回新的根节点
+
+    changes 为 触发序列 -> 新动作(None 表示删除)。只复制变更路径上的节点并
+    重新计算它们的候选，其余子树与原前缀树共用；原前缀树保持不变，
+    旧快照仍然可以安全使用。
+    """
+    new_root = root.copy()
+    # 本次新建或复制的节点: id -> (深度, 节点, 父节点, 字符)
+    fresh = {id(new_root): (0, new_root, None, None)}
+    for trigger, action in changes.items():
+        node = new_root
+        for depth, char in enumerate(trigger, 1):
+            child = node.children.get(char)
+            if child is None:
+                if action is None:
+                    # 要删除的触发序列不存在
+                    break
+                child = MatcherNode()
+            elif id(child) not in fresh:
+                child = child.copy()
+            fresh.setdefault(id(child), (depth, child, node, char))
+            node.children[char] = child
+            node = child
+        else:
+            node.trigger = trigger if action is not None else None
+            node.action = action
+    # 自底向上重新计算，删除后不再包含触发序列的节点从父节点中移除
+    for _, node, parent, char in sorted(fresh.values(), key=lambda entry: -entry[0]):
+        _refresh(node, preview_size)
+        if parent is not None and node.count == 0:
+            del parent.children[char]
+    return new_root
+
+
+def _refresh(node, preview_size):
+    """根据子节点重新计算节点的触发序列总数和候选"""
+    node.count = (node.action is not None) + sum(child.count for child in node.children.values())
+    candidates = []
+    if node.action is not None:
+        candidates.append((node.trigger, describe_action(node.action)))
+    for child in node.children.values():
+        candidates.extend(child.candidates)
+    set_candidates(node, heapq.nsmallest(
+        preview_size, candidates, key=lambda candidate: (len(candidate[0]), candidate[0])
+    ), node.count)
+
+
+def set_candidates(node, candidates, count):
+    """设置节点的候选和提示文本，count 为可到达的触发序列总数"""
+    node.candidates = tuple(candidates)
+    preview = ", ".join(f"{trigger} ({description})" for trigger, description in node.candidates)
+    # 子树中还有未列出的候选时以省略号结尾
+    if count > len(node.candidates):
+        preview += "..."
+    node.preview = preview
+
+
+def _shadowed_triggers(root, limit):
+    """找出有更长延伸的触发序列，返回 [(触发序列, 延伸示例, 延伸总数)]"""
+    results = []
+    order = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        stack.extend(node.children.values())
+    # 自底向上统计每个子树中的触发序列，并保留少量示例
+    counts = {}
+    samples = {}
+    for node in reversed(order):
+        count = 0
+        sample = []
+        for child in node.children.values():
+            count += counts[id(child)]
+            if len(sample) < limit:
+                sample.extend(samples[id(child)][:limit - len(sample)])
+        if node.trigger is not None and count:
+            results.append((node.trigger, tuple(sample), count))
+        if node.trigger is not None:
+            count += 1
+            sample = [node.trigger] + sample[:limit - 1]
+        counts[id(node)] = count
+        samples[id(node)] = sample
+    return results
+
+
+def find_conflicts(root, mappings, mouse_mappings, limit=5, plugin_mappings=None):
+    """分析触发序列之间的冲突
+
+    返回 [(类型, 触发序列, 冲突的触发序列示例, 冲突总数)]，类型为：
+    prefix  - 该触发序列是其他触发序列的前缀，较长的触发序列永远无法到达
+    suffix  - 该触发序列是其他触发序列的后缀
+    duplicate - 同一触发序列同时存在于多种映射中，只有优先级最高的映射生效
+                (按键映射 > 插件映射 > 鼠标映射)
+    前缀和后缀都通过前缀树一次遍历得到，耗时与触发序列总长度成线性关系。
+    """
+    conflicts = []
+    for trigger, extensions, count in _shadowed_triggers(root, limit):
+        conflicts.append(('prefix', trigger, extensions, count))
+
+    # 把反转后的触发序列插入前缀树，后缀冲突即变为前缀冲突
+    reversed_root = MatcherNode()
+    plugin_mappings = plugin_mappings or {}
+    for trigger in set(mappings) | set(mouse_mappings) | set(plugin_mappings):
+        node = reversed_root
+        for char in reversed(trigger):
+            child = node.children.get(char)
+            if child is None:
+                child = node.children[char] = MatcherNode()
+            node = child
+        node.trigger = trigger
+    for trigger, extensions, count in _shadowed_triggers(reversed_root, limit):
+        conflicts.append(('suffix', trigger, extensions, count))
+
+    duplicates = (
+        (mappings.keys() & mouse_mappings.keys())
+        | (mappings.keys() & plugin_mappings.keys())
+        | (plugin_mappings.keys() & mouse_mappings.keys())
+    )
+    for trigger in duplicates:
+        conflicts.append(('duplicate', trigger, (trigger,), 1))
+    conflicts.sort(key=lambda conflict: (conflict[0], conflict[1]))
+    return conflicts
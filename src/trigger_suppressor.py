@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+触发键拦截模块
+暂扣可能构成触发序列的按键，匹配成功则直接丢弃，偏离则立即重放
+"""
+
+import threading
+import time
+
+
+class TriggerSuppressor:
+    """触发键拦截器
+
+    与按键缓冲区的匹配规则一致：只有在缓冲区超时清空后输入的按键才可能
+    组成触发序列。一旦有按键被放行，直到下一次超时前都不再暂扣。
+    暂扣的按键沿映射快照的匹配器前进，普通触发序列和模式触发序列都能拦截。
+    """
+
+    # feed() 的返回动作
+    PASS = 0      # 放行当前按键
+    HOLD = 1      # 暂扣当前按键
+    COMPLETE = 2  # 触发序列完成，丢弃暂扣的按键
+    REPLAY = 3    # 偏离触发序列，拦截当前按键并重放暂扣的按键和当前按键
+
+    def __init__(self, buffer_timeout=1.0, max_hold=16):
+        """初始化触发键拦截器"""
+        self.buffer_timeout = buffer_timeout
+        # 最多暂扣的按键数量
+        self.max_hold = max_hold
+        self.lock = threading.Lock()
+        # 匹配器的根节点，None 表示没有触发序列
+        self.root = None
+        self.node = None
+        # 暂扣的按键: [(字符, 原始按键标识), ...]
+        self.held = []
+        self.held_text = ""
+        # 已有按键放行，本轮不再暂扣
+        self.dead = False
+        self.last_key_time = 0
+
+    def rebuild(self, matcher):
+        """切换到新的匹配器(映射快照的 matcher)，丢弃本轮暂扣状态"""
+        with self.lock:
+            self.root = matcher
+            self.node = matcher
+            self.held = []
+            self.held_text = ""
+            self.dead = False
+
+    def feed(self, char, raw, now=None):
+        """处理一次按键按下
+
+        char 为小写字符，无法映射为字符的按键传入 None；raw 为重放时
+        使用的原始按键标识。返回 (动作, 数据)：COMPLETE 时数据为 (触发序列, 输入的文本)，
+        模式触发序列用输入的文本取出捕获组；REPLAY 时数据为需要按顺序重放的原始按键列表。
+        """
+        if now is None:
+            now = time.time()
+        with self.lock:
+            if now - self.last_key_time > self.buffer_timeout:
+                if self.held:
+                    # 超时定时器尚未重放暂扣的按键，与当前按键一起重放
+                    replay = self.held + [raw]
+                    self._restart()
+                    self.dead = True
+                    self.last_key_time = now
+                    return self.REPLAY, replay
+                # 超时后重新开始匹配
+                self.dead = False
+            self.last_key_time = now
+
+            if self.dead or self.node is None:
+                return self.PASS, None
+
+            node = self.node.children.get(char) if char else None
+            if node is not None and node.action is not None:
+                text = self.held_text + char
+                self._restart()
+                self.dead = True
+                return self.COMPLETE, (node.trigger, text)
+
+            if node is not None and len(self.held) < self.max_hold - 1:
+                self.held.append(raw)
+                self.held_text += char
+                self.node = node
+                return self.HOLD, None
+
+            # 偏离触发序列，或暂扣的按键已达上限
+            self.dead = True
+            if not self.held:
+                return self.PASS, None
+            replay = self.held + [raw]
+            self._restart()
+            return self.REPLAY, replay
+
+    def _restart(self):
+        """清空暂扣的按键，匹配器回到根节点，调用时已持有锁"""
+        self.held = []
+        self.held_text = ""
+        self.node = self.root
+
+    def flush(self):
+        """超时后取出全部暂扣的按键，返回需要重放的原始按键列表"""
+        with self.lock:
+            replay = self.held
+            self._restart()
+            self.dead = False
+            return replay
+
+    def get_held_text(self):
+        """获取当前暂扣的字符"""
+        return self.held_text
@@ -8,7 +8,9 @@ UI管理模块
 
 import tkinter as tk
 from tkinter import ttk, messagebox
+import queue
 import threading
+import time
 import sys
 import os
 
@@ -16,6 +18,10 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__)))
 
 from overlay_window import OverlayWindow
+from usage_log import read_usage
+import image_anchor
+import tray_icon
+from pattern_matcher import PatternError, has_placeholders, is_pattern, parse_pattern
 
 # 导入鼠标控制和剪贴板操作库
 from pynput import mouse
@@ -25,64 +31,158 @@ import pyperclip
 class UIManager:
     """UI管理器"""
     
-    def __init__(self, config_manager, keyboard_manager):
+    def __init__(self, config_manager, keyboard_manager, clipboard_service=None):
         """初始化UI管理器"""
         self.config_manager = config_manager
         self.keyboard_manager = keyboard_manager
+        self.clipboard_service = clipboard_service
+        # 隐藏的Tk根窗口在整个进程生命周期内保留，持有剪贴板所有权(X11上销毁唯一的
+        # 根窗口会丢失CLIPBOARD所有权)并运行事件循环；主窗口是它的顶层窗口，关闭时销毁
         self.root = None
+        self.main_window = None
+        self.mapping_tree = None
         self.mapping_window = None
         # 保存对状态标签和按钮的引用，以便更新
         self.status_label = None
         self.toggle_button = None
         self.status_var = None
+        # 输入设备统计，只有 evdev 后端提供
+        self.device_stats_var = None
+        # 映射表格各列当前的排序方向: (表格, 列) -> 是否降序
+        self.sort_orders = {}
+        # 托盘常驻: 关闭主窗口只销毁界面，托盘菜单请求重新打开时再创建
+        self.tray = None
+        # 其他线程通过 call_in_ui() 把需要操作Tk的函数交给UI线程执行，空闲时不定时轮询。
+        # 非Windows平台上用管道唤醒Tk的事件循环；Windows上的Tk不支持文件事件，生成虚拟事件唤醒
+        self.ui_calls = queue.Queue()
+        self.ui_wake_read = self.ui_wake_write = None
+        # 已生成、UI线程尚未处理的唤醒虚拟事件，避免每次提交都生成一个事件
+        self.ui_wake_pending = False
+        if sys.platform != 'win32':
+            self.ui_wake_read, self.ui_wake_write = os.pipe()
+            os.set_blocking(self.ui_wake_read, False)
+            os.set_blocking(self.ui_wake_write, False)
         
         # 初始化悬浮窗口
-        self.overlay_window = OverlayWindow()
+        self.overlay_window = OverlayWindow(self.keyboard_manager.tracer)
         self.overlay_window.start_window_thread()
         
-        # 设置键盘管理器的状态回调
-        self.keyboard_manager.set_status_callback(self.update_ui_status)
+        # 设置键盘管理器的状态回调，状态变化来自监听线程，交给UI线程更新界面
+        self.keyboard_manager.set_status_callback(lambda is_active: self.call_in_ui(self.update_ui_status, is_active))
         # 设置键盘管理器的悬浮窗口回调
         self.keyboard_manager.set_overlay_callback(self.update_overlay_text)
+        # 设置键盘管理器的候选提示回调
+        self.keyboard_manager.set_candidates_callback(self.overlay_window.update_candidates)
+        # 鼠标位置历史变化时刷新鼠标映射表单
+        if self.clipboard_service:
+            self.clipboard_service.add_history_callback(self.update_position_history)
     
 
     
     def run(self):
-        """运行UI"""
+        """运行UI，托盘常驻时关闭主窗口后事件循环继续运行，等待托盘菜单重新打开"""
+        if self.config_manager.get_setting("tray_resident", True):
+            if tray_icon.is_available():
+                self.tray = tray_icon.TrayIcon(
+                    self.show_main_window, self.keyboard_manager.toggle_listening,
+                    self.quit, self.keyboard_manager.is_active
+                )
+                self.tray.start()
+            else:
+                print("未安装 pystray 和 Pillow，关闭主窗口将退出程序")
+        
+        self.root = tk.Tk()
+        self.root.withdraw()
+        # 剪贴板服务使用隐藏根窗口持有的Tk剪贴板
+        if self.clipboard_service:
+            self.clipboard_service.attach_tk(self.root, self.call_in_ui)
+        self._attach_ui_calls(self.root)
         self.create_main_window()
+        self.root.mainloop()
         
-        # 注册退出时清理函数
-        def on_closing():
-            # 销毁悬浮窗口
-            if self.overlay_window:
-                self.overlay_window.destroy_window()
-            # 关闭主窗口
-            self.root.quit()
+        if self.main_window is not None:
+            self.destroy_main_window()
+        if self.clipboard_service:
+            self.clipboard_service.detach_tk()
+        try:
+            if self.ui_wake_read is not None:
+                self.root.tk.deletefilehandler(self.ui_wake_read)
             self.root.destroy()
+        except Exception as e:
+            print(f"销毁Tk根窗口失败: {e}")
+        self.root = None
         
-        self.root.protocol("WM_DELETE_WINDOW", on_closing)
-        self.root.mainloop()
+        # 销毁悬浮窗口
+        if self.overlay_window:
+            self.overlay_window.destroy_window()
+        if self.tray:
+            self.tray.stop()
+        # 停止键盘监听器和后台线程
+        self.keyboard_manager.shutdown()
+    
+    def close_main_window(self):
+        """关闭主窗口，没有托盘图标时退出程序"""
+        if self.tray is None:
+            self._quit()
+            return
+        self.destroy_main_window()
+        # 界面已全部释放，只剩隐藏的根窗口、键盘管理器和托盘图标
+        tray_icon.trim_memory()
+    
+    def show_main_window(self):
+        """显示主窗口，可在任意线程调用"""
+        self.call_in_ui(self._show_main_window)
+    
+    def _show_main_window(self):
+        """在UI线程中显示主窗口，主窗口已关闭时重新创建"""
+        if self.main_window is None:
+            self.create_main_window()
+        else:
+            self.main_window.deiconify()
+            self.main_window.lift()
+    
+    def quit(self):
+        """退出程序，可在任意线程调用"""
+        self.call_in_ui(self._quit)
+    
+    def _quit(self):
+        """在UI线程中结束事件循环"""
+        self.root.quit()
+    
+    def destroy_main_window(self):
+        """销毁主窗口和映射配置窗口，释放所有控件、Tk变量和图片的引用，隐藏的根窗口保留"""
+        main_window = self.main_window
+        try:
+            main_window.destroy()
+        except Exception as e:
+            print(f"销毁主窗口失败: {e}")
+        for name, value in list(vars(self).items()):
+            if name != 'root' and isinstance(value, (tk.Misc, tk.Variable, tk.Image)):
+                setattr(self, name, None)
+        self.sort_orders.clear()
     
     def create_main_window(self):
         """创建主窗口"""
-        self.root = tk.Tk()
-        self.root.title("ShortcutsEasier 软件")
-        self.root.geometry("600x400")
-        self.root.resizable(True, True)
+        self.main_window = tk.Toplevel(self.root)
+        self.main_window.title("ShortcutsEasier 软件")
+        self.main_window.geometry("600x400")
+        self.main_window.resizable(True, True)
+        self.main_window.protocol("WM_DELETE_WINDOW", self.close_main_window)
         
         # 创建菜单栏
-        menubar = tk.Menu(self.root)
-        self.root.config(menu=menubar)
+        menubar = tk.Menu(self.main_window)
+        self.main_window.config(menu=menubar)
         
         # 文件菜单
         file_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="文件", menu=file_menu)
-        file_menu.add_command(label="退出", command=self.root.quit)
+        file_menu.add_command(label="退出", command=self._quit)
         
         # 设置菜单
         settings_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="设置", menu=settings_menu)
         settings_menu.add_command(label="按键映射", command=self.open_mapping_window)
+        settings_menu.add_command(label="校准注入延迟", command=self.calibrate_injection_pacing)
         
         # 帮助菜单
         help_menu = tk.Menu(menubar, tearoff=0)
@@ -90,12 +190,12 @@ class UIManager:
         help_menu.add_command(label="关于", command=self.show_about)
         
         # 创建主框架
-        main_frame = ttk.Frame(self.root, padding="10")
+        main_frame = ttk.Frame(self.main_window, padding="10")
         main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         
         # 配置网格权重
-        self.root.columnconfigure(0, weight=1)
-        self.root.rowconfigure(0, weight=1)
+        self.main_window.columnconfigure(0, weight=1)
+        self.main_window.rowconfigure(0, weight=1)
         main_frame.columnconfigure(0, weight=1)
         main_frame.rowconfigure(1, weight=1)
         
@@ -114,6 +214,14 @@ class UIManager:
         self.status_label = ttk.Label(status_frame, textvariable=self.status_var, foreground="green" if self.keyboard_manager.is_active() else "red")
         self.status_label.grid(row=0, column=1, sticky=tk.W)
         
+        # evdev 后端统计每个键盘设备的事件数和从内核时间戳到回调完成的延迟
+        if self.config_manager.get_setting("input_backend", "pynput") == "evdev":
+            ttk.Label(status_frame, text="输入设备:").grid(row=1, column=0, sticky=(tk.W, tk.N), padx=(0, 10))
+            self.device_stats_var = tk.StringVar(value="读取中...")
+            ttk.Label(status_frame, textvariable=self.device_stats_var, justify=tk.LEFT).grid(row=1, column=1, sticky=tk.W)
+            ttk.Button(status_frame, text="刷新", command=self.refresh_device_stats).grid(row=1, column=2, sticky=tk.E)
+            self.refresh_device_stats()
+        
         # 控制按钮框架
         control_frame = ttk.Frame(main_frame)
         control_frame.grid(row=2, column=0, pady=(0, 20))
@@ -160,8 +268,16 @@ class UIManager:
         
         ttk.Label(info_frame, text="提示: 按下自定义按键序列可触发对应快捷键", foreground="gray").pack()
     
+    def reload_config(self):
+        """重新加载配置文件并刷新映射列表，可在任意线程调用"""
+        self.config_manager.load_config()
+        self.call_in_ui(self.load_mapping_data)
+    
     def load_mapping_data(self):
         """加载并显示按键映射数据"""
+        if self.mapping_tree is None:
+            # 主窗口已关闭
+            return
         # 清空现有数据
         for item in self.mapping_tree.get_children():
             self.mapping_tree.delete(item)
@@ -184,6 +300,11 @@ class UIManager:
     
     def update_ui_status(self, is_active):
         """更新UI状态显示"""
+        if self.tray:
+            self.tray.icon.update_menu()
+        if self.status_var is None:
+            # 主窗口已关闭，只有托盘图标
+            return
         if is_active:
             self.status_var.set("运行中")
             if self.status_label:
@@ -197,19 +318,31 @@ class UIManager:
             if self.toggle_button:
                 self.toggle_button.config(text="开始监听")
     
+    def refresh_device_stats(self):
+        """在后台线程读取输入设备统计后更新状态栏，钩子进程模式下需要等待钩子进程回复"""
+        def load():
+            stats = self.keyboard_manager.get_device_stats()
+            lines = [
+                f"{info['name']}: 按下 {info['presses']}, 释放 {info['releases']}, 重复 {info['repeats']}, "
+                f"平均延迟 {info['mean_latency_ms']:.2f}ms, 最大延迟 {info['max_latency_ms']:.2f}ms"
+                for info in stats.values()
+            ]
+            self.call_in_ui(self.device_stats_var.set, "\n".join(lines) or "没有设备统计")
+        threading.Thread(target=load, daemon=True).start()
+    
     def open_mapping_window(self):
         """打开按键映射配置窗口"""
         if self.mapping_window and self.mapping_window.winfo_exists():
             self.mapping_window.lift()
             return
         
-        self.mapping_window = tk.Toplevel(self.root)
+        self.mapping_window = tk.Toplevel(self.main_window)
         self.mapping_window.title("按键映射配置")
         self.mapping_window.geometry("600x500")
         self.mapping_window.resizable(True, True)
         
         # 居中显示
-        self.mapping_window.transient(self.root)
+        self.mapping_window.transient(self.main_window)
         self.mapping_window.grab_set()
         
         # 创建框架
@@ -228,6 +361,10 @@ class UIManager:
         mouse_frame = ttk.Frame(notebook)
         notebook.add(mouse_frame, text="鼠标点击映射")
         
+        # 冲突检查标签页
+        conflict_frame = ttk.Frame(notebook)
+        notebook.add(conflict_frame, text="冲突检查")
+        
         # ========== 按键映射部分 ==========
         # 输入框架
         key_input_frame = ttk.LabelFrame(key_frame, text="添加新按键映射", padding="10")
@@ -269,12 +406,13 @@ class UIManager:
         key_list_frame.pack(fill=tk.BOTH, expand=True)
         
         # 创建Treeview
-        key_columns = ('按键序列', '快捷键')
+        key_columns = ('按键序列', '快捷键', '使用次数', '最后使用')
         self.key_mapping_tree = ttk.Treeview(key_list_frame, columns=key_columns, show='headings', height=8)
         self.key_mapping_tree.heading('按键序列', text='按键序列')
         self.key_mapping_tree.heading('快捷键', text='快捷键')
         self.key_mapping_tree.column('按键序列', width=150)
         self.key_mapping_tree.column('快捷键', width=150)
+        self._add_usage_columns(self.key_mapping_tree)
         
         # 添加滚动条
         key_scrollbar = ttk.Scrollbar(key_list_frame, orient=tk.VERTICAL, command=self.key_mapping_tree.yview)
@@ -308,10 +446,12 @@ class UIManager:
         mouse_key_sequence_entry.bind('<FocusIn>', lambda e: self.start_capture_mouse())
         
         # 鼠标位置输入
-        ttk.Label(mouse_input_frame, text="鼠标位置 (X,Y):").grid(row=0, column=2, sticky=tk.W, padx=(0, 5))
+        ttk.Label(mouse_input_frame, text="鼠标位置 (X,Y 或 image:图片):").grid(row=0, column=2, sticky=tk.W, padx=(0, 5))
         self.mouse_position_var = tk.StringVar()
-        mouse_position_entry = ttk.Entry(mouse_input_frame, textvariable=self.mouse_position_var, width=20)
-        mouse_position_entry.grid(row=0, column=3, sticky=(tk.W, tk.E))
+        # 下拉列表提供最近通过 Ctrl+Shift+F11 捕获的位置
+        history = self.clipboard_service.get_position_history() if self.clipboard_service else []
+        self.mouse_position_combo = ttk.Combobox(mouse_input_frame, textvariable=self.mouse_position_var, values=history, width=20)
+        self.mouse_position_combo.grid(row=0, column=3, sticky=(tk.W, tk.E))
         
         # 添加按钮
         add_mouse_button = ttk.Button(mouse_input_frame, text="添加", command=self.add_mouse_mapping)
@@ -324,7 +464,7 @@ class UIManager:
         # 提示信息
         mouse_hint_label = ttk.Label(
             mouse_input_frame, 
-            text="按下 Ctrl+Shift+F11 获取鼠标位置并复制到剪贴板，鼠标位置格式: X,Y (例如: 100,200)", 
+            text="按下 Ctrl+Shift+F11 获取鼠标位置并复制到剪贴板（也可从下拉列表选择最近捕获的位置），鼠标位置格式: X,Y (例如: 100,200)", 
             foreground="blue",
             font=("Arial", 9)
         )
@@ -335,12 +475,13 @@ class UIManager:
         mouse_list_frame.pack(fill=tk.BOTH, expand=True)
         
         # 创建Treeview
-        mouse_columns = ('按键序列', '鼠标位置')
+        mouse_columns = ('按键序列', '鼠标位置', '使用次数', '最后使用')
         self.mouse_mapping_tree = ttk.Treeview(mouse_list_frame, columns=mouse_columns, show='headings', height=8)
         self.mouse_mapping_tree.heading('按键序列', text='按键序列')
         self.mouse_mapping_tree.heading('鼠标位置', text='鼠标位置')
         self.mouse_mapping_tree.column('按键序列', width=150)
         self.mouse_mapping_tree.column('鼠标位置', width=150)
+        self._add_usage_columns(self.mouse_mapping_tree)
         
         # 添加滚动条
         mouse_scrollbar = ttk.Scrollbar(mouse_list_frame, orient=tk.VERTICAL, command=self.mouse_mapping_tree.yview)
@@ -361,6 +502,33 @@ class UIManager:
         refresh_mouse_button = ttk.Button(mouse_button_frame, text="刷新", command=self.load_mouse_mapping_data)
         refresh_mouse_button.pack(side=tk.RIGHT)
         
+        # ========== 冲突检查部分 ==========
+        conflict_list_frame = ttk.LabelFrame(conflict_frame, text="触发序列冲突", padding="10")
+        conflict_list_frame.pack(fill=tk.BOTH, expand=True)
+        
+        ttk.Label(
+            conflict_list_frame,
+            text="前缀冲突中较短的触发序列总是先触发，可在配置中设置 disambiguation_delay_ms 等待后续输入",
+            foreground="blue",
+            font=("Arial", 9)
+        ).pack(fill=tk.X, pady=(0, 5))
+        
+        # 创建Treeview
+        conflict_columns = ('类型', '触发序列', '冲突的触发序列')
+        self.conflict_tree = ttk.Treeview(conflict_list_frame, columns=conflict_columns, show='headings', height=8)
+        for column in conflict_columns:
+            self.conflict_tree.heading(column, text=column)
+        self.conflict_tree.column('类型', width=80)
+        self.conflict_tree.column('触发序列', width=120)
+        self.conflict_tree.column('冲突的触发序列', width=300)
+        
+        # 添加滚动条
+        conflict_scrollbar = ttk.Scrollbar(conflict_list_frame, orient=tk.VERTICAL, command=self.conflict_tree.yview)
+        self.conflict_tree.configure(yscroll=conflict_scrollbar.set)
+        
+        self.conflict_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        conflict_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
         # 加载数据
         self.load_key_mapping_data()
         self.load_mouse_mapping_data()
@@ -375,12 +543,16 @@ class UIManager:
         for item in self.key_mapping_tree.get_children():
             self.key_mapping_tree.delete(item)
         
-        # 获取映射数据
+        # 获取映射数据和使用统计
         mappings = self.config_manager.get_mappings()
+        usage = self._load_usage()
         
         # 添加数据到表格
         for key_seq, hotkey in mappings.items():
-            self.key_mapping_tree.insert('', tk.END, values=(key_seq, hotkey))
+            self.key_mapping_tree.insert('', tk.END, values=(key_seq, hotkey) + self._format_usage(usage, key_seq))
+        
+        # 映射变化后刷新冲突列表
+        self.load_conflict_data()
     
     def load_mouse_mapping_data(self):
         """加载鼠标映射数据到表格"""
@@ -388,12 +560,66 @@ class UIManager:
         for item in self.mouse_mapping_tree.get_children():
             self.mouse_mapping_tree.delete(item)
         
-        # 获取映射数据
+        # 获取映射数据和使用统计
         mouse_mappings = self.config_manager.get_mouse_mappings()
+        usage = self._load_usage()
         
         # 添加数据到表格
         for key_seq, position in mouse_mappings.items():
-            self.mouse_mapping_tree.insert('', tk.END, values=(key_seq, position))
+            self.mouse_mapping_tree.insert('', tk.END, values=(key_seq, position) + self._format_usage(usage, key_seq))
+        
+        # 映射变化后刷新冲突列表
+        self.load_conflict_data()
+    
+    def _add_usage_columns(self, tree):
+        """设置使用次数和最后使用列，点击表头排序"""
+        tree.column('使用次数', width=70, anchor=tk.E)
+        tree.column('最后使用', width=120)
+        for column in ('按键序列', '使用次数', '最后使用'):
+            tree.heading(column, text=column, command=lambda c=column: self._sort_tree(tree, c))
+    
+    def _sort_tree(self, tree, column):
+        """按列排序表格，再次点击同一列时反向排序"""
+        reverse = self.sort_orders.get((str(tree), column), column != '按键序列')
+        self.sort_orders[(str(tree), column)] = not reverse
+        if column == '使用次数':
+            key = lambda item: int(tree.set(item, column) or 0)
+        else:
+            key = lambda item: tree.set(item, column)
+        for index, item in enumerate(sorted(tree.get_children(), key=key, reverse=reverse)):
+            tree.move(item, '', index)
+    
+    def _load_usage(self):
+        """读取触发使用统计"""
+        try:
+            return read_usage(*self.config_manager.get_usage_log_paths(), self.config_manager.get_snapshot().actions)
+        except Exception as e:
+            print(f"读取使用统计失败: {e}")
+            return {}
+    
+    def _format_usage(self, usage, trigger):
+        """格式化触发序列的使用次数和最后使用时间"""
+        entry = usage.get(trigger)
+        if entry is None:
+            return (0, "")
+        return (entry[0], time.strftime('%Y-%m-%d %H:%M', time.localtime(entry[1])))
+    
+    def load_conflict_data(self):
+        """加载触发序列冲突分析结果到表格"""
+        if not getattr(self, 'conflict_tree', None) or not self.conflict_tree.winfo_exists():
+            return
+        
+        # 清空现有数据
+        for item in self.conflict_tree.get_children():
+            self.conflict_tree.delete(item)
+        
+        kind_names = {'prefix': '前缀', 'suffix': '后缀', 'duplicate': '重复'}
+        # 冲突分析在编译映射快照时已经完成
+        for kind, trigger, others, count in self.config_manager.get_snapshot().conflicts:
+            text = ", ".join(others)
+            if count > len(others):
+                text += f" 等 {count} 个"
+            self.conflict_tree.insert('', tk.END, values=(kind_names[kind], trigger, text))
     
     def start_capture(self):
         """开始捕获按键序列"""
@@ -413,6 +639,8 @@ class UIManager:
         if not key_sequence or not hotkey:
             messagebox.showwarning("输入错误", "请填写完整的按键序列和快捷键")
             return
+        if not self._validate_pattern(key_sequence):
+            return
         
         # 添加映射
         self.config_manager.add_mapping(key_sequence, hotkey)
@@ -426,6 +654,17 @@ class UIManager:
         
         messagebox.showinfo("成功", "按键映射添加成功")
     
+    def _validate_pattern(self, key_sequence):
+        """检查模式触发序列的语法，有错误时提示并返回 False"""
+        if not is_pattern(key_sequence):
+            return True
+        try:
+            parse_pattern(key_sequence)
+        except PatternError as e:
+            messagebox.showerror("模式错误", str(e))
+            return False
+        return True
+    
     def start_capture_mouse(self):
         """开始捕获鼠标相关的按键序列"""
         self.current_capture = "mouse"
@@ -439,14 +678,34 @@ class UIManager:
         if not key_sequence or not position:
             messagebox.showwarning("输入错误", "请填写完整的按键序列和鼠标位置")
             return
-        
-        # 验证鼠标位置格式
-        try:
-            x, y = map(int, position.split(','))
-        except ValueError:
-            messagebox.showerror("格式错误", "鼠标位置格式不正确，请使用 X,Y 格式（例如: 100,200）")
+        if not self._validate_pattern(key_sequence):
             return
         
+        # 验证鼠标位置格式，模式触发序列的位置中可以使用捕获组占位符，触发时才能确定
+        if is_pattern(key_sequence) and has_placeholders(position):
+            pass
+        elif image_anchor.is_image_position(position):
+            image = self.clipboard_service.get_anchor_image(position) if self.clipboard_service else None
+            if image is not None:
+                # 刚截取的图像锚点，添加映射时才保存到配置文件旁的锚点目录
+                try:
+                    position = image_anchor.save_anchor(position, image, self.config_manager.get_anchor_dir())
+                except Exception as e:
+                    messagebox.showerror("保存失败", f"保存图像锚点失败: {e}")
+                    return
+            elif not os.path.isfile(os.path.join(
+                os.path.dirname(os.path.abspath(self.config_manager.config_file)),
+                position[len(image_anchor.IMAGE_PREFIX):]
+            )):
+                messagebox.showerror("格式错误", "图像锚点文件不存在，请重新按 Ctrl+Shift+F11 捕获")
+                return
+        else:
+            try:
+                x, y = map(int, position.split(','))
+            except ValueError:
+                messagebox.showerror("格式错误", "鼠标位置格式不正确，请使用 X,Y 格式（例如: 100,200）或 image:图片路径")
+                return
+        
         # 添加映射
         self.config_manager.add_mouse_mapping(key_sequence, position)
         
@@ -527,6 +786,120 @@ class UIManager:
         self.mouse_key_sequence_var.set(key_sequence)
         self.mouse_position_var.set(position)
     
+    def call_in_ui(self, func, *args):
+        """在UI线程中执行函数，可在任意线程调用"""
+        self.ui_calls.put((func, args))
+        if self.ui_wake_write is not None:
+            try:
+                os.write(self.ui_wake_write, b"\0")
+            except BlockingIOError:
+                # 管道已满，UI线程已经会被唤醒
+                pass
+            return
+        root = self.root
+        if root is None or self.ui_wake_pending:
+            # 界面尚未创建(创建后会执行队列中的函数)，或已有唤醒事件等待处理
+            return
+        self.ui_wake_pending = True
+        try:
+            # 线程化的Tcl把其他线程的调用转交给UI线程，虚拟事件在UI线程的事件循环中处理
+            root.event_generate("<<UiCall>>", when="tail")
+        except Exception as e:
+            # 事件循环尚未运行或已经退出，队列中的函数由进入事件循环后的空闲回调执行
+            self.ui_wake_pending = False
+            print(f"唤醒界面线程失败: {e}")
+    
+    def _attach_ui_calls(self, root):
+        """让UI线程执行其他线程提交的函数"""
+        if self.ui_wake_read is not None:
+            root.tk.createfilehandler(self.ui_wake_read, tk.READABLE, lambda fd, mask: self._run_ui_calls())
+        else:
+            root.bind("<<UiCall>>", lambda event: self._run_ui_calls())
+            # 进入事件循环前唤醒失败的提交
+            root.after_idle(self._run_ui_calls)
+        # 窗口创建前提交的函数
+        self._run_ui_calls()
+    
+    def _run_ui_calls(self):
+        """在UI线程中执行其他线程提交的全部函数"""
+        # 先清除标志再取队列，取队列之后提交的函数会生成新的唤醒事件
+        self.ui_wake_pending = False
+        if self.ui_wake_read is not None:
+            try:
+                os.read(self.ui_wake_read, 4096)
+            except BlockingIOError:
+                pass
+        while True:
+            try:
+                func, args = self.ui_calls.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"执行界面操作失败: {e}")
+    
+    def calibrate_injection_pacing(self):
+        """校准目标程序的注入间隔
+
+        在目标程序的空白输入框中以不同间隔输入测试文本，用 Ctrl+A、Ctrl+C 复制输入框的内容，
+        按目标程序实际收到的文本判断是否丢失按键。校准在后台线程中进行，结果交回UI线程显示。
+        """
+        if not messagebox.askokcancel(
+            "注入延迟校准",
+            "点击确定后，请在 3 秒内切换到需要校准的程序，并把光标放在一个空白的输入框中。\n\n"
+            "校准期间会在该输入框中输入和删除测试文本，并临时使用剪贴板，请勿操作键盘和鼠标。"
+        ):
+            return
+        keyboard_manager = self.keyboard_manager
+        
+        # 校准期间暂停监听，避免注入的字符触发映射
+        was_active = keyboard_manager.is_active()
+        if was_active:
+            keyboard_manager.stop_listening()
+        
+        def reset():
+            keyboard_manager.execute_hotkey("ctrl+a")
+            keyboard_manager.execute_hotkey("backspace")
+        
+        def read_back():
+            pyperclip.copy("")
+            keyboard_manager.execute_hotkey("ctrl+a")
+            keyboard_manager.execute_hotkey("ctrl+c")
+            time.sleep(0.1)
+            return pyperclip.paste()
+        
+        def finish(message):
+            if was_active:
+                keyboard_manager.start_listening()
+            messagebox.showinfo("注入延迟校准", message)
+        
+        def run():
+            try:
+                saved_clipboard = pyperclip.paste()
+            except Exception as e:
+                print(f"读取剪贴板失败: {e}")
+                saved_clipboard = None
+            # 等待用户切换到目标程序
+            time.sleep(3)
+            try:
+                window_class, delay = keyboard_manager.injection_pacer.calibrate(
+                    keyboard_manager.type_text, read_back, reset
+                )
+                reset()
+                message = f"窗口类 {window_class} 的注入间隔: {delay * 1000:.1f}ms"
+            except Exception as e:
+                print(f"校准注入延迟失败: {e}")
+                message = f"校准失败: {e}"
+            if saved_clipboard is not None:
+                try:
+                    pyperclip.copy(saved_clipboard)
+                except Exception as e:
+                    print(f"恢复剪贴板失败: {e}")
+            self.call_in_ui(finish, message)
+        
+        threading.Thread(target=run, name="calibrate-pacing", daemon=True).start()
+    
     def show_about(self):
         """显示关于对话框"""
         messagebox.showinfo(
@@ -537,6 +910,16 @@ class UIManager:
             "版本: 1.0.0"
         )
     
+    def update_position_history(self, history):
+        """鼠标位置历史变化时刷新下拉列表，可在任意线程调用"""
+        self.call_in_ui(self._update_position_history_ui, history)
+    
+    def _update_position_history_ui(self, history):
+        """在UI线程中刷新位置下拉列表"""
+        combo = getattr(self, 'mouse_position_combo', None)
+        if combo is not None and combo.winfo_exists():
+            combo.configure(values=history)
+    
     def update_overlay_text(self, text):
         """更新悬浮窗口文本"""
         if self.overlay_window:
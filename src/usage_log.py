@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+触发使用记录模块
+把每次触发追加为定长二进制记录，定期压缩为每个触发序列的使用计数，
+不在每次触发时改写 config.json。
+
+记录中只保存触发序列的ID。ID按出现顺序分配，ID -> 触发序列 的表保存在计数文件中，
+新的ID在写入引用它的记录之前就已写入计数文件，不同触发序列的ID不会相同。
+压缩和读取统计持有计数文件旁的锁文件，读取时不会看到只合并了一半的记录。
+"""
+
+import json
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+# 每条记录: 触发序列ID, 时间戳(秒), 延迟(微秒)
+RECORD = struct.Struct('<IdI')
+MAX_ID = 0xFFFFFFFF
+
+
+@contextmanager
+def _locked(counters_path):
+    """持有计数文件旁锁文件上的排他锁，同一进程内的多个线程也需要另外加锁"""
+    with open(counters_path + ".lock", 'a+b') as lock_file:
+        if sys.platform == "win32":
+            lock_file.seek(0)
+            # LK_LOCK 在锁被占用时每秒重试一次，最多 10 次
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if sys.platform == "win32":
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _read_records(log_path):
+    """读取记录文件，忽略异常退出时写了一半的末尾记录"""
+    try:
+        with open(log_path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return []
+    end = len(data) - len(data) % RECORD.size
+    return RECORD.iter_unpack(data[:end])
+
+
+def _read_counters(counters_path):
+    """读取压缩后的计数和ID表
+
+    返回 (ID -> [次数, 最后使用时间, 延迟总和(微秒)], 触发序列 -> ID)。
+    没有ID表的旧格式无法知道计数属于哪个触发序列，只返回计数。
+    """
+    try:
+        with open(counters_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}, {}
+    except Exception as e:
+        print(f"读取使用计数失败: {e}")
+        return {}, {}
+    if "counters" not in data:
+        return {int(key): value for key, value in data.items()}, {}
+    return (
+        {int(key): value for key, value in data["counters"].items()},
+        {trigger: int(key) for key, trigger in data.get("triggers", {}).items()}
+    )
+
+
+def _write_counters(counters_path, counters, ids):
+    """原子地替换计数文件"""
+    temp_path = counters_path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            "triggers": {str(key): trigger for trigger, key in ids.items()},
+            "counters": {str(key): value for key, value in counters.items()},
+        }, f, ensure_ascii=False)
+    os.replace(temp_path, counters_path)
+
+
+def _assign_ids(ids, triggers, counters):
+    """为 ids 中没有的触发序列按顺序分配新的ID，返回是否分配了新ID
+
+    旧格式中没有对应触发序列的计数也占用ID，新的触发序列不会继承它们。
+    """
+    used = set(ids.values()) | set(counters)
+    next_id = max(used, default=0) + 1
+    added = False
+    for trigger in triggers:
+        if trigger in ids:
+            continue
+        if next_id > MAX_ID or next_id in used:
+            # 旧版本以 crc32 作为ID，最大ID可能已到上限，从小到大找空闲的ID
+            next_id = 1
+            while next_id in used:
+                next_id += 1
+        ids[trigger] = next_id
+        used.add(next_id)
+        next_id += 1
+        added = True
+    return added
+
+
+def _merge(counters, records):
+    """把记录合并到计数中"""
+    for record_id, timestamp, latency_us in records:
+        entry = counters.get(record_id)
+        if entry is None:
+            counters[record_id] = [1, timestamp, latency_us]
+        else:
+            entry[0] += 1
+            entry[1] = max(entry[1], timestamp)
+            entry[2] += latency_us
+    return counters
+
+
+def read_usage(log_path, counters_path, triggers):
+    """读取 triggers 中各触发序列的使用统计，返回 触发序列 -> [次数, 最后使用时间, 延迟总和(微秒)]
+
+    包括已压缩的计数和尚未压缩的记录，界面进程可以在钩子进程写入的同时读取；
+    读取时持有与压缩相同的锁，不会把同一批记录计入两次或漏掉。
+    """
+    with _locked(counters_path):
+        counters, ids = _read_counters(counters_path)
+        counters = _merge(counters, _read_records(log_path))
+    usage = {}
+    for trigger in triggers:
+        entry = counters.get(ids.get(trigger))
+        if entry is not None:
+            usage[trigger] = entry
+    return usage
+
+
+class UsageLog:
+    """触发使用记录
+
+    record() 只把记录放入队列；写入线程把触发序列换成ID后批量追加到记录文件，
+    记录文件超过 compact_bytes 时把全部记录合并到计数文件并清空记录文件。
+    """
+
+    def __init__(self, log_path, counters_path, compact_bytes=64 * 1024):
+        """初始化使用记录"""
+        self.log_path = log_path
+        self.counters_path = counters_path
+        self.compact_bytes = compact_bytes
+        self.queue = queue.SimpleQueue()
+        self.thread = None
+        self.lock = threading.Lock()
+        # 触发序列 -> ID，与计数文件中的ID表一致
+        self.ids = {}
+
+    def register(self, triggers):
+        """为当前配置中的触发序列分配ID，新的ID立即写入计数文件"""
+        try:
+            self._ensure_ids(triggers)
+        except Exception as e:
+            print(f"登记触发序列失败: {e}")
+
+    def _ensure_ids(self, triggers):
+        """确保每个触发序列都有ID，返回 触发序列 -> ID"""
+        with self.lock:
+            ids = self.ids
+            if all(trigger in ids for trigger in triggers):
+                return ids
+            with _locked(self.counters_path):
+                counters, ids = _read_counters(self.counters_path)
+                ids.update((trigger, key) for trigger, key in self.ids.items() if trigger not in ids)
+                if _assign_ids(ids, triggers, counters):
+                    _write_counters(self.counters_path, counters, ids)
+            self.ids = ids
+            return ids
+
+    def record(self, trigger, latency):
+        """记录一次触发，latency 为从匹配到动作完成的耗时(秒)"""
+        self.queue.put((trigger, time.time(), int(latency * 1e6)))
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self._run, name="usage-log", daemon=True)
+                    self.thread.start()
+
+    def _run(self):
+        """写入线程主循环"""
+        while True:
+            item = self.queue.get()
+            batch = []
+            while item is not None:
+                batch.append(item)
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                self._append(batch)
+            if item is None:
+                return
+
+    def _append(self, batch):
+        """把一批 (触发序列, 时间戳, 延迟) 换成ID后追加，超过阈值时压缩"""
+        try:
+            ids = self._ensure_ids({trigger for trigger, _, _ in batch})
+            data = b''.join(RECORD.pack(ids[trigger], timestamp, latency) for trigger, timestamp, latency in batch)
+            with open(self.log_path, 'ab') as f:
+                f.write(data)
+                size = f.tell()
+            if size >= self.compact_bytes:
+                self.compact()
+        except Exception as e:
+            print(f"写入使用记录失败: {e}")
+
+    def compact(self):
+        """把记录文件合并到计数文件并清空记录文件"""
+        with self.lock, _locked(self.counters_path):
+            records = list(_read_records(self.log_path))
+            if not records:
+                return
+            counters, ids = _read_counters(self.counters_path)
+            ids.update((trigger, key) for trigger, key in self.ids.items() if trigger not in ids)
+            _write_counters(self.counters_path, _merge(counters, records), ids)
+            # 读取统计的一方持有同一把锁，看不到替换计数文件与清空记录之间的状态
+            open(self.log_path, 'wb').close()
+
+    def close(self):
+        """写完队列中的记录后停止写入线程并压缩"""
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join(timeout=2.0)
+            self.thread = None
+        try:
+            self.compact()
+        except Exception as e:
+            print(f"压缩使用记录失败: {e}")
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+唤醒次数测量工具 (Linux)
+读取 /proc/<pid>/task/*/status 中的上下文切换计数，统计一个进程的各个
+线程在一段时间内被唤醒的次数，用于确认空闲时没有周期性唤醒。
+
+用法:
+    python src/wakeup_meter.py --pid 12345 --seconds 30    测量正在运行的实例
+    python src/wakeup_meter.py --engine --seconds 10       在本进程中空闲运行键盘管理器并测量
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+# 添加src目录到Python路径
+sys.path.append(os.path.join(os.path.dirname(__file__)))
+
+
+def read_switches(pid):
+    """读取进程各线程的上下文切换次数: 线程ID -> (线程名, 主动切换, 被动切换)"""
+    result = {}
+    task_dir = f"/proc/{pid}/task"
+    for tid in os.listdir(task_dir):
+        try:
+            with open(f"{task_dir}/{tid}/comm") as f:
+                name = f.read().strip()
+            voluntary = nonvoluntary = 0
+            with open(f"{task_dir}/{tid}/status") as f:
+                for line in f:
+                    if line.startswith("voluntary_ctxt_switches:"):
+                        voluntary = int(line.split()[1])
+                    elif line.startswith("nonvoluntary_ctxt_switches:"):
+                        nonvoluntary = int(line.split()[1])
+        except FileNotFoundError:
+            # 线程已退出
+            continue
+        result[int(tid)] = (name, voluntary, nonvoluntary)
+    return result
+
+
+def measure(pid, seconds, exclude=()):
+    """测量 seconds 秒内各线程的唤醒次数，返回 [(线程ID, 线程名, 唤醒次数)]
+
+    主动切换表示线程阻塞后被唤醒，被动切换表示运行中被抢占，两者之和即为唤醒次数。
+    期间新建的线程从 0 开始计数。
+    """
+    before = read_switches(pid)
+    time.sleep(seconds)
+    after = read_switches(pid)
+    results = []
+    for tid, (name, voluntary, nonvoluntary) in after.items():
+        if tid in exclude:
+            continue
+        _, old_voluntary, old_nonvoluntary = before.get(tid, (name, 0, 0))
+        results.append((tid, name, voluntary - old_voluntary + nonvoluntary - old_nonvoluntary))
+    results.sort(key=lambda result: -result[2])
+    return results
+
+
+def report(results, seconds):
+    """输出测量结果，返回总唤醒次数"""
+    total = sum(count for _, _, count in results)
+    print(f"{'线程ID':>8}  {'线程名':<16} {'唤醒次数':>8}")
+    for tid, name, count in results:
+        print(f"{tid:>8}  {name:<16} {count:>8}")
+    print(f"{seconds:g} 秒内共唤醒 {total} 次 ({total / seconds:.2f} 次/秒)")
+    return total
+
+
+def measure_engine(seconds, settle=2.0):
+    """在本进程中用假输入后端运行键盘管理器，输入一段按键后空闲，测量空闲期间的唤醒次数"""
+    import shutil
+    import tempfile
+    from contextlib import redirect_stdout
+    from config_manager import ConfigManager
+    from keyboard_manager import KeyboardManager
+    from soak_harness import FakeBackend, FakeKeyCode, FakeListener
+
+    config_dir = tempfile.mkdtemp(prefix="wakeup-")
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        config_manager = ConfigManager(os.path.join(config_dir, "config.json"))
+        config_manager.add_mouse_mapping("clk", "10,10")
+        keyboard_manager = KeyboardManager(config_manager, FakeBackend())
+        keyboard_manager.start_listening()
+        # 输入一段按键并触发一次映射，启动所有按需创建的线程和定时器
+        for char in "hello clk":
+            key = FakeKeyCode.from_char(char)
+            FakeListener.active.on_press(key)
+            FakeListener.active.on_release(key)
+        keyboard_manager.action_executor.submit(lambda: None).result()
+    # 等待清空输入显示等定时器执行完毕
+    time.sleep(keyboard_manager.buffer_timeout + settle)
+    results = measure(os.getpid(), seconds, exclude=(threading.get_native_id(),))
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        keyboard_manager.shutdown()
+    shutil.rmtree(config_dir, ignore_errors=True)
+    return results
+
+
+def main():
+    """命令行入口，唤醒次数超过上限时返回 1"""
+    parser = argparse.ArgumentParser(description="统计进程空闲时的唤醒次数")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--pid', type=int, help="要测量的进程ID")
+    target.add_argument('--engine', action='store_true', help="在本进程中空闲运行键盘管理器并测量")
+    parser.add_argument('--seconds', type=float, default=10.0, help="测量时长(秒)")
+    parser.add_argument('--max-wakeups', type=int, default=0, help="允许的最大唤醒次数")
+    args = parser.parse_args()
+
+    if args.engine:
+        results = measure_engine(args.seconds)
+    else:
+        results = measure(args.pid, args.seconds)
+    total = report(results, args.seconds)
+    if total > args.max_wakeups:
+        print(f"未通过: 唤醒次数超过上限 {args.max_wakeups}")
+        return 1
+    print("通过")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试公共配置
+模块位于 src 目录并以裸模块名互相导入，测试同样把 src 加入 Python 路径
+"""
+
+import os
+import sys
+from contextlib import redirect_stdout
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from config_manager import ConfigManager
+from keyboard_manager import KeyboardManager
+from soak_harness import FakeBackend
+
+
+@pytest.fixture
+def config_manager(tmp_path):
+    """只有用户配置层的配置管理器，不读取系统和团队配置"""
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        return ConfigManager(str(tmp_path / "config.json"), [])
+
+
+@pytest.fixture
+def keyboard_manager(config_manager):
+    """使用假输入后端并已开始监听的键盘管理器"""
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        manager = KeyboardManager(config_manager, FakeBackend())
+        manager.event_budget = 0
+        manager.start_listening()
+    yield manager
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        manager.shutdown()
@@ -0,0 +1,13 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+快速路径内存分配测试，与 soak_harness.py --alloc-check 相同
+"""
+
+from soak_harness import SoakHarness
+
+
+def test_unmatched_keys_do_not_allocate():
+    """未匹配任何触发序列的按键没有净内存分配"""
+    assert SoakHarness().check_allocations()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+配置管理器测试: 配置层合并和映射快照
+"""
+
+import io
+import json
+from contextlib import redirect_stdout
+
+from config_manager import ConfigManager, MappingSnapshot, merge_layers
+
+
+def test_conflicts_reported_at_build(config_manager):
+    """冲突在编译快照时计算并输出，已报告过的冲突不再重复输出"""
+    output = io.StringIO()
+    with redirect_stdout(output):
+        config_manager.add_mapping("cop", "ctrl+o")
+    snapshot = config_manager.get_snapshot()
+    assert ('prefix', 'cop', ('copy',), 1) in snapshot.conflicts
+    assert "cop" in output.getvalue()
+    
+    output = io.StringIO()
+    with redirect_stdout(output):
+        config_manager.add_mapping("zz", "ctrl+z")
+    assert "触发序列冲突" not in output.getvalue()
+    assert ('prefix', 'cop', ('copy',), 1) in config_manager.get_snapshot().conflicts
+
+
+def trie_shape(node):
+    """前缀树的结构和每个节点的触发序列、候选提示，用于比较增量更新与完整编译的结果"""
+    return (node.trigger, node.action, node.preview, node.count,
+            {char: trie_shape(child) for char, child in node.children.items()})
+
+
+def test_merge_layers_null_deletes():
+    """字典配置项按条目合并，高层的 null 删除低层的同名条目，其他配置项整体覆盖"""
+    system = {"mappings": {"a": "ctrl+a", "b": "ctrl+b"}, "preview_candidates": 3}
+    team = {"mappings": {"b": None, "c": "ctrl+c"}, "preview_candidates": 5}
+    merged = merge_layers([system, team])
+    assert merged == {"mappings": {"a": "ctrl+a", "c": "ctrl+c"}, "preview_candidates": 5}
+    merged["mappings"]["d"] = "ctrl+d"
+    assert "d" not in system["mappings"] and "d" not in team["mappings"]
+
+
+def test_user_edit_of_team_entry(tmp_path):
+    """修改和删除团队配置中的映射只写入用户配置，团队配置文件不变"""
+    team_file = tmp_path / "team.json"
+    team_file.write_text(json.dumps({"mappings": {"tm": "ctrl+t"}}), encoding='utf-8')
+    user_file = tmp_path / "config.json"
+    user_file.write_text(json.dumps({"mappings": {}}), encoding='utf-8')
+    with redirect_stdout(io.StringIO()):
+        manager = ConfigManager(str(user_file), [str(team_file)])
+        assert manager.get_mappings() == {"tm": "ctrl+t"}
+        manager.add_mapping("tm", "ctrl+u")
+        assert json.loads(user_file.read_text(encoding='utf-8'))["mappings"] == {"tm": "ctrl+u"}
+        manager.remove_mapping("tm")
+        assert json.loads(user_file.read_text(encoding='utf-8'))["mappings"] == {"tm": None}
+        assert "tm" not in manager.get_mappings()
+        assert json.loads(team_file.read_text(encoding='utf-8')) == {"mappings": {"tm": "ctrl+t"}}
+        # 重新加载后团队配置中的条目仍被用户配置的 null 删除
+        assert "tm" not in ConfigManager(str(user_file), [str(team_file)]).get_mappings()
+
+
+def test_incremental_update_matches_rebuild():
+    """少量变更在上一个前缀树上增量更新，结果与完整编译相同，未变的子树共用，旧快照不变"""
+    mappings = {"copy": "ctrl+c", "cut": "ctrl+x", "paste": "ctrl+v", "print": "ctrl+p"}
+    with redirect_stdout(io.StringIO()):
+        first = MappingSnapshot(1, mappings, {})
+        changed = dict(mappings, cop="ctrl+o")
+        del changed["cut"]
+        incremental = MappingSnapshot(2, changed, {"undo": "10,10"}, previous=first)
+        rebuilt = MappingSnapshot(2, changed, {"undo": "10,10"})
+    assert trie_shape(incremental.trie) == trie_shape(rebuilt.trie)
+    assert incremental.trie.children['p'] is first.trie.children['p']
+    assert first.trie.step("cut").trigger == "cut"
+    assert incremental.trie.step("cut") is None
+
+
+def test_large_change_rebuilds():
+    """变更超过 INCREMENTAL_LIMIT 时完整重新编译，不再共用上一个前缀树的节点"""
+    with redirect_stdout(io.StringIO()):
+        first = MappingSnapshot(1, {"paste": "ctrl+v"}, {})
+        many = {f"m{i}": "ctrl+m" for i in range(MappingSnapshot.INCREMENTAL_LIMIT + 1)}
+        second = MappingSnapshot(2, dict(many, paste="ctrl+v"), {}, previous=first)
+    assert second.trie.children['p'] is not first.trie.children['p']
+    assert trie_shape(second.trie) == trie_shape(MappingSnapshot(2, dict(many, paste="ctrl+v"), {}).trie)
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+端到端基准测试的前置检查，不需要 Xvfb
+"""
+
+import pytest
+
+from e2e_benchmark import E2EBenchmark
+
+
+def test_setup_requires_display(monkeypatch):
+    monkeypatch.delenv("DISPLAY", raising=False)
+    with pytest.raises(RuntimeError, match="DISPLAY"):
+        E2EBenchmark([10], 1, 1.0, 0).setup()
+
+
+def test_setup_rejects_early_import(monkeypatch):
+    """keyboard_manager 已由测试公共配置导入，连接的不是 Xvfb 的显示"""
+    monkeypatch.setenv("DISPLAY", ":99")
+    with pytest.raises(RuntimeError, match="keyboard_manager"):
+        E2EBenchmark([10], 1, 1.0, 0).setup()
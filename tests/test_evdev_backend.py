@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+evdev 后端测试: uinput 回环设备的监听和设备统计
+"""
+
+import os
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("evdev")
+pytestmark = pytest.mark.skipif(not os.access("/dev/uinput", os.W_OK), reason="需要 /dev/uinput 的写权限")
+
+from evdev import UInput, ecodes
+
+from evdev_backend import CHAR_CODES, LOOPBACK_NAME, EvdevBackend
+
+
+def test_loopback_device_stats():
+    """回环设备写入的按键按顺序到达监听器，并计入该设备的统计"""
+    backend = EvdevBackend()
+    loopback = UInput({ecodes.EV_KEY: sorted({code for code, _ in CHAR_CODES.values()})}, name=LOOPBACK_NAME)
+    sample = "abcxyz0123"
+    rounds = 20
+    received = []
+    done = threading.Event()
+
+    def on_press(key):
+        received.append(key.char)
+        if len(received) >= rounds * len(sample):
+            done.set()
+
+    # 等待 udev 创建设备节点
+    time.sleep(0.5)
+    listener = backend.keyboard.Listener(on_press=on_press)
+    listener.device_filter = [LOOPBACK_NAME]
+    listener.start()
+    time.sleep(0.2)
+    try:
+        for _ in range(rounds):
+            for char in sample:
+                code, _ = CHAR_CODES[char]
+                loopback.write(ecodes.EV_KEY, code, 1)
+                loopback.write(ecodes.EV_KEY, code, 0)
+                loopback.syn()
+        assert done.wait(5.0)
+        assert "".join(received) == sample * rounds
+        # 释放事件在按下之后到达，等它们全部计入统计
+        deadline = time.monotonic() + 2
+        while time.monotonic() < deadline:
+            stats = list(backend.get_device_stats().values())
+            if stats and stats[0]["releases"] == rounds * len(sample):
+                break
+            time.sleep(0.01)
+        assert len(stats) == 1
+        assert stats[0]["name"] == LOOPBACK_NAME
+        assert stats[0]["presses"] == stats[0]["releases"] == rounds * len(sample)
+        assert stats[0]["max_latency_ms"] >= stats[0]["mean_latency_ms"] > 0
+    finally:
+        listener.stop()
+        loopback.close()
+        backend.close()
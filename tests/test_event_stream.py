@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+事件流测试: 套接字文件和订阅方
+"""
+
+import json
+import socket
+import time
+
+import pytest
+
+import event_stream
+from event_stream import EventStream, _Subscriber
+
+unix_only = pytest.mark.skipif(not event_stream._use_unix_socket(), reason="需要 Unix 域套接字")
+
+
+@pytest.fixture(autouse=True)
+def runtime_dir(tmp_path, monkeypatch):
+    """套接字文件放在临时目录中"""
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    return tmp_path
+
+
+@unix_only
+def test_start_keeps_live_socket():
+    """已有事件流在监听时启动失败，不删除它的套接字"""
+    first = EventStream()
+    assert first.start()
+    try:
+        second = EventStream()
+        assert not second.start()
+        # 第一个事件流的套接字没有被删除，仍然可以订阅
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(event_stream._socket_path())
+    finally:
+        first.close()
+
+
+@unix_only
+def test_start_replaces_stale_socket():
+    """异常退出留下的套接字文件被替换"""
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(event_stream._socket_path())
+    stale.close()
+
+    stream = EventStream()
+    assert stream.start()
+    stream.close()
+
+
+def test_subscriber_counts_dropped_events():
+    """队列满时丢弃最旧的事件并计数"""
+    subscriber = _Subscriber(None, frozenset(event_stream.EVENT_TYPES), 2)
+    for index in range(5):
+        subscriber.push(event_stream._Event("trigger", {"trigger": str(index)}))
+    events, dropped = subscriber.take()
+    assert dropped == 3
+    assert [json.loads(event.encode())["trigger"] for event in events] == ["3", "4"]
+    assert subscriber.take() == ([], 0)
+
+
+def test_subscriber_detects_closed_peer():
+    """订阅方多发的数据不算断开，关闭连接后被发现"""
+    server, client = socket.socketpair()
+    subscriber = _Subscriber(server, frozenset(event_stream.EVENT_TYPES), 4)
+    try:
+        assert not subscriber.peer_closed()
+        client.sendall(b"extra\n")
+        assert not subscriber.peer_closed()
+        client.close()
+        assert subscriber.peer_closed()
+    finally:
+        server.close()
+
+
+@unix_only
+def test_idle_subscriber_removed_after_disconnect(monkeypatch):
+    """没有事件时断开的订阅方也会被移除"""
+    monkeypatch.setattr(event_stream, "PROBE_INTERVAL", 0.05)
+    stream = EventStream()
+    assert stream.start()
+    try:
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(event_stream._socket_path())
+        client.sendall(b'{"types": ["trigger"]}\n')
+        deadline = time.monotonic() + 2.0
+        while not stream.subscribers and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(stream.subscribers) == 1
+        # 没有任何事件发布，断开只能由空闲时的检查发现
+        client.close()
+        deadline = time.monotonic() + 2.0
+        while stream.subscribers and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert stream.subscribers == ()
+        assert stream.wanted == frozenset()
+    finally:
+        stream.close()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+图像锚点测试: 截取的图像只在添加映射时保存，模板匹配和 ROI 缓存
+"""
+
+import os
+
+import pytest
+
+import image_anchor
+from clipboard_service import ClipboardService
+
+
+class FakeImage:
+    """只记录保存路径的图像"""
+
+    def __init__(self):
+        self.saved = []
+
+    def save(self, path):
+        self.saved.append(path)
+        open(path, 'wb').close()
+
+
+def test_anchor_saved_next_to_config(config_manager, tmp_path, monkeypatch):
+    """锚点保存到配置文件旁的锚点目录，位置使用绝对路径，与当前目录无关"""
+    monkeypatch.chdir(tmp_path.parent)
+    image = FakeImage()
+    position = image_anchor.save_anchor("image:anchor-1.png", image, config_manager.get_anchor_dir())
+    path = position[len(image_anchor.IMAGE_PREFIX):]
+    assert os.path.isabs(path)
+    assert path == str(tmp_path / "anchors" / "anchor-1.png")
+    # 用同一个锚点添加第二个映射时不重复写文件
+    assert image_anchor.save_anchor("image:anchor-1.png", image, config_manager.get_anchor_dir()) == position
+    assert image.saved == [path]
+
+
+def test_unsaved_anchor_dropped_with_history():
+    """移出位置历史的锚点图像一起丢弃，不会无限增长"""
+    service = ClipboardService(history_size=2)
+    service.add_anchor("image:anchor-1.png", FakeImage())
+    assert service.get_anchor_image("image:anchor-1.png") is not None
+    service.add_position("1,1")
+    service.add_position("2,2")
+    assert service.get_anchor_image("image:anchor-1.png") is None
+    assert service.anchor_images == {}
+
+
+def make_screen(seed, rows=50, cols=75):
+    """由 8x8 色块组成的合成灰度屏幕，缩小后仍保留足够的纹理"""
+    np = pytest.importorskip("numpy")
+    return np.kron(np.random.default_rng(seed).random((rows, cols)), np.ones((8, 8))) * 255
+
+
+class FakeShot:
+    """截图，_to_gray 直接返回其中的数组"""
+
+    def __init__(self, array):
+        self.array = array
+
+
+class FakeGrab:
+    """记录截取区域的假 ImageGrab"""
+
+    def __init__(self, screen):
+        self.screen = screen
+        self.boxes = []
+
+    def grab(self, bbox=None):
+        self.boxes.append(bbox)
+        if bbox is None:
+            return FakeShot(self.screen)
+        left, top, right, bottom = bbox
+        return FakeShot(self.screen[top:bottom, left:right])
+
+
+def test_match_template_passes():
+    """原始分辨率精确定位，缩小后的粗略定位落在同一位置附近，无关模板得分低于阈值"""
+    screen = make_screen(1)
+    template = screen[203:251, 301:365]
+    score, row, col = image_anchor.match_template(screen, template)
+    assert score > 0.999 and (row, col) == (203, 301)
+    score, row, col = image_anchor.match_template(
+        image_anchor._downscale(screen, 4), image_anchor._downscale(template, 4)
+    )
+    assert score > 0.8 and abs(row * 4 - 203) <= 4 and abs(col * 4 - 301) <= 4
+    score, _, _ = image_anchor.match_template(screen, make_screen(2, 6, 8))
+    assert score < 0.8
+
+
+def test_locator_roi_cache(monkeypatch, tmp_path):
+    """第一次全屏查找，之后只截取上次命中的区域；锚点移动后回退到全屏查找"""
+    screen = make_screen(1)
+    template = screen[203:251, 301:365].copy()
+    grab = FakeGrab(screen)
+    monkeypatch.setattr(image_anchor, "ImageGrab", grab)
+    monkeypatch.setattr(image_anchor, "_to_gray", lambda shot: shot.array)
+    locator = image_anchor.ImageLocator(base_dir=str(tmp_path), roi_margin=16)
+    path = os.path.join(str(tmp_path), "anchor.png")
+    locator.templates[path] = (template, image_anchor._downscale(template, 4))
+
+    assert locator.locate("image:anchor.png") == (301 + 32, 203 + 24)
+    assert grab.boxes == [None]
+    assert locator.locate("image:anchor.png") == (301 + 32, 203 + 24)
+    assert grab.boxes == [None, (285, 187, 301 + 64 + 16, 203 + 48 + 16)]
+
+    # 锚点移到别处: ROI 中找不到，全屏找到新位置
+    moved = make_screen(3)
+    moved[40:88, 480:544] = template
+    grab.screen = moved
+    grab.boxes.clear()
+    assert locator.locate("image:anchor.png") == (480 + 32, 40 + 24)
+    assert grab.boxes[-1] is None and len(grab.boxes) == 2
+
+    # 屏幕上不再有锚点
+    grab.screen = make_screen(4)
+    assert locator.locate("image:anchor.png") is None
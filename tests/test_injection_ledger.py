@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+注入事件台账测试
+"""
+
+from injection_ledger import InjectionLedger, key_token
+from soak_harness import FakeKeyCode
+
+
+def test_ctrl_letter_echo_is_consumed():
+    """Windows 报告的注入 Ctrl+C 回显为控制字符 '\\x03'，应与注入时记录的 'c' 对应"""
+    ledger = InjectionLedger()
+    ledger.record_press('c')
+    ledger.record_release('c')
+    assert ledger.consume_press(FakeKeyCode(vk=0x43, char='\x03'))
+    assert ledger.consume_release(FakeKeyCode(vk=0x43, char='c'))
+    assert not ledger.has_pending()
+
+
+def test_printable_chars_keep_char_token():
+    """可打印字符按小写字符比较，与虚拟键码无关"""
+    assert key_token(FakeKeyCode(vk=0x41, char='A')) == 'a'
+    assert key_token(FakeKeyCode(vk=0xbb, char='=')) == '='
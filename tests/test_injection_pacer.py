@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+注入节奏控制器测试: 校准、退避和回落
+"""
+
+import time
+
+from injection_ledger import InjectionLedger
+from injection_pacer import InjectionPacer
+
+
+class FakeTarget:
+    """注入间隔小于 min_delay 时丢失最后一个字符的目标输入框"""
+
+    def __init__(self, min_delay):
+        self.min_delay = min_delay
+        self.text = ""
+
+    def inject(self, text, delay):
+        self.text += text if delay >= self.min_delay else text[:-1]
+
+    def read_back(self):
+        return self.text
+
+    def reset(self):
+        self.text = ""
+
+
+def test_calibrate_uses_target_read_back(config_manager):
+    """校准结果为目标程序实际收到完整文本的最小间隔，并保存到配置"""
+    pacer = InjectionPacer(config_manager)
+    target = FakeTarget(0.005)
+    window_class, delay = pacer.calibrate(target.inject, target.read_back, target.reset, settle=0)
+    assert delay == 0.005
+    assert pacer.get_delay(window_class) == 0.005
+    assert config_manager.get_pacing_settings()["profiles"][window_class] == 0.005
+
+
+def test_uncalibrated_class_uses_default_delay(config_manager):
+    """未校准的窗口类使用固定的默认间隔"""
+    pacer = InjectionPacer(config_manager)
+    assert pacer.get_delay("Notepad") == pacer.default_delay
+
+
+class FakeLedger:
+    """按设定返回丢失回显数的注入事件台账"""
+
+    def __init__(self):
+        self.missed = 0
+        self.pending = False
+
+    def collect_missed(self):
+        missed, self.missed = self.missed, 0
+        return missed, self.pending
+
+
+def test_backs_off_on_missing_echoes_and_decays_to_floor(config_manager):
+    """上一批注入有回显丢失时退避，连续没有丢失后回落到校准下限"""
+    ledger = FakeLedger()
+    pacer = InjectionPacer(config_manager, ledger)
+    pacer.current_window_class = lambda: "Slow"
+    pacer.set_profile("Slow", 0.004)
+    assert pacer.foreground_delay() == 0.004
+    ledger.missed = 2
+    assert pacer.foreground_delay() == 0.008
+    ledger.missed = 1
+    assert pacer.foreground_delay() == 0.016
+    # 退避不超过上限
+    for _ in range(10):
+        ledger.missed = 1
+        pacer.foreground_delay()
+    assert pacer.get_delay("Slow") == pacer.max_delay
+
+    # 每连续 decay_after 批没有丢失缩短一次，最终回到下限，不会低于下限
+    delays = [pacer.foreground_delay() for _ in range(pacer.decay_after * 20)]
+    assert delays[pacer.decay_after] < pacer.max_delay
+    assert delays == sorted(delays, reverse=True)
+    assert pacer.get_delay("Slow") == 0.004
+
+
+def test_pending_echoes_are_not_counted_as_success(config_manager):
+    """回显还可能到达时不判断上一批，之后丢失仍然退避"""
+    ledger = FakeLedger()
+    pacer = InjectionPacer(config_manager, ledger)
+    pacer.current_window_class = lambda: "App"
+    pacer.foreground_delay()
+    ledger.pending = True
+    pacer.foreground_delay()
+    ledger.pending = False
+    ledger.missed = 1
+    assert pacer.foreground_delay() == pacer.default_delay * pacer.backoff_factor
+
+
+def test_ledger_reports_expired_echoes():
+    """注入的事件在台账中过期仍未收到回显时计为丢失"""
+    ledger = InjectionLedger(ttl=0)
+    ledger.record_press('a')
+    ledger.record_press('b')
+    ledger.record_release('b')
+    time.sleep(0.01)
+    assert ledger.collect_missed() == (3, False)
+    assert ledger.collect_missed() == (0, False)
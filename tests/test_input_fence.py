@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+输入围栏测试: 围栏开启时机和暂扣时间上限
+"""
+
+import threading
+
+from input_fence import InputFence
+
+
+def test_match_opens_fence_before_action_runs(config_manager, keyboard_manager):
+    """匹配到触发序列时围栏已开启，动作排队期间的按键也会暂扣"""
+    config_manager.add_mapping("abc", "ctrl+c")
+    keyboard_manager.fence_enabled = True
+    started = threading.Event()
+    release = threading.Event()
+    # 让动作线程先忙于其他动作，触发的动作只能排队
+    keyboard_manager.action_executor.submit(lambda: (started.set(), release.wait(5)))
+    started.wait(5)
+    keyboard_manager.execute_hotkey_and_delete = lambda *args: None
+    try:
+        assert keyboard_manager.check_custom_mapping("abc")
+        assert keyboard_manager.input_fence.active
+        action, _ = keyboard_manager.input_fence.hold(0x41, False)
+        assert action == InputFence.HOLD
+    finally:
+        keyboard_manager._inject_fenced = lambda events: None
+        release.set()
+        keyboard_manager.action_executor.submit(lambda: None).result(5)
+    assert not keyboard_manager.input_fence.active
+
+
+def test_hold_deadline_counts_from_first_key():
+    """暂扣时间从最早暂扣的按键算起，之后的按键不会推迟失效"""
+    fence = InputFence(max_keys=32, max_hold=1.0)
+    fence.open()
+    assert fence.hold(0x41, False, now=10.0)[0] == InputFence.HOLD
+    assert fence.hold(0x42, False, now=10.6)[0] == InputFence.HOLD
+    assert fence.held_since == 10.0
+    action, events = fence.hold(0x43, False, now=11.1)
+    assert action == InputFence.BREAK
+    assert [vk for vk, _ in events] == [0x41, 0x42, 0x43]
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+键盘管理器测试: 自动重复识别、触发序列消歧、映射快照切换和候选提示
+"""
+
+import time
+
+import pytest
+
+from soak_harness import FakeKey, FakeKeyCode, FakeListener
+
+
+def press(char):
+    FakeListener.active.on_press(FakeKeyCode.from_char(char))
+
+
+def release(char):
+    FakeListener.active.on_release(FakeKeyCode.from_char(char))
+
+
+def type_text(text):
+    for char in text:
+        press(char)
+        release(char)
+
+
+def record_triggers(keyboard_manager):
+    """用记录触发序列代替执行动作"""
+    fired = []
+    keyboard_manager.check_custom_mapping = lambda trigger, *args, **kwargs: fired.append(trigger) or True
+    return fired
+
+
+def test_shift_released_before_letter(config_manager, keyboard_manager):
+    """先松开 Shift 再松开字母(按下 'A'，释放 'a')后，再次输入该字母不算自动重复"""
+    config_manager.add_mapping("abc", "ctrl+c")
+    fired = record_triggers(keyboard_manager)
+    press('A')
+    release('a')
+    keyboard_manager._reset_match()
+    type_text("Abc")
+    assert fired == ["abc"]
+    assert keyboard_manager.shed_count == 0
+    assert not keyboard_manager.current_keys
+
+
+def test_autorepeat_is_shed(keyboard_manager):
+    """按住不放产生的重复按下跳过匹配"""
+    press('a')
+    press('a')
+    press('a')
+    assert keyboard_manager.shed_count == 2
+
+
+def test_other_key_ends_autorepeat(keyboard_manager):
+    """释放事件丢失时，按下其他键后再按该键不算自动重复"""
+    press('a')
+    press('b')
+    release('b')
+    press('a')
+    assert keyboard_manager.shed_count == 0
+
+
+def test_lost_release_expires(keyboard_manager):
+    """释放事件丢失后超过缓冲超时，再按该键不算自动重复"""
+    press('a')
+    keyboard_manager.repeat_key_time -= keyboard_manager.buffer_timeout
+    press('a')
+    assert keyboard_manager.shed_count == 0
+
+
+def record_pending(keyboard_manager, delay=0.05):
+    """开启消歧延迟，记录触发序列和随触发字符一起删除的按键"""
+    keyboard_manager.disambiguation_delay = delay
+    fired = []
+    keyboard_manager.check_custom_mapping = lambda trigger, retype=None, **kwargs: fired.append((trigger, retype)) or True
+    return fired
+
+
+def test_extending_key_cancels_pending(config_manager, keyboard_manager):
+    """等待 cop 时继续输入 y，只触发 copy"""
+    config_manager.add_mapping("cop", "ctrl+o")
+    fired = record_pending(keyboard_manager)
+    type_text("copy")
+    assert fired == [("copy", None)]
+    assert keyboard_manager.pending_node is None
+
+
+def test_other_key_fires_pending(config_manager, keyboard_manager):
+    """等待 cop 时输入不能延伸它的按键，立即触发 cop 并在动作后重新输入该按键"""
+    config_manager.add_mapping("cop", "ctrl+o")
+    fired = record_pending(keyboard_manager, delay=10)
+    type_text("cop")
+    assert fired == []
+    FakeListener.active.on_press(FakeKey.space.value)
+    assert fired == [("cop", FakeKey.space.value)]
+    
+    # 新按键在触发后从根节点开始匹配，"cop" 之后的 "p" 是 "paste" 的开头
+    keyboard_manager._reset_match()
+    type_text("cop")
+    type_text("paste")
+    assert fired[1:] == [("cop", FakeKeyCode.from_char("p")), ("paste", None)]
+
+
+def test_pending_fires_after_delay(config_manager, keyboard_manager):
+    """消歧延迟内没有后续输入时由计时线程触发，匹配状态留给监听线程重置"""
+    config_manager.add_mapping("cop", "ctrl+o")
+    fired = record_pending(keyboard_manager)
+    type_text("cop")
+    node = keyboard_manager.match_node
+    deadline = time.monotonic() + 2
+    while not fired and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert fired == [("cop", None)]
+    assert keyboard_manager.match_node is node
+    assert keyboard_manager.pending_fired
+    # 下一个按键前回到根节点，y 不会与已触发的 cop 组成 copy
+    type_text("y")
+    assert fired == [("cop", None)]
+    assert not keyboard_manager.pending_fired
+
+
+def test_snapshot_is_immutable(config_manager):
+    """映射快照的属性和映射表都不能修改，修改配置不会影响已发布的快照"""
+    snapshot = config_manager.get_snapshot()
+    with pytest.raises(AttributeError):
+        snapshot.version = 0
+    with pytest.raises(TypeError):
+        snapshot.mappings["copy"] = "ctrl+x"
+    config_manager.add_mapping("copy", "ctrl+x")
+    assert snapshot.mappings["copy"] == "ctrl+c"
+    assert config_manager.get_snapshot().mappings["copy"] == "ctrl+x"
+
+
+def test_snapshot_swap(config_manager, keyboard_manager):
+    """配置变更后监听线程切换到版本更新的快照，输入到一半时删除的触发序列不会触发"""
+    old = keyboard_manager.mapping_snapshot
+    config_manager.add_mapping("zz", "ctrl+z")
+    assert keyboard_manager.mapping_snapshot is config_manager.get_snapshot()
+    assert keyboard_manager.mapping_snapshot.version > old.version
+    assert "zz" not in old.actions
+
+    check = keyboard_manager.check_custom_mapping
+    results = []
+    keyboard_manager.check_custom_mapping = lambda *args, **kwargs: results.append(check(*args, **kwargs))
+    type_text("cop")
+    config_manager.remove_mapping("copy")
+    type_text("y")
+    assert results == [False]
+
+
+def test_candidates_follow_matcher_node(config_manager, keyboard_manager):
+    """候选提示直接取自当前匹配节点预先计算的文本，内容不变时不重复通知"""
+    config_manager.add_mapping("cop", "ctrl+o")
+    previews = []
+    keyboard_manager.set_candidates_callback(previews.append)
+    type_text("co")
+    node = keyboard_manager.mapping_snapshot.matcher.step("co")
+    assert previews[-1] is node.preview
+    assert previews[-1] == "cop (ctrl+o), copy (ctrl+c)"
+    # 偏离所有触发序列后提示清空，之后的按键不再通知
+    type_text("xx")
+    assert previews[-1] == ""
+    assert previews.count("") == 1
+
+
+def test_candidates_are_truncated(config_manager, keyboard_manager):
+    """候选数量超过 preview_candidates 时只列出最短的几个并以省略号结尾"""
+    for suffix in ("a", "bb", "ccc", "dddd"):
+        config_manager.add_mapping("q" + suffix, "ctrl+q")
+    previews = []
+    keyboard_manager.set_candidates_callback(previews.append)
+    type_text("q")
+    assert previews == ["qa (ctrl+q), qbb (ctrl+q), qccc (ctrl+q)..."]
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+模式触发序列测试: 语法分析、DFA 编译和占位符展开
+"""
+
+import string
+
+import pytest
+
+from pattern_matcher import PatternError, _Parser, compile_patterns, expand_template, parse_pattern
+from trigger_matcher import compile_matcher
+
+PATTERN = r"re:s(\d{1,2});"
+
+
+def compile_all(literals, patterns, max_states=2000):
+    """把普通触发序列和模式触发序列一起编译，动作均为快捷键"""
+    trie = compile_matcher({key: ('hotkey', value) for key, value in literals.items()})
+    return compile_patterns(trie, {key: ('mouse', value) for key, value in patterns.items()}, 3, max_states)
+
+
+def test_parse_tree():
+    """分组、字符类简写和 {m,n} 量词解析为语法树"""
+    assert _Parser(r"s(\d{1,2});").parse() == ('cat', [
+        ('set', frozenset('s')),
+        ('cat', [('rep', ('set', frozenset(string.digits)), 1, 2)]),
+        ('set', frozenset(';')),
+    ])
+    assert _Parser("a|[b-d]").parse() == ('alt', [('cat', [('set', frozenset('a'))]), ('cat', [('set', frozenset('bcd'))])])
+
+
+def test_capture_and_expansion():
+    """按 DFA 走到接受节点后，用正则表达式取出捕获组代入模板"""
+    root = compile_all({}, {PATTERN: "{1}0,200"})
+    node = root.step("s12;")
+    assert node.trigger == PATTERN
+    match = parse_pattern(PATTERN)[1].fullmatch("s12;")
+    assert expand_template(node.action[1], match) == "120,200"
+    assert expand_template("$1-{0}-{5}", match) == "12-s12;-{5}"
+    # 超过 {1,2} 的数字没有后继
+    assert root.step("s123") is None
+
+
+def test_literal_has_priority():
+    """同一输入既是普通触发序列又匹配模式时，普通触发序列优先"""
+    root = compile_all({"s1;": "ctrl+a"}, {PATTERN: "{1}0,200"})
+    assert root.step("s1;").trigger == "s1;"
+    assert root.step("s1;").action == ('hotkey', "ctrl+a")
+    assert root.step("s2;").trigger == PATTERN
+
+
+def test_preview_mixes_literals_and_patterns():
+    """候选提示同时列出普通触发序列和仍可能匹配的模式，按长度排序"""
+    root = compile_all({"s1;": "ctrl+a", "x": "ctrl+x"}, {PATTERN: "{1}0,200"})
+    node = root.step("s")
+    assert node.preview == r"s1; (ctrl+a), s(\d{1,2}); (点击 {1}0,200)"
+    assert node.count == 2
+    # 模式走不到的分支只剩普通触发序列
+    assert root.step("x").preview == "x (ctrl+x)"
+
+
+def test_max_states():
+    """编译后的状态数超过上限时抛出 PatternError"""
+    with pytest.raises(PatternError, match="pattern_max_states"):
+        compile_all({}, {"re:[a-z]{1,8}[0-9]{1,8}x": "0,0"}, max_states=5)
+
+
+@pytest.mark.parametrize("trigger", [
+    "re:^abc", "re:abc$", "re:a*?", "re:a+?", "re:a??", "re:(?=a)b", r"re:(a)\1", "re:a{2,1}", "re:a{1,99}", "re:",
+])
+def test_rejected_syntax(trigger):
+    """锚点、非贪婪量词、环视、反向引用和超出范围的量词被拒绝"""
+    with pytest.raises(PatternError):
+        parse_pattern(trigger)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+插件执行器测试: 超时、结果大小限制和进程池重启
+"""
+
+import os
+import textwrap
+import time
+
+import pytest
+
+from plugin_runner import PluginRunner
+
+PLUGIN = textwrap.dedent('''
+    import os
+    import time
+
+    def slow(context):
+        time.sleep(30)
+
+    def mark(context):
+        # 记录一次执行，之后等待足够久，保证在另一个调用超时时仍在运行
+        with open(context["marker"], "a") as f:
+            f.write("x")
+        time.sleep(float(context.get("sleep", 3)))
+        return "done"
+
+    def echo(context):
+        return context["text"]
+''')
+
+
+@pytest.fixture
+def runner(tmp_path):
+    """两个工作进程的插件执行器，插件模块位于临时目录"""
+    (tmp_path / "test_plugin.py").write_text(PLUGIN, encoding='utf-8')
+    runner = PluginRunner(str(tmp_path), workers=2, max_result_chars=10)
+    yield runner
+    runner.shutdown()
+
+
+def test_result_returned(runner):
+    assert runner.submit("test_plugin:echo", {"text": "hello"}, 10).result(10) == "hello"
+
+
+def test_result_size_limit(runner):
+    """结果超过上限时调用以 ValueError 结束"""
+    with pytest.raises(ValueError):
+        runner.submit("test_plugin:echo", {"text": "x" * 11}, 10).result(10)
+
+
+def test_timeout_aborts_other_calls_without_rerunning(runner, tmp_path):
+    """超时重启进程池时，同一进程池中进行中的调用以错误结束，不在新进程池中再执行一次"""
+    marker = str(tmp_path / "marker")
+    other = runner.submit("test_plugin:mark", {"marker": marker}, 10)
+    # 等待另一个调用开始执行
+    deadline = time.monotonic() + 10
+    while not os.path.exists(marker) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    slow = runner.submit("test_plugin:slow", {}, 0.5)
+    with pytest.raises(TimeoutError):
+        slow.result(10)
+    with pytest.raises(RuntimeError):
+        other.result(10)
+    # 新的进程池可以继续使用，被中止的调用没有再次执行
+    assert runner.submit("test_plugin:echo", {"text": "ok"}, 10).result(10) == "ok"
+    with open(marker) as f:
+        assert f.read() == "x"
+
+
+def test_runner_closed_after_last_plugin_mapping_removed(config_manager, keyboard_manager, tmp_path):
+    """删除最后一个插件映射后关闭插件执行器和它的工作进程"""
+    config_manager.config["plugin_dir"] = str(tmp_path)
+    config_manager.add_plugin_mapping("zzp", "test_plugin:echo")
+    runner = keyboard_manager.plugin_runner
+    assert runner is not None
+    config_manager.remove_plugin_mapping("zzp")
+    assert keyboard_manager.plugin_runner is None
+    assert runner.pool is None
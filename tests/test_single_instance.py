@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+单实例测试: 文件锁和命令套接字
+"""
+
+import socket
+
+import pytest
+
+import single_instance
+from single_instance import InstanceServer, send_command
+
+pytestmark = pytest.mark.skipif(not single_instance._use_unix_socket(), reason="需要 Unix 域套接字")
+
+
+@pytest.fixture(autouse=True)
+def runtime_dir(tmp_path, monkeypatch):
+    """锁文件和套接字文件放在临时目录中"""
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_second_instance_is_refused_and_can_send_commands():
+    """第二个实例拿不到锁，但可以向第一个实例发送命令"""
+    first = InstanceServer()
+    first.set_handler("show", lambda: None)
+    assert first.acquire()
+    try:
+        second = InstanceServer()
+        assert not second.acquire()
+        assert send_command("show") == "ok"
+    finally:
+        first.close()
+
+
+def test_stale_socket_is_replaced():
+    """异常退出留下的套接字文件被替换"""
+    # 上次异常退出留下的套接字文件，没有进程监听
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(single_instance._socket_path())
+    stale.close()
+
+    server = InstanceServer()
+    assert server.acquire()
+    try:
+        assert send_command("ping") == "ok"
+    finally:
+        server.close()
+
+
+def test_lock_is_released_on_close():
+    """关闭后锁被释放，新实例可以获取"""
+    first = InstanceServer()
+    assert first.acquire()
+    first.close()
+    second = InstanceServer()
+    assert second.acquire()
+    second.close()
+    assert send_command("ping", timeout=0.1) is None
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+触发键拦截器测试: 暂扣、完成和重放
+"""
+
+from pattern_matcher import compile_patterns
+from trigger_matcher import compile_matcher
+from trigger_suppressor import TriggerSuppressor
+
+
+def make_suppressor(literals, patterns=None, max_hold=16):
+    """用普通触发序列和模式触发序列编译的匹配器创建拦截器"""
+    root = compile_matcher({key: ('hotkey', value) for key, value in literals.items()})
+    if patterns:
+        root = compile_patterns(root, {key: ('hotkey', value) for key, value in patterns.items()})
+    suppressor = TriggerSuppressor(buffer_timeout=1.0, max_hold=max_hold)
+    suppressor.rebuild(root)
+    return suppressor
+
+
+def feed_text(suppressor, text, now=100.0):
+    """逐个输入字符，原始按键标识就是字符本身，返回每次的结果"""
+    return [suppressor.feed(char, char, now) for char in text]
+
+
+def test_literal_trigger_completes():
+    """普通触发序列的按键全部暂扣，最后一个按键完成触发"""
+    suppressor = make_suppressor({"copy": "ctrl+c"})
+    results = feed_text(suppressor, "copy")
+    assert results[:-1] == [(TriggerSuppressor.HOLD, None)] * 3
+    assert results[-1] == (TriggerSuppressor.COMPLETE, ("copy", "copy"))
+    assert suppressor.get_held_text() == ""
+
+
+def test_deviation_replays_held_keys():
+    """偏离触发序列时重放暂扣的按键和当前按键，本轮之后的按键直接放行"""
+    suppressor = make_suppressor({"copy": "ctrl+c"})
+    results = feed_text(suppressor, "cox")
+    assert results[-1] == (TriggerSuppressor.REPLAY, ["c", "o", "x"])
+    assert suppressor.feed("c", "c", 100.0) == (TriggerSuppressor.PASS, None)
+
+
+def test_pattern_trigger_completes():
+    """模式触发序列同样暂扣，完成时返回输入的文本用于取出捕获组"""
+    suppressor = make_suppressor({"copy": "ctrl+c"}, {r"re:s(\d{1,2})x": "{1}0,200"})
+    results = feed_text(suppressor, "s12x")
+    assert results[-1] == (TriggerSuppressor.COMPLETE, (r"re:s(\d{1,2})x", "s12x"))
+
+
+def test_max_hold_replays():
+    """暂扣的按键达到上限时重放，超过上限的触发序列不会被拦截"""
+    suppressor = make_suppressor({"abcd": "ctrl+a"}, max_hold=3)
+    results = feed_text(suppressor, "abc")
+    assert results[:2] == [(TriggerSuppressor.HOLD, None)] * 2
+    assert results[2] == (TriggerSuppressor.REPLAY, ["a", "b", "c"])
+
+
+def test_timeout_restarts_matching():
+    """超时后暂扣的按键与当前按键一起重放，再下一轮重新开始匹配"""
+    suppressor = make_suppressor({"copy": "ctrl+c"})
+    feed_text(suppressor, "co", now=100.0)
+    assert suppressor.feed("p", "p", 102.0) == (TriggerSuppressor.REPLAY, ["c", "o", "p"])
+    results = feed_text(suppressor, "copy", now=104.0)
+    assert results[-1] == (TriggerSuppressor.COMPLETE, ("copy", "copy"))
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+使用记录测试: 触发序列ID表
+"""
+
+import json
+import threading
+
+import usage_log
+from usage_log import UsageLog, read_usage
+
+# crc32 相同的两个字符串，旧版本以 crc32 作为ID时无法区分它们
+COLLIDING = ("plumless", "buckeroo")
+
+
+def make_log(tmp_path):
+    return UsageLog(str(tmp_path / "usage.log"), str(tmp_path / "usage_counters.json"))
+
+
+def test_ids_are_sequential(tmp_path):
+    """ID按登记顺序分配，登记后立即写入计数文件，crc32 相同的触发序列各自统计"""
+    log = make_log(tmp_path)
+    log.register(COLLIDING + ("copy",))
+    with open(log.counters_path, encoding='utf-8') as f:
+        assert sorted(json.load(f)["triggers"].values()) == sorted(COLLIDING + ("copy",))
+    assert sorted(log.ids.values()) == [1, 2, 3]
+    for trigger in COLLIDING + COLLIDING + ("copy",):
+        log.record(trigger, 0.01)
+    log.close()
+    usage = read_usage(log.log_path, log.counters_path, COLLIDING + ("copy",))
+    assert {trigger: entry[0] for trigger, entry in usage.items()} == {"plumless": 2, "buckeroo": 2, "copy": 1}
+
+
+def test_id_table_survives_restart(tmp_path):
+    """重新启动后沿用已有ID，新的触发序列分配下一个ID，未登记的触发序列在写入时分配"""
+    log = make_log(tmp_path)
+    log.register((COLLIDING[0],))
+    log.record(COLLIDING[0], 0.01)
+    log.close()
+
+    log = make_log(tmp_path)
+    log.register((COLLIDING[1],))
+    log.record(COLLIDING[1], 0.01)
+    log.record("paste", 0.01)
+    log.close()
+    assert log.ids == {COLLIDING[0]: 1, COLLIDING[1]: 2, "paste": 3}
+    usage = read_usage(log.log_path, log.counters_path, COLLIDING + ("paste",))
+    assert [usage[trigger][0] for trigger in COLLIDING + ("paste",)] == [1, 1, 1]
+
+
+def test_old_counters_without_table(tmp_path):
+    """没有ID表的旧计数不属于任何触发序列，新ID也不会与它们重复"""
+    log = make_log(tmp_path)
+    with open(log.counters_path, 'w', encoding='utf-8') as f:
+        json.dump({"1": [5, 0, 0]}, f)
+    log.register(("copy",))
+    assert log.ids == {"copy": 2}
+    assert read_usage(log.log_path, log.counters_path, ("copy",)) == {}
+
+
+def test_read_during_compaction(tmp_path, monkeypatch):
+    """在替换计数文件与清空记录文件之间读取统计，读取等压缩完成，不会把记录计入两次"""
+    log = make_log(tmp_path)
+    log.register(("copy",))
+    for _ in range(10):
+        log.record("copy", 0.001)
+    log.queue.put(None)
+    log.thread.join()
+    log.thread = None
+    counts = []
+    write_counters = usage_log._write_counters
+
+    def write_then_read(*args):
+        write_counters(*args)
+        reader = threading.Thread(
+            target=lambda: counts.append(read_usage(log.log_path, log.counters_path, ("copy",))["copy"][0])
+        )
+        reader.start()
+        # 读取方拿不到锁，压缩完成前不会返回
+        reader.join(timeout=0.2)
+        threads.append(reader)
+
+    threads = []
+    monkeypatch.setattr(usage_log, "_write_counters", write_then_read)
+    log.compact()
+    threads[0].join()
+    assert counts == [10]